@@ -0,0 +1,185 @@
+"""
+analytics/cube.py
+
+Cube journalier pré-agrégé pour les filtres de période et les graphiques
+temporels.
+
+DailyCube.build() regroupe une fois, au chargement, les lignes par jour (et
+par heure si demandé) × dimensions (produit, pays) : nombre de lignes et
+sommes des mesures (CA, quantité, coût). Le cube est trié par jour : une
+période se lit par recherche dichotomique (searchsorted) sur les jours, sans
+parcourir les lignes brutes ; les regroupements par jour, jour de semaine,
+mois ou heure se font sur le cube.
+
+Les périodes sont en jours entiers : period_start() arrondit le début au
+jour suivant (les exports Etsy datent les ventes à minuit).
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Mesures des exports de ventes : {mesure du cube: colonne source}
+SALES_MEASURES = {'Revenue': 'Price', 'Quantity': 'Quantity', 'Cost': 'Cost'}
+
+# Mesures des commandes (Sold Orders)
+ORDERS_MEASURES = {'Revenue': 'Total'}
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Nombre de cubes gardés en mémoire (tous utilisateurs confondus)
+MAX_CUBES = 64
+
+
+def period_start(days, now=None):
+    """Premier jour inclus dans les `days` derniers jours (minuit)."""
+    now = now or datetime.now()
+    return pd.Timestamp(now - timedelta(days=days)).ceil('D')
+
+
+class DailyCube:
+    """
+    Agrégats triés par jour.
+
+    Args:
+        data (DataFrame): Colonnes Day, [Hour], dimensions, Count, mesures ;
+                          trié par Day (construit par DailyCube.build)
+        measures (list): Noms des mesures
+        dimensions (list): Noms des dimensions
+    """
+
+    def __init__(self, data, measures, dimensions):
+        self.data = data
+        self.measures = list(measures)
+        self.dimensions = list(dimensions)
+        self.days = data['Day'].to_numpy()
+
+    @classmethod
+    def build(cls, df, measures=None, dimensions=(), date_column='Date', hourly=False):
+        """
+        Construit le cube depuis les lignes brutes.
+
+        Args:
+            df (DataFrame): Lignes (dates déjà converties)
+            measures (dict): {mesure: colonne source} ; les colonnes absentes sont ignorées
+            dimensions (tuple): Colonnes de regroupement (ex: 'Product', 'Country')
+            date_column (str): Colonne de dates
+            hourly (bool): Ajoute l'heure de la journée aux clés (colonne Hour)
+        """
+        measures = {name: column for name, column in (measures or {}).items() if column in df.columns}
+        dimensions = [column for column in dimensions if column in df.columns]
+
+        rows = df[df[date_column].notna()]
+        keys = [rows[date_column].dt.floor('D').rename('Day')]
+        if hourly:
+            keys.append(rows[date_column].dt.hour.rename('Hour'))
+        keys += [rows[column] for column in dimensions]
+
+        aggregations = {'Count': (date_column, 'size')}
+        aggregations.update({name: (column, 'sum') for name, column in measures.items()})
+
+        data = (rows.groupby(keys, observed=True, sort=True, dropna=False)
+                .agg(**aggregations)
+                .reset_index())
+
+        return cls(data, measures, dimensions)
+
+    def _slice(self, start, end):
+        return DailyCube(self.data.iloc[start:end], self.measures, self.dimensions)
+
+    def _position(self, when, side='left'):
+        return int(np.searchsorted(self.days, pd.Timestamp(when).to_datetime64(), side=side))
+
+    def since(self, start):
+        """Jours >= start (arrondi au jour suivant s'il tombe en cours de journée)."""
+        start = pd.Timestamp(start).ceil('D')
+        return self._slice(self._position(start), len(self.days))
+
+    def between(self, start, end):
+        """Jours dans [start, end)."""
+        return self._slice(self._position(pd.Timestamp(start).ceil('D')),
+                           self._position(pd.Timestamp(end).ceil('D')))
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def empty(self):
+        return len(self.data) == 0
+
+    @property
+    def rows(self):
+        """Nombre de lignes brutes couvertes."""
+        return int(self.data['Count'].sum())
+
+    @property
+    def first_day(self):
+        return pd.Timestamp(self.days[0]) if len(self.days) else None
+
+    @property
+    def last_day(self):
+        return pd.Timestamp(self.days[-1]) if len(self.days) else None
+
+    def totals(self):
+        """
+        Returns:
+            dict: {'Count': lignes, mesure: somme}
+        """
+        totals = {'Count': self.rows}
+        for measure in self.measures:
+            totals[measure] = self.data[measure].sum()
+        return totals
+
+    def by_day(self, measure='Count'):
+        """Series indexée par jour (jours sans vente absents)."""
+        return self.data.groupby('Day', sort=True)[measure].sum()
+
+    def by_weekday(self, measure='Count'):
+        """Series indexée par nom de jour anglais, dans l'ordre WEEKDAYS (NaN si aucun)."""
+        by_day = self.by_day(measure)
+        return by_day.groupby(by_day.index.day_name()).sum().reindex(WEEKDAYS).rename_axis('DayOfWeek')
+
+    def by_month(self, measure='Count'):
+        """Series indexée par mois de l'année (1-12), mois présents seulement."""
+        by_day = self.by_day(measure)
+        return by_day.groupby(by_day.index.month).sum().rename_axis('Month')
+
+    def by_hour(self, measure='Count'):
+        """Series indexée par heure (cube construit avec hourly=True)."""
+        return self.data.groupby('Hour', sort=True)[measure].sum()
+
+    def by_dimension(self, dimension, measures=None):
+        """DataFrame indexé par les valeurs de la dimension (Count et mesures)."""
+        columns = ['Count'] + (measures if measures is not None else self.measures)
+        return self.data.groupby(dimension, observed=True, sort=False)[columns].sum()
+
+
+_cubes = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_cube(key, build_fn):
+    """
+    Cube mémorisé par clé (ex: (type d'export, SHA-256 du fichier)).
+
+    Args:
+        key (tuple): Clé du cube
+        build_fn: fonction() -> DailyCube, appelée si le cube n'est pas en mémoire
+    """
+    with _lock:
+        cube = _cubes.get(key)
+        if cube is not None:
+            _cubes.move_to_end(key)
+            return cube
+
+    cube = build_fn()
+
+    with _lock:
+        _cubes[key] = cube
+        while len(_cubes) > MAX_CUBES:
+            _cubes.popitem(last=False)
+
+    return cube
@@ -0,0 +1,173 @@
+"""
+analytics/customers.py
+
+Chargement des exports Customer Intelligence (commandes, items, avis) et
+analyses clients : géographie, fidélisation, avis, délais d'expédition.
+
+Les fonctions ne dépendent pas de Streamlit : les messages destinés à
+l'utilisateur sont des Diagnostic ajoutés à une liste (analytics.diagnostics).
+"""
+
+import json
+from collections import Counter
+
+import pandas as pd
+
+from analytics.diagnostics import add_diagnostic
+from analytics.normalize import normalize_countries, parse_dates, parse_money
+from analytics.schemas import read_export, ORDER_ITEMS, REVIEWS, SOLD_ORDERS
+from analytics.sentiment import sentiment_counts
+from analytics.streaming import OrdersAggregate
+from analytics.text_stats import count_terms, get_stop_words
+from analytics.timeindex import index_by_date
+
+
+# ==================== CHARGEMENT ====================
+
+def parse_orders(uploaded_file, messages):
+    """Charge les données de commandes Etsy"""
+    try:
+        # Schéma Sold Orders : colonnes utiles, types déclarés, dates converties
+        df, _ = read_export(uploaded_file, SOLD_ORDERS)
+
+        # Nettoyage des montants
+        if 'Total' in df.columns:
+            df['Total'] = parse_money(df['Total'], fill_value=None)
+
+        # Nettoyage des pays
+        if 'Country' in df.columns:
+            df['Country'] = normalize_countries(df['Country'])
+
+        df = index_by_date(df.dropna(subset=['Date']))
+
+        add_diagnostic(messages, 'success', 'loaded', f"✅ {len(df)} commandes chargées avec succès !", rows=len(df))
+
+        return df
+
+    except Exception as e:
+        add_diagnostic(messages, 'error', 'load_failed', f"❌ Erreur : {e}", error=repr(e))
+        return None
+
+
+def parse_items(uploaded_file, messages):
+    """Charge les données d'items Etsy"""
+    try:
+        df, _ = read_export(uploaded_file, ORDER_ITEMS)
+
+        if 'Price' in df.columns:
+            df['Price'] = parse_money(df['Price'], fill_value=None)
+
+        if 'Quantity' not in df.columns:
+            df['Quantity'] = 1
+
+        df = index_by_date(df.dropna(subset=['Date']))
+
+        add_diagnostic(messages, 'success', 'loaded', f"✅ {len(df)} items chargés avec succès !", rows=len(df))
+
+        return df
+
+    except Exception as e:
+        add_diagnostic(messages, 'error', 'load_failed', f"❌ Erreur : {e}", error=repr(e))
+        return None
+
+
+def parse_reviews(uploaded_file, messages):
+    """Charge les données de reviews (JSON ou CSV)"""
+    try:
+        file_extension = uploaded_file.name.split('.')[-1].lower()
+
+        if file_extension == 'json':
+            # Charger depuis JSON
+            reviews_data = json.load(uploaded_file)
+            df = pd.DataFrame(reviews_data)
+
+            # Mapping des colonnes JSON
+            column_mapping = {
+                'reviewer': 'Reviewer',
+                'date_reviewed': 'Date',
+                'star_rating': 'Rating',
+                'message': 'Review_Text',
+                'order_id': 'Order_ID'
+            }
+
+            df = df.rename(columns=column_mapping)
+
+        else:
+            # Charger depuis CSV
+            df, _ = read_export(uploaded_file, REVIEWS)
+
+        # Conversion des dates (JSON ; le CSV est déjà converti par le schéma)
+        if 'Date' in df.columns:
+            df['Date'] = parse_dates(df['Date'])
+
+        # S'assurer que Rating est numérique
+        if 'Rating' in df.columns:
+            df['Rating'] = pd.to_numeric(df['Rating'], errors='coerce')
+
+        # Remplir les reviews vides
+        if 'Review_Text' in df.columns:
+            df['Review_Text'] = df['Review_Text'].fillna('')
+
+        df = index_by_date(df.dropna(subset=['Date', 'Rating']))
+
+        add_diagnostic(messages, 'success', 'loaded', f"✅ {len(df)} avis chargés avec succès !", rows=len(df))
+
+        return df
+
+    except Exception as e:
+        add_diagnostic(messages, 'error', 'load_failed', f"❌ Erreur lors du chargement des reviews : {e}", error=repr(e))
+        return None
+
+
+# ==================== ANALYSES ====================
+
+def analyze_geography(orders_df):
+    """Analyse géographique des clients (orders_df : DataFrame ou OrdersAggregate)"""
+
+    if isinstance(orders_df, OrdersAggregate):
+        return orders_df.geography()
+
+    if 'Country' not in orders_df.columns:
+        return None, None
+
+    return OrdersAggregate().add(orders_df).geography()
+
+
+def analyze_customer_retention(orders_df):
+    """Analyse de la fidélisation clients (orders_df : DataFrame ou OrdersAggregate)"""
+
+    if isinstance(orders_df, OrdersAggregate):
+        return orders_df.customers()
+
+    if 'Buyer' not in orders_df.columns:
+        return None
+
+    return OrdersAggregate().add(orders_df).customers()
+
+
+def analyze_reviews_sentiment(reviews_df):
+    """Analyse de sentiment des reviews (mots-clés français et anglais)"""
+
+    if reviews_df is None or 'Review_Text' not in reviews_df.columns:
+        return None, None
+
+    # Un seul parcours de la colonne pour tous les mots-clés
+    return sentiment_counts(reviews_df['Review_Text'])
+
+
+def extract_all_words(reviews_df):
+    """Extrait tous les mots significatifs des reviews"""
+
+    if reviews_df is None or 'Review_Text' not in reviews_df.columns:
+        return Counter()
+
+    return count_terms(reviews_df['Review_Text'], 'words', stop_words=get_stop_words('reviews'))
+
+
+def calculate_shipping_delays(orders_df):
+    """Calcule les délais de livraison (nouveau DataFrame avec la colonne Shipping_Delay)"""
+
+    if 'Date_Paid' not in orders_df.columns or 'Ship_Date' not in orders_df.columns:
+        return None
+
+    return orders_df.assign(Shipping_Delay=(orders_df['Ship_Date'] - orders_df['Date_Paid']).dt.days)
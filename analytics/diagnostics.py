@@ -0,0 +1,49 @@
+"""
+analytics/diagnostics.py
+
+Diagnostics structurés des loaders et des analyses.
+
+Les modules d'analytics n'appellent jamais Streamlit : ils ajoutent des
+Diagnostic à une liste fournie par l'appelant. Un Diagnostic porte le niveau
+et le texte affichés par la page (show_messages), plus un code stable et des
+données (lignes ignorées, colonnes manquantes...) exploitables sans analyser
+le texte : journal des exports par lots, benchmarks, profilage.
+"""
+
+from collections import namedtuple
+
+import pandas as pd
+
+# Niveaux, du moins au plus grave (noms des fonctions st.success / st.info / ...)
+LEVELS = ('success', 'info', 'warning', 'error')
+
+Diagnostic = namedtuple('Diagnostic', ['level', 'text', 'code', 'data'], defaults=(None, None))
+Diagnostic.__doc__ = "Message d'un loader ou d'une analyse : niveau, texte, code stable, données."
+
+
+def add_diagnostic(messages, level, code, text, **data):
+    """Ajoute un Diagnostic à la liste `messages` et le retourne."""
+    diagnostic = Diagnostic(level, text, code, data)
+    messages.append(diagnostic)
+    return diagnostic
+
+
+def as_diagnostic(message):
+    """Diagnostic depuis un Diagnostic, un couple (niveau, texte) ou une liste JSON."""
+    if isinstance(message, Diagnostic):
+        return message
+    return Diagnostic(*message)
+
+
+def has_errors(messages):
+    """True si un des messages est de niveau 'error'."""
+    return any(as_diagnostic(message).level == 'error' for message in messages)
+
+
+def to_frame(messages):
+    """
+    Returns:
+        DataFrame: colonnes level, code, text, data (une ligne par message)
+    """
+    rows = [as_diagnostic(message)._asdict() for message in messages]
+    return pd.DataFrame(rows, columns=Diagnostic._fields)
@@ -0,0 +1,549 @@
+"""
+analytics/finance.py
+
+Chargement des ventes (Order Items) et calculs financiers de Finance Pro :
+frais Etsy, KPIs, analyse produits, période, score de santé, comparaison
+mensuelle et alertes.
+
+Les fonctions ne dépendent pas de Streamlit : les messages destinés à
+l'utilisateur sont des Diagnostic (analytics.diagnostics) ajoutés à une liste,
+affichée par la page (show_messages) ou écrite dans le journal d'un export
+par lots.
+"""
+
+import pandas as pd
+
+from analytics.cube import DailyCube, period_start
+from analytics.diagnostics import add_diagnostic
+from analytics.normalize import parse_money
+from analytics.schemas import read_export, ORDER_ITEMS, STATEMENT
+from analytics.streaming import SalesAggregate
+from analytics.timeindex import date_slice, index_by_date, month_starts, since
+from data_collection.ingest import ingest_upload
+
+
+# Périodes d'analyse (sidebar) → nombre de jours
+PERIOD_DAYS = {
+    "7 derniers jours": 7,
+    "30 derniers jours": 30,
+    "90 derniers jours": 90,
+    "1 an": 365
+}
+
+# Méthode de coûts « fichier CSV » (apply_costs)
+COSTS_FILE_METHOD = "Upload CSV avec coûts détaillés"
+
+# Source des frais quand ils viennent du relevé Etsy (et non d'une estimation)
+STATEMENT_FEES_SOURCE = "Relevé mensuel (frais réels)"
+
+
+def parse_sales(uploaded_file, messages):
+    """Charge et prépare les données depuis un CSV Etsy"""
+    try:
+        # Schéma Order Items : colonnes utiles, types déclarés, dates converties
+        df, columns_renamed = read_export(uploaded_file, ORDER_ITEMS)
+        if columns_renamed:
+            add_diagnostic(messages, 'info', 'columns_renamed', f"📋 Colonnes mappées : {', '.join([f'{k}→{v}' for k, v in columns_renamed.items()])}",
+                           columns=dict(columns_renamed))
+
+        # Vérifier les colonnes essentielles
+        required_columns = ['Date', 'Product', 'Price']
+        missing_columns = [col for col in required_columns if col not in df.columns]
+
+        if missing_columns:
+            add_diagnostic(messages, 'error', 'missing_columns', f"❌ Colonnes obligatoires manquantes : {', '.join(missing_columns)}",
+                           columns=missing_columns)
+            add_diagnostic(messages, 'info', 'expected_format', """
+            💡 **Format CSV attendu (minimum requis):**
+            - **Date** : 'Sale Date', 'Order Date', ou 'Date'
+            - **Produit** : 'Item Name', 'Product', ou 'Title'
+            - **Prix** : 'Item Price' ou 'Price'
+
+            **Colonnes optionnelles mais recommandées:**
+            - 'Quantity' (défaut: 1)
+            - 'Cost' (coûts matières - défaut: 0)
+            - 'Category' (catégorie produit)
+            """, columns=required_columns)
+            return None
+
+        # Dates invalides (déjà converties par le schéma)
+        if 'Date' in df.columns:
+            invalid_dates = df['Date'].isna().sum()
+            if invalid_dates > 0:
+                add_diagnostic(messages, 'warning', 'invalid_dates', f"⚠️ {invalid_dates} lignes avec dates invalides ont été ignorées",
+                               rows=int(invalid_dates))
+            df = df.dropna(subset=['Date'])
+
+        # Nettoyage des colonnes numériques (formats € / $ / 1 234,56)
+        numeric_columns = ['Price', 'Quantity', 'Cost', 'Shipping']
+        for col in numeric_columns:
+            if col in df.columns:
+                try:
+                    df[col] = parse_money(df[col])
+                except Exception as e:
+                    add_diagnostic(messages, 'warning', 'column_cleaning_failed', f"⚠️ Problème de nettoyage pour la colonne {col}: {e}",
+                                   column=col, error=repr(e))
+                    df[col] = 0
+
+        # Ajouter Quantity si manquant
+        if 'Quantity' not in df.columns:
+            df['Quantity'] = 1
+            add_diagnostic(messages, 'info', 'default_column', "ℹ️ Colonne 'Quantity' absente - Quantité fixée à 1 par défaut",
+                           column='Quantity', value=1)
+
+        # Ajouter Cost si manquant
+        if 'Cost' not in df.columns:
+            df['Cost'] = 0
+            add_diagnostic(messages, 'warning', 'default_column', """
+            ⚠️ **Colonne 'Cost' non trouvée**
+
+            Les marges sont calculées sans coûts matières (Cost = 0€).
+
+            **Pour ajouter vos coûts :**
+            1. Utilisez le module "Gestion des coûts" dans la barre latérale
+            2. Ou ajoutez une colonne 'Cost' à votre CSV
+            """, column='Cost', value=0)
+
+        # Ajouter Category si manquant
+        if 'Category' not in df.columns:
+            df['Category'] = 'Non catégorisé'
+            add_diagnostic(messages, 'info', 'default_column', "ℹ️ Colonne 'Category' absente - Tous les produits classés en 'Non catégorisé'",
+                           column='Category', value='Non catégorisé')
+
+        # Supprimer les lignes avec prix invalides
+        invalid_prices = (df['Price'].isna()) | (df['Price'] <= 0)
+        if invalid_prices.sum() > 0:
+            add_diagnostic(messages, 'warning', 'invalid_prices', f"⚠️ {invalid_prices.sum()} lignes avec prix invalides ont été ignorées",
+                           rows=int(invalid_prices.sum()))
+        df = df[~invalid_prices]
+
+        # Vérifier qu'il reste des données
+        if len(df) == 0:
+            add_diagnostic(messages, 'error', 'no_valid_rows', "❌ Aucune donnée valide trouvée après nettoyage !")
+            return None
+
+        # Tri chronologique sur un DatetimeIndex (périodes découpées par searchsorted)
+        df = index_by_date(df)
+
+        # Afficher un résumé détaillé
+        add_diagnostic(messages, 'success', 'loaded', f"""
+        ✅ **{len(df)} ventes chargées avec succès !**
+
+        📊 Période : {df['Date'].min().strftime('%d/%m/%Y')} → {df['Date'].max().strftime('%d/%m/%Y')}
+        💰 CA Total : {df['Price'].sum():.2f} €
+        """, rows=len(df), start=df['Date'].min().date().isoformat(), end=df['Date'].max().date().isoformat(),
+                       revenue=float(df['Price'].sum()))
+
+        return df
+
+    except Exception as e:
+        add_diagnostic(messages, 'error', 'load_failed', f"❌ Erreur lors du chargement des données : {e}", error=repr(e))
+        add_diagnostic(messages, 'info', 'expected_format', "💡 Vérifiez que votre fichier est bien au format CSV et qu'il contient les colonnes nécessaires.")
+        return None
+
+
+def apply_costs(df, cost_method, avg_cost=None, cost_file=None):
+    """Applique la méthode de coûts choisie (nouveau DataFrame, messages à afficher)"""
+    messages = []
+
+    if cost_method == "Coût moyen par produit":
+        df = df.assign(Cost=avg_cost)
+        add_diagnostic(messages, 'success', 'costs_applied', f"✅ Coût moyen de {avg_cost}€ appliqué à tous les produits", avg_cost=avg_cost)
+
+    elif cost_method == COSTS_FILE_METHOD and cost_file is not None:
+        try:
+            cost_df = pd.read_csv(ingest_upload(cost_file).stream())
+            if 'Product' in cost_df.columns and 'Cost' in cost_df.columns:
+                # Nettoyer la colonne Cost pour accepter format français (virgules)
+                cost_df['Cost'] = parse_money(cost_df['Cost'])
+
+                # Merger les coûts avec les données principales
+                df = df.merge(cost_df[['Product', 'Cost']], on='Product', how='left', suffixes=('', '_new'))
+                if 'Cost_new' in df.columns:
+                    df['Cost'] = df['Cost_new'].fillna(df.get('Cost', 0))
+                    df = df.drop('Cost_new', axis=1)
+                df['Cost'] = df['Cost'].fillna(0)
+                df = index_by_date(df)
+                products_with_cost = df[df['Cost'] > 0]['Product'].nunique()
+                add_diagnostic(messages, 'success', 'costs_applied', f"✅ Coûts importés pour {products_with_cost} produits",
+                               products=int(products_with_cost))
+            else:
+                add_diagnostic(messages, 'error', 'missing_columns', "❌ Le CSV doit contenir les colonnes 'Product' et 'Cost'",
+                               columns=['Product', 'Cost'])
+        except Exception as e:
+            add_diagnostic(messages, 'error', 'costs_failed', f"❌ Erreur lors de l'import des coûts : {e}", error=repr(e))
+
+    return df, messages
+
+
+def calculate_fees(sales, etsy_fees_config=None):
+    """Calcule les frais Etsy (relevé, configurateur ou estimation) pour un SalesAggregate"""
+    fees = {}
+    ca = sales.revenue
+    nb = sales.rows
+
+    # CALCUL DES FRAIS ETSY - NOUVELLE LOGIQUE
+    if etsy_fees_config and etsy_fees_config.get('statement_file'):
+        # MODE 1 : Relevé mensuel (frais exacts)
+        try:
+            statement_df, _ = read_export(etsy_fees_config['statement_file'], STATEMENT)
+
+            # Nettoyer les montants une seule fois, puis totaliser par type
+            fees_by_type = parse_money(statement_df['Frais Et Taxes']).groupby(statement_df['Type']).sum().abs()
+
+            def clean_fees(fee_type):
+                return fees_by_type.get(fee_type, 0)
+
+            frais_transaction = clean_fees('Transaction')
+            frais_marketing = clean_fees('Marketing')
+            frais_listing = clean_fees('Fiche produit')
+            frais_vat = clean_fees('VAT')
+            frais_tva = clean_fees('TVA')
+            frais_abonnement = clean_fees('Abonnement')
+
+            fees['frais_etsy_detail'] = {
+                'Transaction (6,5%)': frais_transaction,
+                'Marketing (Ads)': frais_marketing,
+                'Mise en vente (0,20€)': frais_listing,
+                'Traitement paiement': frais_vat,
+                'TVA (20%)': frais_tva,
+                'Abonnement': frais_abonnement
+            }
+
+            fees['frais_etsy'] = sum(fees['frais_etsy_detail'].values())
+            fees['fees_source'] = STATEMENT_FEES_SOURCE
+
+        except Exception as e:
+            # En cas d'erreur, retomber sur l'estimation
+            fees['frais_etsy'] = ca * 0.12
+            fees['frais_etsy_detail'] = {}
+            fees['fees_source'] = f"Estimation (erreur)"
+
+    elif etsy_fees_config and etsy_fees_config.get('method') == "Configurateur détaillé (recommandé)":
+        # MODE 2 : Configurateur détaillé
+
+        # Frais de base
+        frais_transaction = ca * 0.065
+        frais_listing = nb * 0.20
+        frais_payment = ca * 0.04 + nb * 0.30
+
+        # Frais optionnels
+        frais_offsite = ca * etsy_fees_config.get('offsite_ads_rate', 0) if etsy_fees_config.get('use_offsite_ads') else 0
+        frais_etsy_ads = etsy_fees_config.get('etsy_ads_budget', 0)
+        frais_plus = etsy_fees_config.get('etsy_plus_fee', 0)
+
+        # TVA (20% sur tous les frais hors Etsy Ads qui a déjà la TVA)
+        total_before_vat = frais_transaction + frais_listing + frais_payment + frais_offsite + frais_plus
+        frais_tva = total_before_vat * 0.20
+
+        fees['frais_etsy_detail'] = {
+            'Transaction (6,5%)': frais_transaction,
+            'Mise en vente (0,20€)': frais_listing,
+            'Traitement paiement': frais_payment,
+            'Offsite Ads': frais_offsite,
+            'Etsy Ads': frais_etsy_ads,
+            'Abonnement': frais_plus,
+            'TVA (20%)': frais_tva
+        }
+
+        fees['frais_etsy'] = sum(fees['frais_etsy_detail'].values())
+        fees['fees_source'] = "Configurateur détaillé"
+
+    else:
+        # MODE 3 : Estimation standard (rapide)
+        frais_transaction = ca * 0.065
+        frais_listing = nb * 0.20
+        frais_payment = ca * 0.04 + nb * 0.30
+
+        total_before_vat = frais_transaction + frais_listing + frais_payment
+        frais_tva = total_before_vat * 0.20
+
+        fees['frais_etsy_detail'] = {
+            'Transaction (6,5%)': frais_transaction,
+            'Mise en vente (0,20€)': frais_listing,
+            'Traitement paiement': frais_payment,
+            'TVA (20%)': frais_tva
+        }
+
+        fees['frais_etsy'] = total_before_vat + frais_tva
+        fees['fees_source'] = "Estimation standard (~12%)"
+
+    return fees
+
+
+def build_kpis(sales, fees):
+    """Assemble les KPIs à partir des totaux de ventes et des frais Etsy"""
+    kpis = {}
+
+    # CA total
+    kpis['ca_total'] = sales.revenue
+
+    # Nombre de ventes
+    kpis['nb_ventes'] = sales.rows
+
+    # Panier moyen
+    kpis['panier_moyen'] = kpis['ca_total'] / kpis['nb_ventes'] if kpis['nb_ventes'] > 0 else 0
+
+    # Frais Etsy (détail, total, source)
+    kpis['frais_etsy_detail'] = fees['frais_etsy_detail']
+    kpis['frais_etsy'] = fees['frais_etsy']
+    kpis['fees_source'] = fees['fees_source']
+
+    # Coûts matières (si fournis)
+    kpis['couts_matieres'] = sales.cost
+
+    # Marge brute
+    kpis['marge_brute'] = kpis['ca_total'] - kpis['frais_etsy'] - kpis['couts_matieres']
+    kpis['taux_marge'] = (kpis['marge_brute'] / kpis['ca_total'] * 100) if kpis['ca_total'] > 0 else 0
+
+    return kpis
+
+
+def calculate_kpis(df, etsy_fees_config=None):
+    """Calcule tous les KPIs essentiels avec frais Etsy réalistes (df : DataFrame ou SalesAggregate)"""
+    sales = df if isinstance(df, SalesAggregate) else SalesAggregate().add(df)
+    return build_kpis(sales, calculate_fees(sales, etsy_fees_config))
+
+
+def analyze_products(df):
+    """Analyse avancée des produits (df : DataFrame ou SalesAggregate)"""
+    if isinstance(df, SalesAggregate):
+        return df.products()
+
+    if 'Product' not in df.columns:
+        return None
+
+    return SalesAggregate().add(df).products()
+
+
+# ==================== PÉRIODES ====================
+
+def filter_period(cube, period):
+    """Restreint le cube journalier à la période choisie (cube, messages à afficher)"""
+    messages = []
+
+    if period != "Tout" and period in PERIOD_DAYS:
+        period_cube = cube.since(period_start(PERIOD_DAYS[period]))
+
+        if period_cube.empty:
+            add_diagnostic(messages, 'warning', 'empty_period',
+                           f"⚠️ Aucune donnée dans la période '{period}'. Affichage de toutes les données disponibles.",
+                           period=period)
+        else:
+            cube = period_cube
+
+    return cube, messages
+
+
+# ==================== INSIGHTS ====================
+
+def calculate_health_score(kpis, product_analysis):
+    """Calcule un score global de santé financière (0-100)"""
+    score = 0
+    details = {}
+
+    # 1. Score Marge (0-30 points)
+    marge_pct = kpis.get('taux_marge', 0)
+    if marge_pct >= 40:
+        marge_score = 30
+    elif marge_pct >= 35:
+        marge_score = 25
+    elif marge_pct >= 30:
+        marge_score = 20
+    elif marge_pct >= 25:
+        marge_score = 15
+    else:
+        marge_score = int(marge_pct / 2.5)
+
+    details['Marge'] = {
+        'score': marge_score,
+        'max': 30,
+        'value': f"{marge_pct:.1f}%",
+        'target': "35%+"
+    }
+    score += marge_score
+
+    # 2. Score Panier moyen (0-25 points)
+    panier = kpis.get('panier_moyen', 0)
+    if panier >= 40:
+        panier_score = 25
+    elif panier >= 35:
+        panier_score = 20
+    elif panier >= 30:
+        panier_score = 15
+    elif panier >= 25:
+        panier_score = 10
+    else:
+        panier_score = int(panier / 2.5)
+
+    details['Panier moyen'] = {
+        'score': panier_score,
+        'max': 25,
+        'value': f"{panier:.2f}€",
+        'target': "35€+"
+    }
+    score += panier_score
+
+    # 3. Score Diversification (0-25 points)
+    if product_analysis is not None and len(product_analysis) > 0:
+        product_analysis_sorted = product_analysis.sort_values('CA', ascending=False)
+        product_analysis_sorted['CA_cumul_pct'] = (
+            product_analysis_sorted['CA'].cumsum() / product_analysis_sorted['CA'].sum() * 100
+        )
+        products_for_80 = len(product_analysis_sorted[product_analysis_sorted['CA_cumul_pct'] <= 80])
+        total_products = len(product_analysis_sorted)
+
+        concentration_ratio = products_for_80 / total_products if total_products > 0 else 0
+
+        if concentration_ratio >= 0.5:
+            diversification_score = 5
+        elif concentration_ratio >= 0.3:
+            diversification_score = 10
+        elif concentration_ratio >= 0.2:
+            diversification_score = 15
+        elif concentration_ratio >= 0.1:
+            diversification_score = 20
+        else:
+            diversification_score = 25
+
+        details['Diversification'] = {
+            'score': diversification_score,
+            'max': 25,
+            'value': f"{products_for_80}/{total_products} produits = 80% CA",
+            'target': "< 20%"
+        }
+        score += diversification_score
+    else:
+        details['Diversification'] = {
+            'score': 0,
+            'max': 25,
+            'value': "N/A",
+            'target': "< 20%"
+        }
+
+    # 4. Score Rotation/Activité (0-20 points)
+    nb_ventes = kpis.get('nb_ventes', 0)
+    if nb_ventes >= 100:
+        activity_score = 20
+    elif nb_ventes >= 50:
+        activity_score = 15
+    elif nb_ventes >= 25:
+        activity_score = 10
+    elif nb_ventes >= 10:
+        activity_score = 5
+    else:
+        activity_score = 2
+
+    details['Activité'] = {
+        'score': activity_score,
+        'max': 20,
+        'value': f"{nb_ventes} ventes",
+        'target': "50+ ventes"
+    }
+    score += activity_score
+
+    return score, details
+
+
+def calculate_month_comparison(df):
+    """Compare le mois actuel avec le mois précédent (df : DataFrame ou DailyCube)"""
+    if isinstance(df, DailyCube):
+        if df.empty:
+            return None
+    elif 'Date' not in df.columns or len(df) == 0:
+        return None
+
+    current_month_start, previous_month_start = month_starts()
+
+    # Totaux (CA, nombre de ventes) des deux mois
+    if isinstance(df, DailyCube):
+        current = df.since(current_month_start).totals()
+        previous = df.between(previous_month_start, current_month_start).totals()
+        current_ca, current_ventes = current['Revenue'], current['Count']
+        previous_ca, previous_ventes = previous['Revenue'], previous['Count']
+    else:
+        df_current = since(df, current_month_start)
+        df_previous = date_slice(df, previous_month_start, current_month_start)
+        current_ca, current_ventes = df_current['Price'].sum(), len(df_current)
+        previous_ca, previous_ventes = df_previous['Price'].sum(), len(df_previous)
+
+    if previous_ventes == 0:
+        return None
+
+    comparison = {
+        'current_ca': current_ca if current_ventes > 0 else 0,
+        'previous_ca': previous_ca,
+        'current_ventes': current_ventes,
+        'previous_ventes': previous_ventes,
+        'current_panier': current_ca / current_ventes if current_ventes > 0 else 0,
+        'previous_panier': previous_ca / previous_ventes
+    }
+
+    # Calculer les variations
+    comparison['ca_variation'] = ((comparison['current_ca'] - comparison['previous_ca']) /
+                                  comparison['previous_ca'] * 100) if comparison['previous_ca'] > 0 else 0
+    comparison['ventes_variation'] = ((comparison['current_ventes'] - comparison['previous_ventes']) /
+                                      comparison['previous_ventes'] * 100) if comparison['previous_ventes'] > 0 else 0
+    comparison['panier_variation'] = ((comparison['current_panier'] - comparison['previous_panier']) /
+                                      comparison['previous_panier'] * 100) if comparison['previous_panier'] > 0 else 0
+
+    return comparison
+
+
+def generate_alerts(kpis, comparison, product_analysis):
+    """Génère des alertes opportunités basées sur les données (max 3)"""
+    alerts = []
+
+    # Alerte 1 : Baisse de CA
+    if comparison and comparison.get('ca_variation', 0) < -10:
+        alerts.append({
+            'type': 'warning',
+            'icon': '⚠️',
+            'title': 'Baisse significative du CA',
+            'message': f"Votre CA a baissé de {abs(comparison['ca_variation']):.1f}% ce mois",
+            'action': "Analysez les causes : saisonnalité, concurrence, ou problème de stock ?"
+        })
+
+    # Alerte 2 : Hausse de CA
+    if comparison and comparison.get('ca_variation', 0) > 15:
+        alerts.append({
+            'type': 'success',
+            'icon': '📈',
+            'title': 'Excellente performance',
+            'message': f"Votre CA a augmenté de {comparison['ca_variation']:.1f}% ce mois !",
+            'action': "Identifiez ce qui fonctionne et répliquez la stratégie"
+        })
+
+    # Alerte 3 : Produit qui cartonne
+    if product_analysis is not None and len(product_analysis) > 0:
+        top_product = product_analysis.iloc[0]
+        if top_product['Ventes'] >= 10:
+            alerts.append({
+                'type': 'success',
+                'icon': '⚡',
+                'title': 'Best-seller détecté',
+                'message': f"'{top_product['Product'][:40]}...' performe excellemment ({int(top_product['Ventes'])} ventes)",
+                'action': "Créez des variantes, augmentez le stock, boostez avec Etsy Ads"
+            })
+
+    # Alerte 4 : Marge faible
+    if kpis.get('taux_marge', 0) < 30:
+        alerts.append({
+            'type': 'warning',
+            'icon': '📉',
+            'title': 'Marge sous le seuil critique',
+            'message': f"Votre marge de {kpis['taux_marge']:.1f}% est inférieure à 30%",
+            'action': "Réduisez vos coûts ou augmentez vos prix de 5-10%"
+        })
+
+    # Alerte 5 : Panier moyen faible
+    if kpis.get('panier_moyen', 0) < 25:
+        alerts.append({
+            'type': 'info',
+            'icon': '💡',
+            'title': 'Opportunité : Augmenter le panier moyen',
+            'message': f"Votre panier moyen ({kpis['panier_moyen']:.2f}€) peut être amélioré",
+            'action': "Créez des bundles ou proposez la livraison gratuite à partir de 40€"
+        })
+
+    return alerts[:3]  # Limiter à 3 alertes max
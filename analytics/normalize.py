@@ -0,0 +1,202 @@
+"""
+analytics/normalize.py
+
+Normalisation partagée des exports Etsy : montants et noms de colonnes.
+
+parse_money() remplace les chaînes .str.replace('€').str.replace('$')...
+recopiées dans chaque loader : les valeurs sont factorisées (une seule passe
+sur les lignes), puis seules les valeurs distinctes sont nettoyées par une
+regex compilée. Formats européens (1 234,56 €) et américains ($1,234.56).
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# Symboles et codes devise, espaces (y compris insécables)
+_MONEY_NOISE = re.compile("[€$£\\s\u00a0\u202f]|EUR|USD|GBP")
+
+
+def _parse_money_strings(values):
+    """Convertit des chaînes monétaires distinctes en float (NaN si illisible)."""
+    values = values.str.replace(_MONEY_NOISE, '', regex=True)
+
+    last_comma = values.str.rfind(',').to_numpy()
+    last_dot = values.str.rfind('.').to_numpy()
+    commas = values.str.count(',').to_numpy()
+    dots = values.str.count(r'\.').to_numpy()
+
+    # Virgule décimale : dernière position, et pas "1,234,567" sans point
+    comma_decimal = (last_comma > last_dot) & ~((commas > 1) & (dots == 0))
+    # Points de milliers : "1.234.567" ou "1.234,56"
+    drop_dots = comma_decimal | (dots > 1)
+
+    no_dots = values.str.replace('.', '', regex=False)
+    no_commas = values.str.replace(',', '', regex=False)
+
+    cleaned = np.where(
+        comma_decimal,
+        no_dots.str.replace(',', '.', regex=False),
+        np.where(drop_dots, no_commas.str.replace('.', '', regex=False), no_commas)
+    )
+
+    return pd.to_numeric(pd.Series(cleaned, dtype=object), errors='coerce').to_numpy(dtype=float)
+
+
+def parse_money(series, fill_value=0):
+    """
+    Convertit une colonne de montants Etsy en float.
+
+    Args:
+        series (Series): Montants (texte ou déjà numériques)
+        fill_value: Valeur des montants vides/illisibles (None pour garder NaN)
+
+    Returns:
+        Series de float, même index que l'entrée
+    """
+    if not isinstance(series, pd.Series):
+        series = pd.Series(series)
+
+    if pd.api.types.is_numeric_dtype(series):
+        result = pd.to_numeric(series, errors='coerce').astype(float)
+    else:
+        codes, uniques = pd.factorize(series)
+        parsed = _parse_money_strings(pd.Series(uniques, dtype=object).astype(str))
+        # Code -1 (valeur manquante) → NaN
+        parsed = np.append(parsed, np.nan)
+        result = pd.Series(parsed[codes], index=series.index, name=series.name)
+
+    if fill_value is not None:
+        result = result.fillna(fill_value)
+
+    return result
+
+
+# Noms de pays des exports Etsy en français → noms anglais
+COUNTRY_NAMES = {
+    'Etats-Unis': 'United States',
+    'États-Unis': 'United States',
+    'Grande-Bretagne': 'United Kingdom',
+    'Royaume-Uni': 'United Kingdom',
+    'Allemagne': 'Germany',
+    'Espagne': 'Spain',
+    'Italie': 'Italy',
+    'Pays-Bas': 'Netherlands',
+    'Suisse': 'Switzerland',
+    'Belgique': 'Belgium',
+    'Andorre': 'Andorra',
+    'Grèce': 'Greece',
+    'Norvège': 'Norway'
+}
+
+
+def normalize_countries(series):
+    """Traduit les noms de pays (appliqué aux catégories, pas à chaque ligne)."""
+    return series.astype('category').map(lambda country: COUNTRY_NAMES.get(country, country)).astype('category')
+
+
+def resolve_columns(df, aliases):
+    """
+    Renomme les colonnes d'un export vers les noms standardisés.
+
+    Pour chaque colonne cible, une colonne déjà présente sous ce nom est gardée ;
+    sinon le premier alias présent (dans l'ordre de la liste) est renommé.
+
+    Args:
+        df (DataFrame): Export brut
+        aliases (dict): {colonne cible: [alias, ...]}
+
+    Returns:
+        tuple: (DataFrame renommé, dict {ancien nom: nouveau nom})
+    """
+    columns = set(df.columns)
+    renamed = {}
+
+    for target, names in aliases.items():
+        if target in columns:
+            continue
+
+        for name in names:
+            if name in columns and name not in renamed:
+                renamed[name] = target
+                break
+
+    if renamed:
+        df = df.rename(columns=renamed)
+
+    return df, renamed
+
+
+# Formats de date des exports Etsy, testés dans cet ordre (US avant FR,
+# comme le parsing 'mixed' historique)
+DATE_FORMATS = [
+    '%m/%d/%y',
+    '%m/%d/%Y',
+    '%d/%m/%Y',
+    '%d/%m/%y',
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%m/%d/%Y %H:%M',
+    '%d/%m/%Y %H:%M',
+    '%d.%m.%Y',
+    '%B %d, %Y',
+    '%b %d, %Y'
+]
+
+# Nombre maximum de valeurs distinctes utilisées pour détecter le format
+DATE_SAMPLE_SIZE = 5000
+
+
+def detect_date_format(values):
+    """
+    Détecte une seule fois le format d'une colonne de dates.
+
+    Returns:
+        str ou None: premier format de DATE_FORMATS qui lit tout l'échantillon
+    """
+    sample = pd.Series(values, dtype=object).dropna().astype(str).str.strip()
+    sample = sample[sample != ''].head(DATE_SAMPLE_SIZE)
+
+    if sample.empty:
+        return None
+
+    for date_format in DATE_FORMATS:
+        try:
+            pd.to_datetime(sample, format=date_format)
+            return date_format
+        except (ValueError, TypeError):
+            continue
+
+    return None
+
+
+def parse_dates(series, date_format=None):
+    """
+    Convertit une colonne de dates (format détecté une fois, valeurs distinctes
+    parsées une seule fois). Les valeurs hors format passent par 'mixed'.
+
+    Args:
+        series (Series): Dates texte
+        date_format (str): Format déjà détecté (lecture par blocs), sinon détecté ici
+
+    Returns:
+        Series datetime64, NaT si illisible
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    date_format = date_format or detect_date_format(uniques)
+
+    parsed = pd.to_datetime(uniques, format=date_format or 'mixed', errors='coerce')
+
+    if date_format is not None:
+        leftovers = parsed.isna() & (uniques != '')
+        if leftovers.any():
+            parsed[leftovers] = pd.to_datetime(uniques[leftovers], format='mixed', errors='coerce')
+
+    values = pd.DatetimeIndex(parsed).take(codes, allow_fill=True, fill_value=pd.NaT)
+    return pd.Series(values, index=series.index, name=series.name)
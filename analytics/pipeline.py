@@ -0,0 +1,118 @@
+"""
+analytics/pipeline.py
+
+Graphe d'étapes d'analyse mémoïsées, pour ne recalculer à chaque rerun que
+ce qu'un changement de widget affecte.
+
+Chaque étape déclare ses entrées (entrées du graphe ou autres étapes). Son
+jeton de version est dérivé des jetons de ses entrées : tant qu'il ne change
+pas, le résultat mémorisé est réutilisé. Les résultats sont rangés dans un
+dict fourni par l'appelant (ex: st.session_state) ; les définitions du graphe
+peuvent donc être reconstruites à chaque rerun sans perdre les résultats.
+
+Les résultats mémorisés sont partagés d'un rerun à l'autre : les étapes et le
+code appelant ne doivent pas les modifier en place. Une étape transitoire
+(lignes brutes déjà gardées par le cache de parsing, DataFrame intermédiaire)
+n'est pas rangée dans le dict : elle n'est recalculée que si une étape
+mémorisée qui en dépend doit l'être.
+"""
+
+import time
+
+_MISSING = object()
+
+
+class AnalysisGraph:
+    """
+    Étapes nommées, évaluées à la demande et mémoïsées par jeton d'entrées.
+
+    Args:
+        store (dict): Résultats mémorisés {étape: (jeton, résultat)}
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else {}
+        self.timings = {}
+        self._stages = {}
+        self._inputs = {}
+        self._transient = {}
+
+    def add_stage(self, name, fn, inputs=(), transient=False):
+        """
+        Déclare une étape : fn reçoit les valeurs de `inputs`, dans l'ordre.
+
+        Args:
+            transient (bool): Résultat gardé pour ce rerun seulement, hors du
+                              store (ex: DataFrame complet d'un fichier)
+
+        Returns:
+            AnalysisGraph: self (déclarations chaînables)
+        """
+        self._stages[name] = (fn, tuple(inputs), transient)
+        return self
+
+    def set_input(self, name, value, token=_MISSING):
+        """
+        Fixe une entrée du graphe.
+
+        Args:
+            name (str): Nom de l'entrée
+            value: Valeur transmise aux étapes
+            token: Version de la valeur (ex: SHA-256 d'un fichier) ; par défaut
+                   la valeur elle-même si elle est hashable, sinon son id()
+        """
+        if token is _MISSING:
+            try:
+                hash(value)
+                token = value
+            except TypeError:
+                token = ('id', id(value))
+
+        self._inputs[name] = (value, token)
+        return self
+
+    def token(self, name):
+        """Jeton de version d'une entrée ou d'une étape."""
+        if name in self._inputs:
+            return self._inputs[name][1]
+
+        _, inputs, _ = self._stages[name]
+        return (name, tuple(self.token(dependency) for dependency in inputs))
+
+    def get(self, name):
+        """Résultat d'une entrée ou d'une étape (recalculée seulement si ses entrées ont changé)."""
+        if name in self._inputs:
+            return self._inputs[name][0]
+
+        if name not in self._stages:
+            raise KeyError(f"Étape ou entrée inconnue : {name}")
+
+        fn, inputs, transient = self._stages[name]
+        token = self.token(name)
+        results = self._transient if transient else self.store
+
+        cached = results.get(name)
+        if cached is not None and cached[0] == token:
+            self.timings.setdefault(name, (0.0, False))
+            return cached[1]
+
+        values = [self.get(dependency) for dependency in inputs]
+
+        start = time.perf_counter()
+        result = fn(*values)
+        self.timings[name] = (time.perf_counter() - start, True)
+
+        results[name] = (token, result)
+        return result
+
+    def timing_rows(self):
+        """
+        Temps des étapes évaluées depuis la création du graphe.
+
+        Returns:
+            list: [{'Étape', 'Temps (ms)', 'Recalculée'}], dans l'ordre d'évaluation
+        """
+        return [
+            {'Étape': name, 'Temps (ms)': round(seconds * 1000, 1), 'Recalculée': recomputed}
+            for name, (seconds, recomputed) in self.timings.items()
+        ]
@@ -0,0 +1,268 @@
+"""
+analytics/schemas.py
+
+Schémas déclarés des exports Etsy (Sold Orders, Order Items, Listings,
+Statement, Reviews).
+
+Chaque schéma connaît les en-têtes acceptés (anglais / français), les types
+des colonnes, les colonnes catégorielles et les colonnes de dates.
+read_export() ne charge que les colonnes utiles (usecols), utilise le moteur
+CSV pyarrow quand il est installé et que l'export n'a pas de champs
+multi-lignes, puis renomme les colonnes et convertit les dates (format
+détecté une fois par colonne).
+"""
+
+import csv
+import io
+import os
+
+import pandas as pd
+
+from analytics.normalize import parse_dates, resolve_columns
+
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+class ExportSchema:
+    """
+    Schéma d'un type d'export Etsy.
+
+    Args:
+        name (str): Nom de l'export
+        aliases (dict): {colonne standardisée: [en-têtes acceptés]}
+        dtypes (dict): {colonne standardisée: dtype à la lecture}
+        dates (tuple): Colonnes standardisées à convertir en datetime
+        categories (tuple): Colonnes standardisées lues en 'category'
+        keep_prefixes (tuple): Préfixes d'en-têtes à garder en plus (ex: IMAGE1..10)
+        multiline (bool): Champs texte multi-lignes (moteur pyarrow non utilisable)
+        encoding (str): Encodage du fichier
+    """
+
+    def __init__(self, name, aliases, dtypes=None, dates=(), categories=(),
+                 keep_prefixes=(), multiline=False, encoding='utf-8'):
+        self.name = name
+        self.aliases = aliases
+        self.dtypes = dtypes or {}
+        self.dates = tuple(dates)
+        self.categories = tuple(categories)
+        self.keep_prefixes = tuple(prefix.upper() for prefix in keep_prefixes)
+        self.multiline = multiline
+        self.encoding = encoding
+
+        # En-tête brut → colonne standardisée
+        self._targets = {}
+        for target, names in aliases.items():
+            self._targets.setdefault(target, target)
+            for raw_name in names:
+                self._targets.setdefault(raw_name, target)
+
+    def select_columns(self, header):
+        """Colonnes de l'en-tête à charger (usecols)."""
+        return [
+            column for column in header
+            if column in self._targets
+            or (self.keep_prefixes and column.upper().startswith(self.keep_prefixes))
+        ]
+
+    def read_dtypes(self, columns):
+        """dtypes à passer à read_csv, par en-tête brut."""
+        dtypes = {}
+
+        for column in columns:
+            target = self._targets.get(column)
+            if target in self.categories:
+                dtypes[column] = 'category'
+            elif target in self.dtypes:
+                dtypes[column] = self.dtypes[target]
+
+        return dtypes
+
+
+SOLD_ORDERS = ExportSchema(
+    'Sold Orders',
+    aliases={
+        'Date': ['Date de vente', 'Sale Date'],
+        'Order_ID': ['Commande n°', 'Order ID'],
+        'Buyer': ['Acheteur'],
+        'Buyer_Name': ['Nom complet', 'Full Name'],
+        'Country': ['Pays de livraison', 'Ship Country'],
+        'City': ['Ville de livraison', 'Ship City'],
+        'Total': ['Total de la commande', 'Order Total'],
+        'Ship_Date': ["Date d'envoi", 'Date Shipped'],
+        'Date_Paid': ['Date Paid']
+    },
+    dtypes={
+        'Order_ID': str,
+        'Buyer': str,
+        'Buyer_Name': str,
+        'Total': str
+    },
+    dates=('Date', 'Ship_Date', 'Date_Paid'),
+    categories=('Country', 'City')
+)
+
+ORDER_ITEMS = ExportSchema(
+    'Order Items',
+    aliases={
+        'Date': ['Sale Date', 'Order Date', 'date', 'order_date', 'Date Paid', 'Date de vente', 'Date de commande'],
+        'Product': ['Item Name', 'item_name', 'product', 'Title'],
+        'Price': ['Item Price', 'item_price', 'price', 'Valeur de la commande', 'Total de la commande'],
+        'Quantity': ['quantity', "Nombre d'articles"],
+        'Cost': ['cost', 'Cout', 'Coût'],
+        'Shipping': ['Shipping Price', 'shipping_price', 'Order Shipping', 'Frais de livraison'],
+        'Category': ['category', 'Catégorie', 'Categorie'],
+        'Order_ID': ['Order ID']
+    },
+    dtypes={
+        'Price': str,
+        'Cost': str,
+        'Shipping': str,
+        'Order_ID': str
+    },
+    dates=('Date',),
+    categories=('Product', 'Category')
+)
+
+LISTINGS = ExportSchema(
+    'Listings',
+    aliases={
+        'Title': ['TITRE', 'TITLE'],
+        'Description': ['DESCRIPTION'],
+        'Price': ['PRIX', 'PRICE'],
+        'Tags': ['TAGS'],
+        'Quantity': ['QUANTITÉ', 'QUANTITY'],
+        'SKU': ['RÉFÉRENCE', 'Reference']
+    },
+    dtypes={
+        'Title': str,
+        'Description': str,
+        'Price': str,
+        'Tags': str,
+        'SKU': str
+    },
+    keep_prefixes=('IMAGE',),
+    multiline=True
+)
+
+STATEMENT = ExportSchema(
+    'Statement',
+    aliases={
+        'Date': [],
+        'Type': [],
+        'Frais Et Taxes': ['Fees & Taxes']
+    },
+    dtypes={
+        'Frais Et Taxes': str
+    },
+    dates=('Date',),
+    categories=('Type',),
+    encoding='latin1'
+)
+
+REVIEWS = ExportSchema(
+    'Reviews',
+    aliases={
+        'Date': ['Review Date'],
+        'Rating': ['Star Rating'],
+        'Review_Text': ['Review', 'Comment', 'Message'],
+        'Reviewer': ['Buyer'],
+        'Order_ID': ['Order ID']
+    },
+    dtypes={
+        'Review_Text': str,
+        'Reviewer': str,
+        'Order_ID': str
+    },
+    dates=('Date',),
+    multiline=True
+)
+
+
+def read_header(source, encoding='utf-8'):
+    """Lit uniquement la ligne d'en-tête d'un CSV, puis revient au début du flux."""
+    source.seek(0)
+    first_line = source.readline()
+    source.seek(0)
+
+    if isinstance(first_line, bytes):
+        first_line = first_line.decode(encoding, errors='replace')
+
+    first_line = first_line.lstrip('\ufeff')
+    return next(csv.reader(io.StringIO(first_line)), [])
+
+
+def read_options(source, schema):
+    """
+    Returns:
+        tuple: (usecols, dtypes) à passer à read_csv pour ce fichier
+    """
+    header = read_header(source, schema.encoding)
+    usecols = (schema.select_columns(header) if header else None) or None
+    return usecols, schema.read_dtypes(usecols or [])
+
+
+def read_export(source, schema):
+    """
+    Charge un export Etsy selon son schéma.
+
+    Args:
+        source: Flux du fichier (UploadedFile, BytesIO)
+        schema (ExportSchema): Schéma de l'export
+
+    Returns:
+        tuple: (DataFrame aux colonnes standardisées, dict des colonnes renommées)
+    """
+    usecols, dtypes = read_options(source, schema)
+
+    df = None
+
+    if PYARROW_AVAILABLE and not schema.multiline and usecols:
+        try:
+            df = pd.read_csv(source, encoding=schema.encoding, usecols=usecols,
+                             dtype=dtypes, engine='pyarrow')
+        except Exception:
+            # Export atypique : on retombe sur le moteur C
+            source.seek(0)
+            df = None
+
+    if df is None:
+        df = pd.read_csv(source, encoding=schema.encoding, usecols=usecols, dtype=dtypes)
+
+    df, renamed = resolve_columns(df, schema.aliases)
+
+    for column in schema.dates:
+        if column in df.columns:
+            df[column] = parse_dates(df[column])
+
+    return df, renamed
+
+
+# Type d'export → fragments du nom de fichier (minuscules, sans '_' ni '-'),
+# testés dans l'ordre : les items avant les commandes
+EXPORT_KINDS = [
+    ('costs', ('costs', 'couts')),
+    ('statement', ('statement', 'releve')),
+    ('reviews', ('reviews', 'avis')),
+    ('listings', ('listings',)),
+    ('order_items', ('orderitems', 'items')),
+    ('orders', ('orders', 'commandes'))
+]
+
+EXPORT_EXTENSIONS = ('.csv', '.json')
+
+
+def classify_export(file_name):
+    """Type d'export d'après le nom du fichier (None si non reconnu)."""
+    name, extension = os.path.splitext(os.path.basename(file_name).lower())
+    if extension not in EXPORT_EXTENSIONS:
+        return None
+
+    name = name.replace('_', '').replace('-', '').replace(' ', '')
+    for kind, fragments in EXPORT_KINDS:
+        if any(fragment in name for fragment in fragments):
+            return kind
+    return None
@@ -0,0 +1,264 @@
+"""
+analytics/sentiment.py
+
+Comptage des mots-clés positifs / négatifs dans les reviews.
+
+Les listes de mots-clés sont rangées par langue (SENTIMENT_KEYWORDS) et
+peuvent être complétées (register_keywords, load_keywords_file). Pour un jeu
+de langues, get_matcher() construit une seule fois une regex en arbre (trie)
+couvrant tous les mots-clés, réutilisée ensuite pour toutes les reviews.
+
+Les comptes sont identiques à `text.lower().count(keyword)` pour chaque
+mot-clé, y compris quand des mots-clés se chevauchent ('ravi' / 'ravie',
+'top' dans 'stop') : à chaque position trouvée, le plus long mot-clé est
+crédité avec tous les mots-clés qui en sont des préfixes.
+"""
+
+import json
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# Mots-clés par langue : {langue: {'positive': [...], 'negative': [...]}}
+SENTIMENT_KEYWORDS = {
+    'fr': {
+        'positive': ['parfait', 'super', 'excellent', 'magnifique', 'rapide', 'soigné',
+                     'qualité', 'recommande', 'joli', 'conforme', 'ravie', 'ravi',
+                     'merci', 'top'],
+        'negative': ['déçue', 'déçu', 'abîme', 'retard', 'problème', 'mauvais',
+                     'petit', 'pas reçu', 'fraude']
+    },
+    'en': {
+        'positive': ['beautiful', 'love', 'great', 'quality', 'recommend', 'thank',
+                     'perfect', 'excellent', 'super', 'top'],
+        'negative': ['disappointed', 'broken', 'bad', 'poor', 'late', 'delay',
+                     'problem', 'small', 'not received', 'scam']
+    }
+}
+
+# Langues analysées par défaut (reviews françaises et anglaises)
+DEFAULT_LOCALES = ('fr', 'en')
+
+POLARITIES = ('positive', 'negative')
+
+
+def _trie_pattern(keywords):
+    """Regex en arbre : à chaque position, un seul caractère à comparer par niveau."""
+    trie = {}
+
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Mot-clé complet à ce niveau : la suite est optionnelle (gourmande = le plus long)
+        return '(?:' + body + ')?' if '' in node else body
+
+    return re.compile(build(trie))
+
+
+def _self_overlaps(keyword):
+    """Vrai si deux occurrences du mot-clé peuvent se chevaucher ('aa', 'abab')."""
+    return any(keyword[:size] == keyword[-size:] for size in range(1, len(keyword)))
+
+
+class KeywordMatcher:
+    """
+    Compte un ensemble de mots-clés en un seul parcours du texte.
+
+    Args:
+        keywords (dict): {mot-clé: polarité} ('positive' / 'negative')
+    """
+
+    def __init__(self, keywords):
+        self.keywords = []
+        self.polarities = []
+
+        for keyword, polarity in keywords.items():
+            keyword = str(keyword).strip().lower()
+            # Le séparateur '\n' du mode batch ne doit jamais faire partie d'un mot-clé
+            if keyword and '\n' not in keyword and keyword not in self.keywords:
+                self.keywords.append(keyword)
+                self.polarities.append(polarity)
+
+        ids = {keyword: i for i, keyword in enumerate(self.keywords)}
+
+        # Mot-clé trouvé → ids de lui-même et des mots-clés qui en sont des préfixes
+        self._ids_at = {
+            keyword: [ids[other] for other in self.keywords if keyword.startswith(other)]
+            for keyword in self.keywords
+        }
+        self._self_overlapping = {ids[keyword] for keyword in self.keywords if _self_overlaps(keyword)}
+        self._pattern = _trie_pattern(self.keywords) if self.keywords else None
+
+    def _scan(self, text):
+        """
+        Returns:
+            tuple: (positions de début, ids des mots-clés), dans l'ordre du texte
+        """
+        starts = []
+        found = []
+
+        if self._pattern is None:
+            return starts, found
+
+        search = self._pattern.search
+        ids_at = self._ids_at
+        last_end = {}
+
+        match = search(text)
+        while match is not None:
+            start = match.start()
+
+            for keyword_id in ids_at[match.group()]:
+                if keyword_id in self._self_overlapping:
+                    # str.count ne compte pas les occurrences qui se chevauchent
+                    if start < last_end.get(keyword_id, 0):
+                        continue
+                    last_end[keyword_id] = start + len(self.keywords[keyword_id])
+
+                starts.append(start)
+                found.append(keyword_id)
+
+            match = search(text, start + 1)
+
+        return starts, found
+
+    def count(self, text):
+        """
+        Occurrences de chaque mot-clé dans un texte.
+
+        Returns:
+            Counter: {mot-clé: nombre d'occurrences}
+        """
+        if pd.isna(text) or not text:
+            return Counter()
+
+        _, found = self._scan(str(text).lower())
+        return Counter(self.keywords[keyword_id] for keyword_id in found)
+
+    def _scan_column(self, texts):
+        """Parcourt toute la colonne en une fois (textes joints par '\\n')."""
+        texts = pd.Series(texts)
+        lowered = texts.fillna('').astype(str).str.lower().tolist()
+
+        # Fin (exclue) de chaque texte dans le corpus joint, séparateur compris
+        ends = np.cumsum(np.fromiter(map(len, lowered), dtype=np.int64, count=len(lowered)) + 1)
+
+        starts, found = self._scan('\n'.join(lowered))
+        rows = np.searchsorted(ends, np.asarray(starts, dtype=np.int64), side='right')
+
+        return texts.index, rows, np.asarray(found, dtype=np.int64)
+
+    def count_batch(self, texts):
+        """
+        Occurrences par review, sur toute la colonne.
+
+        Args:
+            texts (Series): Textes des reviews
+
+        Returns:
+            DataFrame: une ligne par texte (même index), une colonne par mot-clé
+        """
+        index, rows, found = self._scan_column(texts)
+
+        matrix = np.zeros((len(index), len(self.keywords)), dtype=np.int32)
+        np.add.at(matrix, (rows, found), 1)
+
+        return pd.DataFrame(matrix, index=index, columns=self.keywords)
+
+    def totals(self, texts):
+        """
+        Occurrences cumulées sur toute la colonne, par polarité.
+
+        Les mots-clés sont insérés dans l'ordre de leur première apparition
+        (départage des égalités de most_common()).
+
+        Returns:
+            dict: {polarité: Counter}
+        """
+        _, rows, found = self._scan_column(texts)
+
+        totals = {polarity: Counter() for polarity in POLARITIES}
+        if len(found) == 0:
+            return totals
+
+        counts = np.bincount(found, minlength=len(self.keywords))
+        first_seen = np.full(len(self.keywords), len(rows), dtype=np.int64)
+        np.minimum.at(first_seen, found, rows)
+
+        for keyword_id in sorted(np.flatnonzero(counts), key=lambda i: (first_seen[i], i)):
+            polarity = self.polarities[keyword_id]
+            totals.setdefault(polarity, Counter())[self.keywords[keyword_id]] = int(counts[keyword_id])
+
+        return totals
+
+
+_matchers = {}
+_lock = threading.Lock()
+
+
+def register_keywords(locale, positive=(), negative=()):
+    """Ajoute des mots-clés pour une langue (les matchers concernés sont reconstruits)."""
+    with _lock:
+        lists = SENTIMENT_KEYWORDS.setdefault(locale, {'positive': [], 'negative': []})
+        lists.setdefault('positive', []).extend(positive)
+        lists.setdefault('negative', []).extend(negative)
+
+        for locales in [key for key in _matchers if locale in key]:
+            del _matchers[locales]
+
+
+def load_keywords_file(path):
+    """
+    Charge des mots-clés depuis un JSON {langue: {'positive': [...], 'negative': [...]}}.
+
+    Returns:
+        list: Langues chargées
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    for locale, lists in data.items():
+        register_keywords(locale, lists.get('positive', []), lists.get('negative', []))
+
+    return list(data)
+
+
+def get_matcher(locales=DEFAULT_LOCALES):
+    """Matcher des langues demandées (construit une fois, puis réutilisé)."""
+    locales = tuple(locales)
+
+    with _lock:
+        matcher = _matchers.get(locales)
+        if matcher is None:
+            keywords = {}
+            for polarity in POLARITIES:
+                for locale in locales:
+                    for keyword in SENTIMENT_KEYWORDS.get(locale, {}).get(polarity, []):
+                        keywords.setdefault(keyword, polarity)
+
+            matcher = KeywordMatcher(keywords)
+            _matchers[locales] = matcher
+
+    return matcher
+
+
+def sentiment_counts(texts, locales=DEFAULT_LOCALES):
+    """
+    Returns:
+        tuple: (Counter positifs, Counter négatifs) sur toute la colonne
+    """
+    totals = get_matcher(locales).totals(texts)
+    return totals['positive'], totals['negative']
@@ -0,0 +1,257 @@
+"""
+analytics/seo.py
+
+Score SEO des titres de listings, calculé en colonnes sur toute la Series.
+
+score_titles() calcule les sous-scores (longueur, segments séparés par des
+virgules, mots-clés, emojis, majuscule) avec str.len / str.count /
+str.contains sur toute la colonne. Les problèmes et recommandations ne sont
+générés que pour les listings affichés (title_feedback).
+
+Contient aussi le chargement des exports du SEO Analyzer (listings, ventes)
+et le tableau d'analyse des listings (build_seo_analysis), sans dépendance à
+Streamlit : les messages sont des Diagnostic ajoutés à une liste.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from analytics.diagnostics import add_diagnostic
+from analytics.normalize import parse_money
+from analytics.schemas import read_export, LISTINGS, ORDER_ITEMS
+from analytics.text_stats import count_terms, get_stop_words
+from analytics.timeindex import index_by_date
+
+# Mots-clés importants pour bijoux
+JEWELRY_KEYWORDS = ['bracelet', 'bague', 'collier', 'boucles', 'bijou', 'argent',
+                    'or', 'protection', 'cadeau', 'femme', 'homme', 'sterling']
+
+# Caractères spéciaux attrayants
+SPECIAL_CHARACTERS = ['✨', '💎', '🎁', '❤️']
+
+_SPECIAL_RE = re.compile('|'.join(map(re.escape, SPECIAL_CHARACTERS)))
+
+
+def score_titles(titles):
+    """
+    Score SEO (0-100) de chaque titre.
+
+    Args:
+        titles (Series): Titres des listings
+
+    Returns:
+        DataFrame (même index) : SEO_Score, Title_Length, Title_Segments,
+        Keywords_Found, Has_Special, Capitalized, Title_Missing
+    """
+    titles = pd.Series(titles)
+    missing = titles.isna().to_numpy()
+    text = titles.fillna('').astype(str).reset_index(drop=True)
+
+    length = text.str.len().to_numpy()
+    segments = text.str.count(',').to_numpy() + 1
+
+    # Nombre de mots-clés distincts présents (même règle que `kw in title`)
+    text_lower = text.str.lower()
+    keywords_found = np.zeros(len(text), dtype=int)
+    for keyword in JEWELRY_KEYWORDS:
+        keywords_found += text_lower.str.contains(keyword, regex=False).to_numpy(dtype=bool)
+
+    has_special = text.str.contains(_SPECIAL_RE).to_numpy(dtype=bool)
+    capitalized = text.str[:1].str.isupper().to_numpy(dtype=bool)
+
+    # Longueur optimale (140 caractères max Etsy)
+    length_score = np.select(
+        [(length >= 100) & (length <= 140), (length >= 80) & (length < 100), length < 80],
+        [30, 20, 10],
+        default=15
+    )
+    segments_score = np.select([segments >= 3, segments >= 2], [25, 15], default=5)
+    keywords_score = np.select([keywords_found >= 2, keywords_found >= 1], [25, 15], default=5)
+
+    score = length_score + segments_score + keywords_score + 10 * has_special + 10 * capitalized
+    score = np.where(missing, 0, np.minimum(score, 100))
+
+    return pd.DataFrame({
+        'SEO_Score': score,
+        'Title_Length': length,
+        'Title_Segments': segments,
+        'Keywords_Found': keywords_found,
+        'Has_Special': has_special,
+        'Capitalized': capitalized,
+        'Title_Missing': missing
+    }, index=titles.index)
+
+
+def title_feedback(row):
+    """
+    Problèmes et recommandations d'un titre, depuis une ligne de score_titles().
+
+    Returns:
+        tuple: (issues, recommendations)
+    """
+    if row['Title_Missing']:
+        return ["❌ Titre manquant"], ["Ajoutez un titre descriptif"]
+
+    issues = []
+    recommendations = []
+
+    title_len = row['Title_Length']
+    if 80 <= title_len < 100:
+        recommendations.append("📏 Augmentez la longueur du titre (optimal: 100-140 caractères)")
+    elif title_len < 80:
+        issues.append("❌ Titre trop court")
+        recommendations.append("📏 Allongez votre titre à 100-140 caractères")
+    elif title_len > 140:
+        issues.append("⚠️ Titre trop long")
+        recommendations.append("✂️ Réduisez à 140 caractères maximum")
+
+    if row['Title_Segments'] == 2:
+        recommendations.append("📝 Ajoutez plus de mots-clés séparés par des virgules")
+    elif row['Title_Segments'] < 2:
+        issues.append("❌ Pas assez de mots-clés")
+        recommendations.append("📝 Utilisez des virgules pour séparer les mots-clés")
+
+    if row['Keywords_Found'] == 1:
+        recommendations.append("🎯 Ajoutez plus de mots-clés pertinents")
+    elif row['Keywords_Found'] == 0:
+        issues.append("❌ Manque de mots-clés pertinents")
+        recommendations.append("🎯 Incluez des mots comme 'bracelet', 'argent', 'cadeau', etc.")
+
+    if not row['Capitalized']:
+        recommendations.append("🔤 Mettez la première lettre en majuscule")
+
+    return issues, recommendations
+
+
+def calculate_title_seo_score(title):
+    """Calcule le score SEO d'un titre (0-100)"""
+    row = score_titles(pd.Series([title])).iloc[0]
+    issues, recommendations = title_feedback(row)
+    return int(row['SEO_Score']), issues, recommendations
+
+
+# ==================== CHARGEMENT ====================
+
+def parse_listings(uploaded_file, messages):
+    """Charge les listings Etsy"""
+    try:
+        # Schéma Listings : titres, prix, tags et colonnes IMAGE
+        df, _ = read_export(uploaded_file, LISTINGS)
+
+        # Vérifier les colonnes essentielles
+        required = ['Title', 'Price']
+        missing = [col for col in required if col not in df.columns]
+
+        if missing:
+            add_diagnostic(messages, 'error', 'missing_columns', f"❌ Colonnes manquantes : {', '.join(missing)}", columns=missing)
+            return None
+
+        # Nettoyer les données
+        if 'Price' in df.columns:
+            df['Price'] = parse_money(df['Price'], fill_value=None)
+
+        # Compter le nombre d'images
+        image_cols = [col for col in df.columns if 'IMAGE' in col.upper()]
+        df['Num_Images'] = df[image_cols].notna().sum(axis=1)
+
+        add_diagnostic(messages, 'success', 'loaded', f"✅ {len(df)} listings chargés avec succès !", rows=len(df))
+
+        return df
+
+    except Exception as e:
+        add_diagnostic(messages, 'error', 'load_failed', f"❌ Erreur : {e}", error=repr(e))
+        return None
+
+
+def parse_sales(uploaded_file, messages):
+    """Charge les données de ventes"""
+    try:
+        # Schéma Order Items : colonnes utiles, types déclarés, dates converties
+        df, _ = read_export(uploaded_file, ORDER_ITEMS)
+
+        if 'Date' in df.columns:
+            df = index_by_date(df.dropna(subset=['Date']))
+
+        if 'Price' in df.columns:
+            df['Price'] = parse_money(df['Price'], fill_value=None)
+
+        if 'Quantity' not in df.columns:
+            df['Quantity'] = 1
+
+        add_diagnostic(messages, 'success', 'loaded', f"✅ {len(df)} ventes chargées avec succès !", rows=len(df))
+
+        return df
+
+    except Exception as e:
+        add_diagnostic(messages, 'error', 'load_failed', f"❌ Erreur : {e}", error=repr(e))
+        return None
+
+
+# ==================== ANALYSE DES LISTINGS ====================
+
+def analyze_listing_performance(listings_df, sales_df):
+    """Croise les listings avec les ventes pour identifier les performances"""
+
+    if sales_df is None or 'Product' not in sales_df.columns:
+        return None
+
+    # Compter les ventes par produit
+    sales_count = sales_df.groupby('Product', observed=True).agg({
+        'Quantity': 'sum',
+        'Price': 'sum'
+    }).reset_index()
+    sales_count.columns = ['Title', 'Sales_Count', 'Revenue']
+
+    # Merger avec les listings
+    performance = listings_df.merge(sales_count, on='Title', how='left')
+    performance['Sales_Count'] = performance['Sales_Count'].fillna(0)
+    performance['Revenue'] = performance['Revenue'].fillna(0)
+
+    return performance
+
+
+def build_seo_analysis(listings_df, sales_df=None):
+    """
+    Score SEO de tous les listings, croisé avec les ventes si disponibles.
+
+    Returns:
+        DataFrame: Title, SEO_Score, Price, Num_Images, sous-scores de
+                   score_titles() et, avec les ventes, Sales_Count et Revenue
+    """
+    seo_scores = score_titles(listings_df['Title'])
+    seo_analysis = pd.DataFrame({
+        'Title': listings_df['Title'],
+        'SEO_Score': seo_scores['SEO_Score'],
+        'Price': listings_df['Price'] if 'Price' in listings_df.columns else 0,
+        'Num_Images': listings_df['Num_Images'] if 'Num_Images' in listings_df.columns else 0
+    }).join(seo_scores.drop(columns='SEO_Score')).reset_index(drop=True)
+
+    if sales_df is not None:
+        performance_df = analyze_listing_performance(listings_df, sales_df)
+        if performance_df is not None:
+            seo_analysis = seo_analysis.merge(
+                performance_df[['Title', 'Sales_Count', 'Revenue']],
+                on='Title',
+                how='left'
+            )
+            seo_analysis['Sales_Count'] = seo_analysis['Sales_Count'].fillna(0)
+            seo_analysis['Revenue'] = seo_analysis['Revenue'].fillna(0)
+
+    return seo_analysis
+
+
+def analyze_tags(tags_str):
+    """Analyse les tags d'un listing"""
+    if pd.isna(tags_str):
+        return []
+
+    # Séparer les tags (par virgule ou point-virgule)
+    tags = re.split(r'[,;]', str(tags_str))
+    return [tag.strip().lower() for tag in tags if tag.strip()]
+
+
+def extract_keywords_from_titles(titles):
+    """Extrait les mots-clés les plus fréquents des titres"""
+    return count_terms(titles, 'title_words', stop_words=get_stop_words('titles'))
@@ -0,0 +1,328 @@
+"""
+analytics/streaming.py
+
+Ingestion par blocs des très gros exports (plusieurs années de ventes).
+
+Le CSV est lu par blocs de CHUNK_ROWS lignes, chaque bloc est nettoyé puis
+replié dans des agrégats (totaux, par produit, par pays, par ville, par
+client) : les lignes brutes ne sont jamais toutes en mémoire. Les agrégats
+produisent exactement les tableaux de calculate_kpis(), analyze_products(),
+analyze_geography() et analyze_customer_retention() ; ces fonctions
+utilisent les mêmes agrégats sur un DataFrame déjà chargé.
+"""
+
+from datetime import datetime
+
+import pandas as pd
+
+from analytics.normalize import (
+    detect_date_format, normalize_countries, parse_dates, parse_money, resolve_columns
+)
+from analytics.schemas import read_options
+
+# Lignes par bloc
+CHUNK_ROWS = 100_000
+
+# Au-delà de cette taille, les dashboards passent en mode streaming
+STREAMING_THRESHOLD_BYTES = 100 * 1024 * 1024
+
+# Nombre de résultats partiels clients avant fusion
+_MAX_PARTIALS = 16
+
+
+def is_large_upload(size):
+    """True si un fichier de `size` octets doit être traité en streaming."""
+    return size is not None and size > STREAMING_THRESHOLD_BYTES
+
+
+def iter_export(source, schema, chunksize=CHUNK_ROWS):
+    """
+    Lit un export Etsy par blocs (mêmes colonnes, types et renommages que
+    read_export). Le format de chaque colonne de dates est détecté sur le
+    premier bloc puis réutilisé.
+
+    Yields:
+        DataFrame: bloc aux colonnes standardisées
+    """
+    usecols, dtypes = read_options(source, schema)
+    date_formats = {}
+
+    reader = pd.read_csv(source, encoding=schema.encoding, usecols=usecols,
+                         dtype=dtypes, chunksize=chunksize)
+
+    for chunk in reader:
+        chunk, _ = resolve_columns(chunk, schema.aliases)
+
+        for column in schema.dates:
+            if column in chunk.columns:
+                if column not in date_formats:
+                    date_formats[column] = detect_date_format(chunk[column].dropna().unique())
+                chunk[column] = parse_dates(chunk[column], date_formats[column])
+
+        yield chunk
+
+
+def _sum_frames(total, part):
+    part.index = part.index.astype(object)
+    return part if total is None else total.add(part, fill_value=0)
+
+
+# ==================== VENTES (Finance) ====================
+
+def clean_sales_chunk(chunk, cost_value=None, cost_map=None):
+    """Nettoyage d'un bloc Order Items, identique à load_data() (finance)."""
+    chunk = chunk.dropna(subset=['Date'])
+
+    for column in ('Price', 'Quantity', 'Cost', 'Shipping'):
+        if column in chunk.columns:
+            chunk[column] = parse_money(chunk[column])
+
+    if 'Quantity' not in chunk.columns:
+        chunk['Quantity'] = 1
+
+    # Coûts : coût moyen, ou CSV de coûts par produit
+    if cost_value is not None:
+        chunk['Cost'] = cost_value
+    elif cost_map:
+        mapped = chunk['Product'].astype(object).map(cost_map)
+        chunk['Cost'] = mapped.fillna(chunk['Cost'] if 'Cost' in chunk.columns else 0)
+
+    if 'Cost' not in chunk.columns:
+        chunk['Cost'] = 0
+
+    return chunk[chunk['Price'] > 0]
+
+
+class SalesAggregate:
+    """Totaux et ventes par produit, repliés bloc par bloc."""
+
+    def __init__(self):
+        self.rows = 0
+        self.revenue = 0.0
+        self.cost = 0.0
+        self.has_cost = False
+        self.first_date = None
+        self.last_date = None
+        self._products = None
+
+    def add(self, df):
+        """Replie un bloc (ou un DataFrame complet) dans l'agrégat."""
+        self.rows += len(df)
+
+        if 'Price' in df.columns:
+            self.revenue += df['Price'].sum()
+
+        if 'Cost' in df.columns:
+            self.has_cost = True
+            self.cost += df['Cost'].sum()
+
+        if 'Date' in df.columns and len(df) > 0:
+            first, last = df['Date'].min(), df['Date'].max()
+            self.first_date = first if self.first_date is None else min(self.first_date, first)
+            self.last_date = last if self.last_date is None else max(self.last_date, last)
+
+        if 'Product' in df.columns and 'Price' in df.columns:
+            work = pd.DataFrame({
+                'CA': df['Price'],
+                'Ventes': df['Price'].notna().astype(int),
+                'Cout_total': df['Cost'] if 'Cost' in df.columns else 0
+            }, index=df.index)
+            part = work.groupby(df['Product'], observed=True).sum()
+            self._products = _sum_frames(self._products, part)
+
+        return self
+
+    def add_cube(self, cube):
+        """Replie un cube journalier de ventes (analytics/cube.py, dimension Product)."""
+        totals = cube.totals()
+        self.rows += totals['Count']
+        self.revenue += totals.get('Revenue', 0.0)
+
+        if 'Cost' in totals:
+            self.has_cost = True
+            self.cost += totals['Cost']
+
+        if not cube.empty:
+            first, last = cube.first_day, cube.last_day
+            self.first_date = first if self.first_date is None else min(self.first_date, first)
+            self.last_date = last if self.last_date is None else max(self.last_date, last)
+
+        if 'Product' in cube.dimensions and 'Revenue' in cube.measures:
+            by_product = cube.by_dimension('Product', ['Revenue'] + (['Cost'] if 'Cost' in cube.measures else []))
+            part = pd.DataFrame({
+                'CA': by_product['Revenue'],
+                'Ventes': by_product['Count'],
+                'Cout_total': by_product['Cost'] if 'Cost' in by_product.columns else 0
+            }, index=by_product.index)
+            self._products = _sum_frames(self._products, part)
+
+        return self
+
+    def products(self):
+        """Tableau de analyze_products()."""
+        if self._products is None:
+            return None
+
+        product_analysis = self._products.rename_axis('Product').reset_index()
+        product_analysis['Ventes'] = product_analysis['Ventes'].astype(int)
+        product_analysis['Prix_moyen'] = product_analysis['CA'] / product_analysis['Ventes']
+        product_analysis = product_analysis[['Product', 'CA', 'Ventes', 'Prix_moyen', 'Cout_total']]
+
+        # Calculs de marges
+        product_analysis['Marge'] = product_analysis['CA'] - product_analysis['Cout_total']
+        product_analysis['Taux_marge'] = (product_analysis['Marge'] / product_analysis['CA'] * 100).round(2)
+
+        return product_analysis.sort_values('CA', ascending=False)
+
+
+def stream_sales(source, schema, since=None, cost_value=None, cost_map=None, chunksize=CHUNK_ROWS):
+    """
+    Agrège un export de ventes sans le charger entièrement.
+
+    Args:
+        since (datetime): Début de la période filtrée (optionnel)
+        cost_value (float): Coût moyen appliqué à chaque vente
+        cost_map (dict): Coût par produit (CSV de coûts)
+
+    Returns:
+        tuple: (SalesAggregate toutes périodes, SalesAggregate de la période ou None)
+    """
+    all_sales = SalesAggregate()
+    period_sales = SalesAggregate() if since is not None else None
+
+    for chunk in iter_export(source, schema, chunksize):
+        chunk = clean_sales_chunk(chunk, cost_value, cost_map)
+        all_sales.add(chunk)
+
+        if period_sales is not None:
+            period_sales.add(chunk[chunk['Date'] >= since])
+
+    return all_sales, period_sales
+
+
+# ==================== COMMANDES (Customer Intelligence) ====================
+
+def clean_orders_chunk(chunk):
+    """Nettoyage d'un bloc Sold Orders, identique à load_orders_data()."""
+    if 'Total' in chunk.columns:
+        chunk['Total'] = parse_money(chunk['Total'], fill_value=None)
+
+    if 'Country' in chunk.columns:
+        chunk['Country'] = normalize_countries(chunk['Country'])
+
+    return chunk.dropna(subset=['Date'])
+
+
+class OrdersAggregate:
+    """Commandes par pays, par ville et par client, repliées bloc par bloc."""
+
+    def __init__(self):
+        self.rows = 0
+        self._countries = None
+        self._cities = None
+        self._customers = []
+
+    def add(self, df):
+        """Replie un bloc (ou un DataFrame complet) dans l'agrégat."""
+        self.rows += len(df)
+
+        work = pd.DataFrame({
+            'Orders': df['Order_ID'].notna().astype(int) if 'Order_ID' in df.columns else 1,
+            'Revenue': df['Total'] if 'Total' in df.columns else 0.0
+        }, index=df.index)
+
+        if 'Country' in df.columns:
+            self._countries = _sum_frames(self._countries, work.groupby(df['Country'], observed=True).sum())
+
+        if 'City' in df.columns:
+            self._cities = _sum_frames(self._cities, work.groupby(df['City'], observed=True).sum())
+
+        if 'Buyer' in df.columns:
+            part = pd.DataFrame({
+                'Num_Orders': work['Orders'],
+                'Total_Spent': work['Revenue'],
+                'First_Order': df['Date'],
+                'Last_Order': df['Date']
+            }).groupby(df['Buyer'], observed=True).agg({
+                'Num_Orders': 'sum',
+                'Total_Spent': 'sum',
+                'First_Order': 'min',
+                'Last_Order': 'max'
+            })
+            part.index = part.index.astype(object)
+            self._customers.append(part)
+
+            if len(self._customers) > _MAX_PARTIALS:
+                self._customers = [self._merge_customers()]
+
+        return self
+
+    def _merge_customers(self):
+        return pd.concat(self._customers).groupby(level=0).agg({
+            'Num_Orders': 'sum',
+            'Total_Spent': 'sum',
+            'First_Order': 'min',
+            'Last_Order': 'max'
+        })
+
+    def geography(self):
+        """Tableaux de analyze_geography() : (par pays, top 10 villes)."""
+        if self._countries is None:
+            return None, None
+
+        country_analysis = self._countries.rename_axis('Country').reset_index()
+        country_analysis['Orders'] = country_analysis['Orders'].astype(int)
+        country_analysis['Avg_Basket'] = country_analysis['Revenue'] / country_analysis['Orders']
+        country_analysis = country_analysis.sort_values('Revenue', ascending=False)
+
+        city_analysis = None
+        if self._cities is not None:
+            city_analysis = self._cities.rename_axis('City').reset_index()
+            city_analysis['Orders'] = city_analysis['Orders'].astype(int)
+            city_analysis = city_analysis.sort_values('Orders', ascending=False).head(10)
+
+        return country_analysis, city_analysis
+
+    def customers(self):
+        """Tableau de analyze_customer_retention()."""
+        if not self._customers:
+            return None
+
+        customer_analysis = self._merge_customers().rename_axis('Buyer').reset_index()
+        customer_analysis['Num_Orders'] = customer_analysis['Num_Orders'].astype(int)
+
+        # Calcul du délai entre achats
+        customer_analysis['Days_Between_Orders'] = (
+            customer_analysis['Last_Order'] - customer_analysis['First_Order']
+        ).dt.days / (customer_analysis['Num_Orders'] - 1)
+
+        customer_analysis['Days_Between_Orders'] = customer_analysis['Days_Between_Orders'].fillna(0)
+
+        # Lifetime Value
+        customer_analysis['LTV'] = customer_analysis['Total_Spent']
+
+        # Clients à risque (pas d'achat depuis 90+ jours)
+        customer_analysis['Days_Since_Last'] = (datetime.now() - customer_analysis['Last_Order']).dt.days
+        customer_analysis['Churn_Risk'] = customer_analysis['Days_Since_Last'] > 90
+
+        return customer_analysis
+
+
+def stream_orders(source, schema, since=None, chunksize=CHUNK_ROWS):
+    """
+    Agrège un export de commandes sans le charger entièrement.
+
+    Returns:
+        OrdersAggregate: commandes de la période (toutes si since est None)
+    """
+    orders = OrdersAggregate()
+
+    for chunk in iter_export(source, schema, chunksize):
+        chunk = clean_orders_chunk(chunk)
+
+        if since is not None:
+            chunk = chunk[chunk['Date'] >= since]
+
+        orders.add(chunk)
+
+    return orders
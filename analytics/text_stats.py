@@ -0,0 +1,125 @@
+"""
+analytics/text_stats.py
+
+Fréquences de mots sur une colonne de texte (avis, titres, tags).
+
+count_terms() traite la colonne par blocs de BLOCK_ROWS lignes : les textes
+du bloc sont mis en minuscules en une opération, joints par '\\n', puis
+découpés par un seul appel regex (findall ou split). Les mots du bloc sont
+comptés directement dans le Counter : la liste de tous les mots de la
+colonne n'existe jamais en mémoire. Les mots vides (registre STOP_WORDS)
+et les mots trop courts sont retirés une fois à la fin, sur les mots
+distincts seulement.
+"""
+
+import heapq
+import re
+from collections import Counter
+from operator import itemgetter
+
+import pandas as pd
+
+# Lignes traitées par bloc (borne la mémoire des mots intermédiaires)
+BLOCK_ROWS = 20_000
+
+# Tokenizers : motif, mode (findall ou split), longueur minimale, strip des mots
+TOKENIZERS = {
+    # Mots d'au moins 3 lettres (avis clients)
+    'words': {
+        'pattern': re.compile(r'\b[a-zàâäéèêëïîôùûüÿç]{3,}\b'),
+        'split': False,
+        'min_length': 3,
+        'strip': False
+    },
+    # Segments séparés par virgules / espaces, plus de 3 caractères (titres)
+    'title_words': {
+        'pattern': re.compile(r'[,\s]+'),
+        'split': True,
+        'min_length': 4,
+        'strip': False
+    },
+    # Tags séparés par virgule ou point-virgule
+    'tags': {
+        'pattern': re.compile(r'[,;\n]'),
+        'split': True,
+        'min_length': 1,
+        'strip': True
+    }
+}
+
+# Registre des mots vides, par usage
+STOP_WORDS = {
+    'reviews': {
+        'le', 'la', 'les', 'un', 'une', 'des', 'de', 'du', 'et', 'à', 'a', 'au',
+        'pour', 'avec', 'dans', 'sur', 'par', 'est', 'qui', 'que', 'the', 'and',
+        'for', 'with', 'in', 'on', 'at', 'to', 'of', 'is', 'it', 'my', 'i',
+        'très', 'bien', 'pas', 'c', 'il', 'j', 'ai', 'me', 'ma', 'mon'
+    },
+    'titles': {'pour', 'avec', 'dans', 'the', 'and', 'for', 'with'}
+}
+
+
+def register_stop_words(name, words):
+    """Ajoute des mots vides à un ensemble du registre (créé si besoin)."""
+    STOP_WORDS.setdefault(name, set()).update(word.lower() for word in words)
+
+
+def get_stop_words(*names):
+    """Union des ensembles de mots vides demandés."""
+    stop_words = set()
+    for name in names:
+        stop_words |= STOP_WORDS.get(name, set())
+    return stop_words
+
+
+def _blocks(texts, block_rows):
+    texts = pd.Series(texts).dropna()
+
+    for start in range(0, len(texts), block_rows):
+        block = texts.iloc[start:start + block_rows].astype(str).str.lower()
+        yield '\n'.join(block.tolist())
+
+
+def count_terms(texts, tokenizer='words', stop_words=None, block_rows=BLOCK_ROWS):
+    """
+    Compte les mots d'une colonne de texte.
+
+    Args:
+        texts (Series): Textes (les valeurs manquantes sont ignorées)
+        tokenizer (str): Clé de TOKENIZERS
+        stop_words (set): Mots à exclure
+        block_rows (int): Lignes par bloc
+
+    Returns:
+        Counter: {mot: occurrences}, dans l'ordre de première apparition
+    """
+    spec = TOKENIZERS[tokenizer]
+    tokenize = spec['pattern'].split if spec['split'] else spec['pattern'].findall
+
+    counts = Counter()
+    for block in _blocks(texts, block_rows):
+        counts.update(tokenize(block))
+
+    if spec['strip']:
+        stripped = Counter()
+        for term, count in counts.items():
+            stripped[term.strip()] += count
+        counts = stripped
+
+    # Filtrage sur les mots distincts uniquement
+    stop_words = stop_words or ()
+    min_length = spec['min_length']
+    for term in [term for term in counts if len(term) < min_length or term in stop_words]:
+        del counts[term]
+
+    return counts
+
+
+def top_terms(counts, k):
+    """
+    Les k mots les plus fréquents (tas de taille k, sans tri complet).
+
+    Returns:
+        list: [(mot, occurrences)], égalités dans l'ordre de première apparition
+    """
+    return heapq.nlargest(k, counts.items(), key=itemgetter(1))
@@ -0,0 +1,83 @@
+"""
+analytics/timeindex.py
+
+Index de dates trié et découpage de périodes par recherche dichotomique.
+
+Les loaders renvoient des DataFrames triés par date avec un DatetimeIndex
+(index_by_date ; la colonne Date est conservée). Une période (depuis une date,
+mois en cours, mois précédent, N derniers jours) est alors une tranche iloc
+trouvée par searchsorted en O(log n), sans masque booléen ni copie des lignes.
+Un DataFrame non trié (ou avec des dates manquantes) retombe sur le masque.
+"""
+
+from datetime import datetime
+
+import pandas as pd
+
+from analytics.cube import period_start
+
+
+def index_by_date(df, column='Date'):
+    """Trie par date (tri stable) et pose un DatetimeIndex sans nom sur ces dates."""
+    if column not in df.columns:
+        return df
+
+    df = df.sort_values(column, kind='stable')
+    df.index = pd.DatetimeIndex(df[column]).rename(None)
+    return df
+
+
+def is_date_indexed(df):
+    """True si le DataFrame a un DatetimeIndex trié, sans date manquante."""
+    index = df.index
+    return isinstance(index, pd.DatetimeIndex) and index.is_monotonic_increasing and not index.hasnans
+
+
+def date_slice(df, start=None, end=None, column='Date'):
+    """
+    Lignes dont la date est dans [start, end).
+
+    Args:
+        df (DataFrame): Cadre indexé par index_by_date (sinon masque sur `column`)
+        start, end: Bornes (datetime) ; None = non bornée
+
+    Returns:
+        DataFrame: tranche du cadre (vue, sans copie des lignes)
+    """
+    if not is_date_indexed(df):
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= df[column] >= start
+        if end is not None:
+            mask &= df[column] < end
+        return df[mask]
+
+    first = df.index.searchsorted(pd.Timestamp(start), side='left') if start is not None else 0
+    last = df.index.searchsorted(pd.Timestamp(end), side='left') if end is not None else len(df)
+    return df.iloc[first:last]
+
+
+def since(df, start, column='Date'):
+    """Lignes à partir de `start` (inclus)."""
+    return date_slice(df, start, None, column)
+
+
+def last_days(df, days, now=None, column='Date'):
+    """Lignes des `days` derniers jours (jours entiers, comme period_start)."""
+    return since(df, period_start(days, now), column)
+
+
+def month_starts(now=None):
+    """
+    Returns:
+        tuple: (début du mois en cours, début du mois précédent)
+    """
+    now = now or datetime.now()
+    current_month_start = datetime(now.year, now.month, 1)
+
+    if now.month == 1:
+        previous_month_start = datetime(now.year - 1, 12, 1)
+    else:
+        previous_month_start = datetime(now.year, now.month - 1, 1)
+
+    return current_month_start, previous_month_start
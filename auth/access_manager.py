@@ -1,6 +1,16 @@
 import streamlit as st
 from datetime import datetime, timedelta
 
+from auth.supabase_pool import get_pooled_client, reset_pooled_client, is_connection_error
+from auth.entitlements import get_entitlement_cache
+from auth.usage_meter import SupabaseUsageMeter, build_quota, needs_reset, parse_timestamp, DEBOUNCE_MINUTES
+from auth.write_behind import WriteBehindQueue, register_queue
+from auth.user_context import (
+    get_cached_user_context,
+    set_user_context,
+    update_user_context
+)
+
 DEBUG_MODE = False
 
 DASHBOARD_ACCESS = {
@@ -24,25 +34,117 @@ PURCHASE_LINKS = {
 }
 
 
-def get_supabase_client():
+def _get_supabase_credentials(service_role=False):
+    url = st.secrets["supabase"]["url"]
+    key = st.secrets["supabase"]["service_role_key" if service_role else "key"]
+    return url, key
+
+
+def get_storage_client_factory():
+    """
+    Fabrique du client service_role partagé (Storage), utilisable depuis les
+    threads de fond : les identifiants sont lus ici, pas dans le thread.
+    """
+    url, key = _get_supabase_credentials(service_role=True)
+    return lambda: get_pooled_client(url, key)
+
+
+def get_supabase_client(service_role=False):
+    """
+    Retourne le client Supabase partagé par le processus (pool keep-alive).
+    
+    Args:
+        service_role (bool): Utiliser la clé service_role (collecte Storage)
+    
+    Returns:
+        Client Supabase ou None si non configuré
+    """
     try:
         if "supabase" not in st.secrets:
             st.error("❌ Secrets Supabase non configurés")
             return None
         
-        url = st.secrets["supabase"]["url"]
-        key = st.secrets["supabase"]["key"]
-        
-        from supabase import create_client
-        client = create_client(url, key)
-        
-        return client
+        url, key = _get_supabase_credentials(service_role)
+        return get_pooled_client(url, key)
         
     except Exception as e:
         st.error(f"❌ Erreur initialisation Supabase: {e}")
         return None
 
 
+def reset_supabase_client(service_role=False):
+    """Force la reconnexion du client partagé (après une erreur réseau)."""
+    try:
+        url, key = _get_supabase_credentials(service_role)
+        reset_pooled_client(url, key)
+    except Exception:
+        pass
+
+
+_write_queue = None
+
+
+def get_write_behind_queue():
+    """
+    File d'écritures différées du processus (last_login, timestamps Premium).
+    Les identifiants sont lus ici, le thread de flush n'accède pas à st.secrets.
+    """
+    global _write_queue
+    
+    if _write_queue is None:
+        url, key = _get_supabase_credentials()
+        _write_queue = register_queue(WriteBehindQueue(lambda: get_pooled_client(url, key)))
+    
+    return _write_queue
+
+
+def defer_customer_update(column, value, values):
+    """
+    Met à jour `customers` en arrière-plan (écriture non critique).
+    Retombe sur une écriture synchrone si la file n'est pas disponible.
+    """
+    try:
+        get_write_behind_queue().enqueue('customers', column, value, values)
+    except Exception:
+        supabase = get_supabase_client()
+        if supabase is not None:
+            supabase.table('customers').update(values).eq(column, value).execute()
+
+
+def get_user_context(customer_id=None, email=None):
+    """
+    Retourne le contexte utilisateur (ligne `customers` complète).
+    Utilise le cache de session, sinon fait un unique select('*').
+    
+    Args:
+        customer_id: UUID du client (prioritaire)
+        email: Email du client
+    
+    Returns:
+        UserContext ou None
+    """
+    context = get_cached_user_context(customer_id=customer_id, email=email)
+    if context is not None:
+        return context
+    
+    supabase = get_supabase_client()
+    
+    if supabase is None:
+        return None
+    
+    column, value = ('id', customer_id) if customer_id is not None else ('email', email)
+    
+    response = supabase.table('customers') \
+        .select('*') \
+        .eq(column, value) \
+        .execute()
+    
+    if not response.data:
+        return None
+    
+    return set_user_context(response.data[0])
+
+
 def check_access():
     if 'access_key' in st.session_state and st.session_state['access_key']:
         access_key = st.session_state['access_key']
@@ -61,6 +163,13 @@ def check_access():
         """)
         st.stop()
     
+    # Contexte déjà chargé dans cette session → aucune requête
+    context = get_cached_user_context(access_key=access_key)
+    if context is not None:
+        st.session_state['access_key'] = access_key
+        st.session_state['user_info'] = context.data
+        return context.data
+    
     supabase = get_supabase_client()
     
     if supabase is None:
@@ -94,26 +203,38 @@ def check_access():
             """)
             st.stop()
         
-        # Update last_login
+        # Update last_login (différé, hors du chemin critique)
+        last_login = datetime.now().isoformat()
         try:
-            supabase.table('customers') \
-                .update({'last_login': datetime.now().isoformat()}) \
-                .eq('access_key', access_key) \
-                .execute()
+            defer_customer_update('access_key', access_key, {'last_login': last_login})
+            user_info['last_login'] = last_login
         except:
             pass
         
+        context = set_user_context(user_info)
+        
         st.session_state['access_key'] = access_key
-        st.session_state['user_info'] = user_info
+        st.session_state['user_info'] = context.data
         
-        return user_info
+        return context.data
         
     except Exception as e:
+        if is_connection_error(e):
+            reset_supabase_client()
         st.error(f"❌ Erreur lors de la vérification d'accès: {e}")
         st.stop()
 
 
 def get_user_products(customer_id):
+    """
+    Retourne les produits achetés par le client (cache processus avec TTL).
+    """
+    cache = get_entitlement_cache()
+    
+    products = cache.get(customer_id)
+    if products is not None:
+        return products
+    
     try:
         supabase = get_supabase_client()
         
@@ -125,10 +246,9 @@ def get_user_products(customer_id):
             .eq('customer_id', customer_id) \
             .execute()
         
-        if not response.data:
-            return []
+        products = [p['product_id'] for p in response.data] if response.data else []
+        cache.set(customer_id, products)
         
-        products = [p['product_id'] for p in response.data]
         return products
         
     except Exception as e:
@@ -136,6 +256,72 @@ def get_user_products(customer_id):
         return []
 
 
+def get_products_for_customers(customer_ids):
+    """
+    Résout les produits de plusieurs clients en une seule requête
+    (seuls les clients absents du cache sont interrogés).
+    
+    Args:
+        customer_ids (list): UUIDs des clients
+    
+    Returns:
+        dict: {customer_id: [product_id, ...]}
+    """
+    cache = get_entitlement_cache()
+    products_by_customer, missing = cache.get_many(list(dict.fromkeys(customer_ids)))
+    
+    if not missing:
+        return products_by_customer
+    
+    try:
+        supabase = get_supabase_client()
+        
+        if supabase is None:
+            return products_by_customer
+        
+        response = supabase.table('customer_products') \
+            .select('customer_id, product_id') \
+            .in_('customer_id', missing) \
+            .execute()
+        
+        fetched = {customer_id: [] for customer_id in missing}
+        for row in response.data or []:
+            fetched[row['customer_id']].append(row['product_id'])
+        
+        for customer_id, products in fetched.items():
+            cache.set(customer_id, products)
+        
+        products_by_customer.update(fetched)
+        return products_by_customer
+        
+    except Exception as e:
+        if DEBUG_MODE:
+            st.warning(f"⚠️ Erreur get_products_for_customers : {e}")
+        return products_by_customer
+
+
+def get_insights_subscribers(customer_ids):
+    """
+    Version batch de has_insights_subscription()
+    
+    Returns:
+        dict: {customer_id: bool}
+    """
+    products_by_customer = get_products_for_customers(customer_ids)
+    return {
+        customer_id: 'insights' in products_by_customer.get(customer_id, [])
+        for customer_id in customer_ids
+    }
+
+
+def invalidate_user_products(customer_id=None):
+    """
+    À appeler dès qu'un achat est enregistré (ou annulé) pour ce client.
+    Sans customer_id, vide tout le cache d'abonnements.
+    """
+    get_entitlement_cache().invalidate(customer_id)
+
+
 def has_access_to_dashboard(customer_id, dashboard_id):
     """
     NOUVEAU MODÈLE FREEMIUM:
@@ -246,14 +432,20 @@ def save_consent(email, consent_value):
         if supabase is None:
             return False
         
+        consent_values = {
+            'data_consent': consent_value,
+            'consent_updated_at': datetime.now().isoformat()
+        }
+        
         response = supabase.table('customers') \
-            .update({
-                'data_consent': consent_value,
-                'consent_updated_at': datetime.now().isoformat()
-            }) \
+            .update(consent_values) \
             .eq('email', email) \
             .execute()
         
+        context = get_cached_user_context(email=email)
+        if context is not None:
+            context.apply_update(consent_values)
+        
         return True
     
     except Exception as e:
@@ -313,11 +505,36 @@ def get_user_consent_with_timestamp(email):
         return None
 
 
+def _meter_usage(customer_id, increment):
+    """
+    Appel unique à la fonction SQL meter_usage, puis mise à jour du contexte de session.
+    La fonction n'est exécutable qu'avec la clé service_role (jamais la clé anon).
+    """
+    supabase = get_supabase_client(service_role=True)
+    
+    if supabase is None:
+        return None
+    
+    state = SupabaseUsageMeter(supabase).meter(customer_id, increment=increment)
+    
+    if state is not None:
+        update_user_context({
+            key: value.isoformat() if isinstance(value, datetime) else value
+            for key, value in state.items()
+            if key not in ('counted', 'is_premium')
+        }, customer_id=customer_id)
+    
+    return state
+
+
 def check_usage_limit(customer_id):
     """
     Vérifie si l'utilisateur gratuit n'a pas dépassé sa limite (10 analyses/semaine)
     Les utilisateurs Insights Premium ont un accès illimité
     
+    Lit le contexte de session ; le reset hebdomadaire, quand il est dû,
+    est fait atomiquement côté serveur (meter_usage).
+    
     Args:
         customer_id (UUID): ID du client
     
@@ -336,58 +553,28 @@ def check_usage_limit(customer_id):
         if supabase is None:
             return {'allowed': True, 'usage_count': 0, 'limit': 10}
         
-        # Récupérer les infos utilisateur
-        response = supabase.table('customers') \
-            .select('usage_count, usage_reset_date') \
-            .eq('id', customer_id) \
-            .execute()
+        # Récupérer les infos utilisateur (contexte de session)
+        user_data = get_user_context(customer_id=customer_id)
         
-        if not response.data:
+        if user_data is None:
             return {'allowed': False, 'usage_count': 0, 'limit': 10}
         
-        user_data = response.data[0]
-        
         # Si utilisateur a Insights → accès illimité
-        if has_insights_subscription(customer_id):
-            return {
-                'allowed': True,
-                'usage_count': user_data.get('usage_count', 0),
-                'limit': 999999,  # Illimité
-                'is_premium': True
-            }
+        is_premium = has_insights_subscription(customer_id)
+        usage_state = user_data.data
         
         # Vérifier si besoin de reset (7 jours écoulés)
-        reset_date = datetime.fromisoformat(user_data['usage_reset_date'])
-        days_since_reset = (datetime.now() - reset_date).days
-        
-        if days_since_reset >= 7:
-            # Reset le compteur
-            supabase.table('customers').update({
-                'usage_count': 0,
-                'usage_reset_date': datetime.now().isoformat()
-            }).eq('id', customer_id).execute()
+        if not is_premium and needs_reset(usage_state):
+            usage_state = _meter_usage(customer_id, increment=False)
             
-            return {
-                'allowed': True,
-                'usage_count': 0,
-                'limit': 10,
-                'reset_date': datetime.now(),
-                'days_until_reset': 7,
-                'is_premium': False
-            }
-        
-        # Vérifier la limite (10 analyses/semaine pour gratuit)
-        usage_count = user_data.get('usage_count', 0)
-        limit = 10
-        
-        return {
-            'allowed': usage_count < limit,
-            'usage_count': usage_count,
-            'limit': limit,
-            'reset_date': reset_date,
-            'days_until_reset': 7 - days_since_reset,
-            'is_premium': False
-        }
+            if usage_state is None:
+                return {'allowed': False, 'usage_count': 0, 'limit': 10}
+        
+        # Statut Premium décidé par le serveur quand meter_usage a été appelé
+        usage_info = build_quota(usage_state, usage_state.get('is_premium', is_premium))
+        usage_info.pop('counted', None)
+        
+        return usage_info
         
     except Exception as e:
         if DEBUG_MODE:
@@ -396,36 +583,46 @@ def check_usage_limit(customer_id):
         return {'allowed': True, 'usage_count': 0, 'limit': 10}
 
 
-def increment_usage(customer_id):
+def record_analysis(customer_id):
     """
-    Incrémente le compteur d'utilisation de l'utilisateur
-    À appeler après chaque analyse réussie
+    Compte une analyse (anti-rebond 30 min, reset hebdo inclus) en un seul
+    aller-retour atomique et retourne le quota à jour.
     
     Args:
         customer_id (UUID): ID du client
     
     Returns:
-        bool: True si succès, False sinon
+        dict: Même format que check_usage_limit() + 'counted' (bool)
     """
     try:
         supabase = get_supabase_client()
         
         if supabase is None:
-            return False
+            return {'allowed': True, 'usage_count': 0, 'limit': 10, 'counted': False}
         
-        # Ne pas incrémenter pour les utilisateurs Insights
-        if has_insights_subscription(customer_id):
-            return True
+        is_premium = has_insights_subscription(customer_id)
         
-        # Incrémenter via la fonction SQL
-        response = supabase.rpc('increment_usage', {'user_id': customer_id}).execute()
+        # Premium : pas de quota, seul le timestamp change → écriture différée
+        if is_premium:
+            timestamp_values = {'last_analysis_timestamp': datetime.now().isoformat()}
+            defer_customer_update('id', customer_id, timestamp_values)
+            update_user_context(timestamp_values, customer_id=customer_id)
+            
+            context = get_user_context(customer_id=customer_id)
+            usage_count = context.get('usage_count', 0) if context is not None else 0
+            return build_quota({'usage_count': usage_count, 'counted': True}, True)
         
-        return True
+        usage_state = _meter_usage(customer_id, increment=True)
+        
+        if usage_state is None:
+            return {'allowed': False, 'usage_count': 0, 'limit': 10, 'counted': False}
+        
+        return build_quota(usage_state, usage_state.get('is_premium', is_premium))
         
     except Exception as e:
         if DEBUG_MODE:
-            st.warning(f"⚠️ Erreur increment_usage : {e}")
-        return False
+            st.warning(f"⚠️ Erreur record_analysis : {e}")
+        return {'allowed': True, 'usage_count': 0, 'limit': 10, 'counted': False}
 
 
 def show_usage_limit_message(usage_info):
@@ -480,55 +677,19 @@ def should_increment_usage(customer_id):
     Vérifie si on doit incrémenter le compteur
     Retourne True si > 30 min depuis dernière analyse
     """
-    supabase = get_supabase_client()
+    context = get_user_context(customer_id=customer_id)
     
-    response = supabase.table('customers') \
-        .select('last_analysis_timestamp') \
-        .eq('id', customer_id) \
-        .execute()
-    
-    if not response.data:
+    if context is None:
         return True
     
-    last_timestamp = response.data[0].get('last_analysis_timestamp')
+    last_timestamp = context.get('last_analysis_timestamp')
     
     # Si jamais analysé, on incrémente
     if not last_timestamp:
         return True
     
     # Vérifier si > 30 min
-    last_dt = datetime.fromisoformat(last_timestamp)
+    last_dt = parse_timestamp(last_timestamp)
     time_diff = datetime.now() - last_dt
     
-    return time_diff > timedelta(minutes=30)
-
-
-def increment_usage_with_timestamp(customer_id):
-    """
-    Incrémente ET met à jour le timestamp
-    """
-    supabase = get_supabase_client()
-    
-    # Ne pas incrémenter pour Premium
-    if has_insights_subscription(customer_id):
-        # Juste update timestamp
-        supabase.table('customers').update({
-            'last_analysis_timestamp': datetime.now().isoformat()
-        }).eq('id', customer_id).execute()
-        return True
-    
-    # Récupérer l'usage actuel
-    response = supabase.table('customers').select('usage_count').eq('id', customer_id).execute()
-    
-    if not response.data:
-        return False
-    
-    current_usage = response.data[0].get('usage_count', 0)
-    
-    # Incrémenter usage + timestamp
-    supabase.table('customers').update({
-        'usage_count': current_usage + 1,
-        'last_analysis_timestamp': datetime.now().isoformat()
-    }).eq('id', customer_id).execute()
-    
-    return True
\ No newline at end of file
+    return time_diff > timedelta(minutes=DEBOUNCE_MINUTES)
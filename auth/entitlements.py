@@ -0,0 +1,88 @@
+"""
+auth/entitlements.py
+
+Cache des produits achetés (`customer_products`) par client.
+
+has_insights_subscription() est appelé par chaque onglet des dashboards : le
+cache est partagé par tout le processus, avec un TTL, une invalidation explicite
+lors d'un achat et des compteurs hits/misses pour le suivi.
+"""
+
+import threading
+import time
+
+# Durée de vie d'une entrée (secondes)
+ENTITLEMENT_TTL = 300
+
+
+class EntitlementCache:
+    """Produits par customer_id, avec expiration et compteurs d'accès."""
+
+    def __init__(self, ttl=ENTITLEMENT_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, customer_id):
+        """
+        Returns:
+            list ou None: produits du client, None si absent ou expiré
+        """
+        with self._lock:
+            entry = self._entries.get(customer_id)
+
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return list(entry[0])
+
+    def get_many(self, customer_ids):
+        """
+        Returns:
+            tuple: (dict des produits trouvés, liste des customer_id manquants)
+        """
+        found = {}
+        missing = []
+
+        for customer_id in customer_ids:
+            products = self.get(customer_id)
+            if products is None:
+                missing.append(customer_id)
+            else:
+                found[customer_id] = products
+
+        return found, missing
+
+    def set(self, customer_id, products):
+        with self._lock:
+            self._entries[customer_id] = (list(products), time.monotonic())
+
+    def invalidate(self, customer_id=None):
+        """Oublie un client (après un achat), ou tout le cache si customer_id est None."""
+        with self._lock:
+            if customer_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(customer_id, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'hit_rate': (self.hits / total * 100) if total > 0 else 0
+            }
+
+
+_cache = EntitlementCache()
+
+
+def get_entitlement_cache():
+    """Retourne le cache partagé par le processus."""
+    return _cache
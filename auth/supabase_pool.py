@@ -0,0 +1,137 @@
+"""
+auth/supabase_pool.py
+
+Client Supabase partagé par processus.
+
+Un seul client par couple (url, clé) est créé pour tout le processus Streamlit :
+la connexion HTTP (TLS + keep-alive) est réutilisée entre les reruns et entre les
+sessions, au lieu d'appeler create_client() à chaque requête.
+"""
+
+import threading
+import time
+
+# Intervalle minimum entre deux health checks d'un même client (secondes)
+HEALTH_CHECK_INTERVAL = 60
+
+# Pool de connexions HTTP partagé par PostgREST et Storage
+POOL_MAX_CONNECTIONS = 20
+POOL_MAX_KEEPALIVE = 10
+KEEPALIVE_EXPIRY = 30
+HTTP_TIMEOUT = 30
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _build_http_client():
+    """Crée le client httpx avec keep-alive et limites de pool."""
+    import httpx
+
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        timeout=HTTP_TIMEOUT
+    )
+
+
+def _create_client(url, key):
+    """
+    Crée un client Supabase adossé à un pool httpx partagé.
+    Les anciennes versions de supabase-py (sans `httpx_client`) gardent leur
+    propre session, qui reste réutilisée puisque le client est mis en cache.
+    """
+    from supabase import create_client
+
+    try:
+        from supabase import ClientOptions
+        http_client = _build_http_client()
+        try:
+            options = ClientOptions(httpx_client=http_client)
+        except TypeError:
+            http_client.close()
+            return create_client(url, key), None
+        return create_client(url, key, options=options), http_client
+    except ImportError:
+        return create_client(url, key), None
+
+
+def check_client_health(client):
+    """
+    Vérifie que le client répond (requête minimale sur `customers`).
+
+    Returns:
+        bool: True si la connexion est opérationnelle
+    """
+    try:
+        client.table('customers').select('id').limit(1).execute()
+        return True
+    except Exception:
+        return False
+
+
+def is_connection_error(error):
+    """Indique si l'exception vient de la couche réseau (et justifie une reconnexion)."""
+    try:
+        import httpx
+        return isinstance(error, (httpx.TransportError, ConnectionError))
+    except ImportError:
+        return isinstance(error, ConnectionError)
+
+
+def get_pooled_client(url, key):
+    """
+    Retourne le client partagé pour (url, key), en le créant au premier appel.
+
+    Un health check est fait au plus toutes les HEALTH_CHECK_INTERVAL secondes ;
+    si le client ne répond plus, il est recréé.
+    """
+    cache_key = (url, key)
+
+    with _lock:
+        entry = _clients.get(cache_key)
+
+        if entry is None:
+            client, http_client = _create_client(url, key)
+            entry = {
+                'client': client,
+                'http_client': http_client,
+                'last_check': time.monotonic()
+            }
+            _clients[cache_key] = entry
+            return client
+
+        if time.monotonic() - entry['last_check'] < HEALTH_CHECK_INTERVAL:
+            return entry['client']
+
+    # Health check hors verrou pour ne pas bloquer les autres sessions
+    if check_client_health(entry['client']):
+        entry['last_check'] = time.monotonic()
+        return entry['client']
+
+    reset_pooled_client(url, key)
+    return get_pooled_client(url, key)
+
+
+def reset_pooled_client(url=None, key=None):
+    """
+    Ferme et oublie le client (url, key), ou tous les clients si aucun n'est précisé.
+    Le prochain appel à get_pooled_client() recrée une connexion neuve.
+    """
+    with _lock:
+        if url is None:
+            entries = list(_clients.values())
+            _clients.clear()
+        else:
+            entry = _clients.pop((url, key), None)
+            entries = [entry] if entry else []
+
+    for entry in entries:
+        if entry.get('http_client') is not None:
+            try:
+                entry['http_client'].close()
+            except Exception:
+                pass
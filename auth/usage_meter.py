@@ -0,0 +1,163 @@
+"""
+auth/usage_meter.py
+
+Metering atomique des analyses (limite hebdomadaire des comptes gratuits).
+
+SupabaseUsageMeter appelle la fonction SQL `meter_usage`
+(supabase/migrations/20261017000000_meter_usage.sql) : check, reset hebdo,
+anti-rebond 30 min et incrément en un seul aller-retour.
+LocalUsageMeter applique exactement les mêmes règles en mémoire
+(développement local et tests), avec la même interface.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+FREE_WEEKLY_LIMIT = 10
+PREMIUM_LIMIT = 999999  # Illimité
+RESET_DAYS = 7
+DEBOUNCE_MINUTES = 30
+
+
+def parse_timestamp(value):
+    """Convertit un timestamp Supabase (ISO, avec ou sans fuseau) en datetime local naïf."""
+    if value is None or isinstance(value, datetime):
+        return value
+
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def build_quota(row, is_premium, now=None):
+    """
+    Construit le dict de quota (format de check_usage_limit) depuis l'état metering.
+
+    Args:
+        row (dict): usage_count, usage_reset_date, last_analysis_timestamp, counted
+        is_premium (bool): Abonnement Insights actif
+    """
+    now = now or datetime.now()
+    usage_count = row.get('usage_count') or 0
+    reset_date = parse_timestamp(row.get('usage_reset_date')) or now
+
+    if is_premium:
+        return {
+            'allowed': True,
+            'usage_count': usage_count,
+            'limit': PREMIUM_LIMIT,
+            'is_premium': True,
+            'counted': row.get('counted', False)
+        }
+
+    days_since_reset = (now - reset_date).days
+
+    return {
+        'allowed': usage_count < FREE_WEEKLY_LIMIT,
+        'usage_count': usage_count,
+        'limit': FREE_WEEKLY_LIMIT,
+        'reset_date': reset_date,
+        'days_until_reset': max(RESET_DAYS - days_since_reset, 0),
+        'is_premium': False,
+        'counted': row.get('counted', False)
+    }
+
+
+def needs_reset(row, now=None):
+    """True si la période hebdomadaire du compteur est écoulée."""
+    now = now or datetime.now()
+    reset_date = parse_timestamp(row.get('usage_reset_date'))
+    return reset_date is None or (now - reset_date).days >= RESET_DAYS
+
+
+class SupabaseUsageMeter:
+    """Metering via la fonction SQL `meter_usage` (un seul aller-retour)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def meter(self, customer_id, increment=True):
+        """
+        Args:
+            customer_id: UUID du client
+            increment (bool): False pour seulement vérifier / appliquer le reset
+
+        Returns:
+            dict: état metering (usage_count, usage_reset_date,
+                  last_analysis_timestamp, is_premium, counted) ou None si client inconnu
+        """
+        # Limite, reset, anti-rebond et statut Premium sont décidés côté serveur
+        response = self.client.rpc('meter_usage', {
+            'user_id': customer_id,
+            'p_increment': increment
+        }).execute()
+
+        data = response.data
+        if isinstance(data, list):
+            data = data[0] if data else None
+        return data
+
+
+class LocalUsageMeter:
+    """
+    Stand-in en mémoire de `meter_usage` (mêmes règles, verrou par instance).
+
+    Comme la fonction SQL, le statut Premium est lu dans les produits du
+    client (stand-in de customer_products) : l'appelant ne choisit que le
+    client et s'il faut compter l'analyse.
+
+    Args:
+        rows (dict): {customer_id: {usage_count, usage_reset_date, last_analysis_timestamp}}
+        products (dict): {customer_id: produits achetés}
+        clock: callable retournant l'heure courante
+    """
+
+    def __init__(self, rows=None, products=None, clock=datetime.now):
+        self.rows = rows if rows is not None else {}
+        self.products = products if products is not None else {}
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def add_customer(self, customer_id, usage_count=0, usage_reset_date=None, last_analysis_timestamp=None,
+                     products=()):
+        self.rows[customer_id] = {
+            'usage_count': usage_count,
+            'usage_reset_date': usage_reset_date or self.clock(),
+            'last_analysis_timestamp': last_analysis_timestamp
+        }
+        self.products[customer_id] = set(products)
+
+    def meter(self, customer_id, increment=True):
+        """Même contrat que SupabaseUsageMeter.meter."""
+        with self._lock:
+            row = self.rows.get(customer_id)
+            if row is None:
+                return None
+
+            now = self.clock()
+            is_premium = 'insights' in self.products.get(customer_id, ())
+            usage_count = row.get('usage_count') or 0
+            reset_date = parse_timestamp(row.get('usage_reset_date'))
+            last_analysis = parse_timestamp(row.get('last_analysis_timestamp'))
+            counted = False
+
+            if reset_date is None or now - reset_date >= timedelta(days=RESET_DAYS):
+                usage_count = 0
+                reset_date = now
+
+            debounce_elapsed = last_analysis is None or now - last_analysis > timedelta(minutes=DEBOUNCE_MINUTES)
+
+            if increment and debounce_elapsed and (is_premium or usage_count < FREE_WEEKLY_LIMIT):
+                counted = True
+                last_analysis = now
+                if not is_premium:
+                    usage_count += 1
+
+            row.update({
+                'usage_count': usage_count,
+                'usage_reset_date': reset_date,
+                'last_analysis_timestamp': last_analysis
+            })
+
+            return dict(row, is_premium=is_premium, counted=counted)
@@ -0,0 +1,101 @@
+"""
+auth/user_context.py
+
+Contexte utilisateur mis en cache dans la session Streamlit.
+
+La ligne `customers` de l'utilisateur connecté est chargée une seule fois
+(select('*')) puis réutilisée par check_access, check_usage_limit,
+should_increment_usage, record_analysis et collect_raw_data.
+Elle n'est rafraîchie qu'à expiration du TTL ou après une écriture.
+"""
+
+import time
+
+import streamlit as st
+
+# Durée de vie du contexte en session (secondes)
+USER_CONTEXT_TTL = 300
+
+SESSION_KEY = 'user_context'
+
+
+class UserContext:
+    """Ligne `customers` de l'utilisateur connecté, avec son heure de chargement."""
+
+    def __init__(self, data):
+        self.data = dict(data)
+        self.loaded_at = time.monotonic()
+
+    @property
+    def id(self):
+        return self.data.get('id')
+
+    @property
+    def email(self):
+        return self.data.get('email')
+
+    @property
+    def access_key(self):
+        return self.data.get('access_key')
+
+    def get(self, key, default=None):
+        value = self.data.get(key)
+        return default if value is None else value
+
+    def is_expired(self, ttl=USER_CONTEXT_TTL):
+        return time.monotonic() - self.loaded_at > ttl
+
+    def matches(self, customer_id=None, email=None, access_key=None):
+        """Vérifie que le contexte correspond bien à l'utilisateur demandé."""
+        if customer_id is not None and self.id != customer_id:
+            return False
+        if email is not None and (self.email or '').lower() != email.lower():
+            return False
+        if access_key is not None and self.access_key != access_key:
+            return False
+        return True
+
+    def apply_update(self, values):
+        """Répercute localement une écriture déjà faite en base."""
+        self.data.update(values)
+
+
+def get_cached_user_context(customer_id=None, email=None, access_key=None):
+    """
+    Retourne le contexte de session s'il est valide pour cet utilisateur.
+
+    Returns:
+        UserContext ou None (absent, expiré ou autre utilisateur)
+    """
+    context = st.session_state.get(SESSION_KEY)
+
+    if context is None or context.is_expired():
+        return None
+
+    if not context.matches(customer_id=customer_id, email=email, access_key=access_key):
+        return None
+
+    return context
+
+
+def set_user_context(data):
+    """Enregistre une ligne `customers` fraîchement lue comme contexte de session."""
+    context = UserContext(data)
+    st.session_state[SESSION_KEY] = context
+    return context
+
+
+def update_user_context(values, customer_id=None):
+    """
+    Met à jour le contexte après une écriture en base (sans nouvelle lecture).
+    Sans effet si le contexte en session concerne un autre utilisateur.
+    """
+    context = st.session_state.get(SESSION_KEY)
+
+    if context is not None and context.matches(customer_id=customer_id):
+        context.apply_update(values)
+
+
+def invalidate_user_context():
+    """Force le rechargement du contexte au prochain accès."""
+    st.session_state.pop(SESSION_KEY, None)
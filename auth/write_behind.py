@@ -0,0 +1,156 @@
+"""
+auth/write_behind.py
+
+File d'écritures différées (write-behind) pour les mises à jour non critiques
+de `customers` (last_login, last_analysis_timestamp des comptes Premium).
+
+Les écritures sont fusionnées par ligne (la dernière valeur gagne) et envoyées
+par un thread de fond toutes les FLUSH_INTERVAL secondes, ainsi qu'à l'arrêt
+du processus : elles ne bloquent plus l'affichage des dashboards.
+"""
+
+import atexit
+import threading
+
+# Intervalle entre deux flushs (secondes)
+FLUSH_INTERVAL = 5
+
+# Nombre de tentatives avant d'abandonner une écriture en échec
+MAX_ATTEMPTS = 3
+
+
+class WriteBehindQueue:
+    """
+    Écritures différées fusionnées par (table, colonne clé, valeur clé).
+
+    Args:
+        client_factory: callable retournant un client Supabase (appelé au flush)
+        interval (float): Secondes entre deux flushs automatiques
+    """
+
+    def __init__(self, client_factory, interval=FLUSH_INTERVAL):
+        self.client_factory = client_factory
+        self.interval = interval
+        self.flushed = 0
+        self.failed = 0
+        self._pending = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def enqueue(self, table, key_column, key_value, values):
+        """Ajoute (ou fusionne) une mise à jour pour la ligne table.key_column = key_value."""
+        row_key = (table, key_column, key_value)
+
+        with self._lock:
+            self._pending.setdefault(row_key, {}).update(values)
+
+        self.start()
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """
+        Envoie toutes les écritures en attente.
+
+        Returns:
+            int: Nombre de lignes écrites
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+
+            if not batch:
+                return 0
+
+            try:
+                client = self.client_factory()
+            except Exception:
+                client = None
+
+            written = 0
+
+            for row_key, values in batch.items():
+                table, key_column, key_value = row_key
+
+                try:
+                    if client is None:
+                        raise ConnectionError("Client Supabase indisponible")
+                    client.table(table).update(values).eq(key_column, key_value).execute()
+                    written += 1
+                    self._attempts.pop(row_key, None)
+                except Exception as e:
+                    self._requeue(row_key, values, e)
+
+            self.flushed += written
+            return written
+
+    def _requeue(self, row_key, values, error):
+        """Remet une écriture en file sans écraser une valeur plus récente."""
+        attempts = self._attempts.get(row_key, 0) + 1
+
+        if attempts >= MAX_ATTEMPTS:
+            self._attempts.pop(row_key, None)
+            self.failed += 1
+            print(f"⚠️ Écriture différée abandonnée {row_key}: {error}")
+            return
+
+        self._attempts[row_key] = attempts
+
+        with self._lock:
+            newer = self._pending.get(row_key, {})
+            self._pending[row_key] = dict(values, **newer)
+
+    def start(self):
+        """Démarre le thread de flush (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="write-behind-flusher",
+                daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+
+    def stop(self, timeout=10):
+        """Arrête le thread et vide la file (appelé à l'arrêt du processus)."""
+        self._stop_event.set()
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+        self.flush()
+
+
+_queues = []
+
+
+def register_queue(queue):
+    """Garantit le flush final de la file à l'arrêt du processus."""
+    _queues.append(queue)
+    return queue
+
+
+@atexit.register
+def _flush_all_on_shutdown():
+    for queue in _queues:
+        try:
+            queue.stop()
+        except Exception:
+            pass
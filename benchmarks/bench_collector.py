@@ -0,0 +1,161 @@
+"""
+benchmarks/bench_collector.py
+
+Collecte vers le stockage : ancien save_files_to_supabase (appels bloquants
+enchaînés dans la page : manifeste, chaque fichier, manifeste, métadonnées)
+comparé au pipeline en arrière-plan (data_collection/pipeline.py : spool
+local, blobs par contenu, uploads parallèles, reprises, journal JSONL).
+
+Le stockage est simulé (benchmarks/fake_storage.py) : latence par appel,
+débit, erreurs réseau aléatoires. Mesures : temps pendant lequel la page est
+bloquée, temps total jusqu'au dernier upload, appels, octets envoyés,
+fichiers perdus.
+
+Usage : python benchmarks/bench_collector.py [uploads] [latence_ms] [taux_erreur]
+"""
+
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_storage import FakeStorageClient
+from data_collection.blobstore import BlobStore, SupabaseBackend
+from data_collection.ingest import ingest_upload
+from data_collection.pipeline import CollectorPipeline
+from data_collection.upload_log import UploadLog
+
+FILE_SIZES = (1_000_000, 600_000)
+
+# Part des uploads qui renvoient un export déjà collecté (même contenu)
+DUPLICATE_RATE = 0.25
+
+
+def make_uploads(count, seed=0):
+    """[(user_id, [(clé, fichier)])] : deux exports par upload, une partie en double."""
+    rng = random.Random(seed)
+    contents = []
+    uploads = []
+
+    for i in range(count):
+        if contents and rng.random() < DUPLICATE_RATE:
+            files_content = rng.choice(contents)
+        else:
+            files_content = [rng.randbytes(size) for size in FILE_SIZES]
+            contents.append(files_content)
+
+        files = []
+        for role, content in zip(('orderitems', 'costs'), files_content):
+            stream = io.BytesIO(content)
+            stream.name = f"{role}_{i}.csv"
+            files.append((role, stream))
+        uploads.append((f"user{i % 10}", files))
+
+    return uploads
+
+
+# ==================== ANCIEN COLLECTEUR ====================
+
+def legacy_save(client, uploaded_files, user_id, template_name):
+    """save_files_to_supabase avant le pipeline (appels séquentiels, sans reprise)."""
+    bucket = client.storage.from_('user-data')
+    base_path = f"raw_data/{user_id}/{template_name}/"
+    hash_file_path = base_path + "_file_hashes.json"
+    lost = 0
+
+    try:
+        file_hashes = json.loads(bucket.download(hash_file_path).decode('utf-8'))
+    except Exception:
+        file_hashes = {}
+
+    for _, file in uploaded_files:
+        ingested = ingest_upload(file)
+        if file_hashes.get(ingested.name) == ingested.sha256:
+            continue
+        try:
+            bucket.upload(base_path + ingested.name, ingested.content, {"upsert": "true"})
+            file_hashes[ingested.name] = ingested.sha256
+        except Exception:
+            lost += 1
+
+    try:
+        bucket.upload(hash_file_path, json.dumps(file_hashes).encode(), {"upsert": "true"})
+    except Exception:
+        pass
+
+    try:
+        metadata = f"\n--- Upload {datetime.now()} ---\n".encode()
+        try:
+            metadata = bucket.download(base_path + "_metadata.txt") + metadata
+        except Exception:
+            pass
+        bucket.upload(base_path + "_metadata.txt", metadata, {"upsert": "true"})
+    except Exception:
+        pass
+
+    return lost
+
+
+def run_legacy(uploads, latency, failure_rate):
+    client = FakeStorageClient(latency=latency, failure_rate=failure_rate)
+    start = time.perf_counter()
+    lost = sum(legacy_save(client, files, user_id, 'finance_pro') for user_id, files in uploads)
+    elapsed = time.perf_counter() - start
+    return {'blocked': elapsed, 'total': elapsed, 'calls': client.calls,
+            'mb': client.bytes_uploaded / 1e6, 'lost': lost}
+
+
+# ==================== PIPELINE ====================
+
+def run_pipeline(uploads, latency, failure_rate, workers):
+    client = FakeStorageClient(latency=latency, failure_rate=failure_rate)
+    store = BlobStore(SupabaseBackend(lambda: client))
+    upload_log = UploadLog(SupabaseBackend(lambda: client, root='upload_log'))
+
+    with tempfile.TemporaryDirectory() as spool_dir:
+        pipeline = CollectorPipeline(lambda: store, upload_log=upload_log, spool_dir=spool_dir,
+                                     max_workers=workers, backoff=latency)
+
+        start = time.perf_counter()
+        blocked = 0.0
+        for user_id, files in uploads:
+            submit_start = time.perf_counter()
+            pipeline.submit(files, user_id, 'finance_pro')
+            blocked += time.perf_counter() - submit_start
+        pipeline.drain()
+        upload_log.flush()
+        total = time.perf_counter() - start
+
+        stats = pipeline.stats()
+        pipeline.shutdown()
+
+    return {'blocked': blocked, 'total': total, 'calls': client.calls,
+            'mb': client.bytes_uploaded / 1e6, 'lost': stats['failed']}
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.05
+    failure_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+
+    print(f"{count} uploads de 2 fichiers ({sum(FILE_SIZES) / 1e6:.1f} Mo), "
+          f"latence {latency * 1000:.0f} ms, {failure_rate:.0%} d'erreurs réseau\n")
+    print(f"{'Collecteur':<22}{'Page bloquée':>14}{'Total':>10}{'Appels':>9}{'Mo envoyés':>12}{'Perdus':>8}")
+
+    def show(label, result):
+        print(f"{label:<22}{result['blocked']:>12.2f} s{result['total']:>8.2f} s{result['calls']:>9}"
+              f"{result['mb']:>12.1f}{result['lost']:>8}")
+
+    show("ancien (séquentiel)", run_legacy(make_uploads(count), latency, failure_rate))
+    for workers in (1, 4, 8):
+        show(f"pipeline {workers} thread(s)", run_pipeline(make_uploads(count), latency, failure_rate, workers))
+
+
+if __name__ == '__main__':
+    main()
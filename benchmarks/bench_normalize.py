@@ -0,0 +1,69 @@
+"""
+benchmarks/bench_normalize.py
+
+Compare parse_money() aux chaînes .str.replace() des loaders sur un export
+synthétique (1M lignes par défaut).
+
+Usage : python benchmarks/bench_normalize.py [nb_lignes]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.normalize import parse_money
+
+
+def make_prices(rows, seed=42):
+    """Montants au format Etsy FR ("12,50 €") et US ("$12.50")."""
+    rng = np.random.default_rng(seed)
+    amounts = rng.integers(100, 20000, size=rows) / 100
+    formats = rng.integers(0, 3, size=rows)
+
+    eu = pd.Series(amounts).map(lambda x: f"{x:.2f}".replace('.', ',') + " €")
+    us = pd.Series(amounts).map(lambda x: f"${x:.2f}")
+    plain = pd.Series(amounts).map(lambda x: f"{x:.2f}")
+
+    return pd.Series(np.select([formats == 0, formats == 1], [eu, us], plain)), amounts
+
+
+def legacy_chain(series):
+    """Nettoyage historique de load_data (finance)."""
+    cleaned = (series.fillna('0')
+               .astype(str)
+               .str.replace('€', '', regex=False)
+               .str.replace('$', '', regex=False)
+               .str.replace('USD', '', regex=False)
+               .str.replace('EUR', '', regex=False)
+               .str.replace(' ', '', regex=False)
+               .str.replace(',', '.', regex=False)
+               .str.strip())
+    return pd.to_numeric(cleaned, errors='coerce').fillna(0)
+
+
+def bench(label, func, series, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(series)
+        timings.append(time.perf_counter() - start)
+    print(f"{label:<25} {min(timings) * 1000:>10.1f} ms")
+    return result
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    prices, expected = make_prices(rows)
+
+    print(f"📊 {rows:,} montants")
+    legacy = bench("Chaîne str.replace", legacy_chain, prices)
+    shared = bench("parse_money", parse_money, prices)
+
+    assert np.allclose(legacy.to_numpy(), expected)
+    assert np.allclose(shared.to_numpy(), expected)
+    print("✅ Résultats identiques")
@@ -0,0 +1,278 @@
+"""
+benchmarks/bench_pdf.py
+
+Temps de rendu des trois rapports PDF (reports/pdf.py) pour une boutique de
+10 000 produits par défaut, comparé aux générateurs historiques des pages
+(feuille de styles, ParagraphStyle et TableStyle reconstruits à chaque
+appel, lignes de tableaux formatées par iterrows()). Vérifie aussi que les
+lignes des tableaux sont identiques.
+
+Usage : python benchmarks/bench_pdf.py [nb_produits] [répétitions]
+"""
+
+import io
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reports.pdf import generate_customer_intelligence_pdf, generate_pdf_report, generate_seo_pdf_report
+from reports.templates import format_int, format_money, format_number, table_rows, truncate
+
+COUNTRIES = ['France', 'United States', 'Germany', 'United Kingdom', 'Belgium', 'Canada', 'Spain', 'Italy']
+
+
+# ==================== DONNÉES SYNTHÉTIQUES ====================
+
+def make_shop(products, seed=42):
+    rng = np.random.default_rng(seed)
+    orders = products * 5
+
+    ventes = rng.integers(1, 200, size=products)
+    ca = ventes * rng.uniform(5, 80, size=products).round(2)
+    product_analysis = pd.DataFrame({
+        'Product': [f"Bracelet perles naturelles modèle {i} argent sterling fait main" for i in range(products)],
+        'CA': ca,
+        'Ventes': ventes,
+        'Marge': ca * rng.uniform(0.2, 0.6, size=products)
+    }).sort_values('CA', ascending=False)
+
+    kpis = {
+        'ca_total': ca.sum(), 'nb_ventes': int(ventes.sum()), 'panier_moyen': ca.sum() / ventes.sum(),
+        'frais_etsy': ca.sum() * 0.1, 'couts_matieres': ca.sum() * 0.3,
+        'marge_brute': ca.sum() * 0.6, 'taux_marge': 60.0
+    }
+
+    orders_df = pd.DataFrame({
+        'Buyer': rng.integers(0, orders // 2, size=orders).astype(str),
+        'Country': rng.choice(COUNTRIES, size=orders),
+        'Total': rng.uniform(5, 150, size=orders).round(2)
+    })
+    reviews_df = pd.DataFrame({'Rating': rng.integers(1, 6, size=products)})
+    customer_analysis = pd.DataFrame({
+        'Num_Orders': rng.integers(1, 6, size=orders // 2),
+        'LTV': rng.uniform(5, 500, size=orders // 2)
+    })
+
+    seo_analysis = pd.DataFrame({
+        'Title': product_analysis['Product'].to_numpy(),
+        'SEO_Score': rng.integers(10, 100, size=products).astype(float)
+    })
+
+    return kpis, product_analysis, orders_df, reviews_df, customer_analysis, seo_analysis
+
+
+# ==================== GÉNÉRATEURS HISTORIQUES ====================
+
+def _legacy_header(story, title):
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle', parent=styles['Heading1'], fontSize=24,
+        textColor=colors.HexColor('#F56400'), spaceAfter=30, alignment=1
+    )
+    story.append(Paragraph(title, title_style))
+    story.append(Spacer(1, 0.3*inch))
+    story.append(Paragraph(f"Généré le : {datetime.now().strftime('%d/%m/%Y à %H:%M')}", styles['Normal']))
+    story.append(Spacer(1, 0.3*inch))
+    return styles
+
+
+def _legacy_table_style(*extra):
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F56400')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        *extra,
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
+
+def legacy_product_rows(top_products):
+    product_data = [['Produit', 'CA', 'Ventes', 'Marge']]
+    for _, row in top_products.iterrows():
+        product_data.append([
+            row['Product'][:30],
+            f"{row['CA']:.2f} EUR",
+            str(int(row['Ventes'])),
+            f"{row['Marge']:.2f} EUR"
+        ])
+    return product_data
+
+
+def legacy_finance(kpis, df, product_analysis):
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    story = []
+    styles = _legacy_header(story, "Rapport Etsy Analytics Pro")
+
+    story.append(Paragraph("Indicateurs Financiers", styles['Heading2']))
+    kpi_data = [
+        ['Indicateur', 'Valeur'],
+        ['Chiffre d\'affaires', f"{kpis['ca_total']:.2f} EUR"],
+        ['Nombre de ventes', str(kpis['nb_ventes'])],
+        ['Panier moyen', f"{kpis['panier_moyen']:.2f} EUR"],
+        ['Frais Etsy', f"{kpis['frais_etsy']:.2f} EUR"],
+        ['Coûts matières', f"{kpis['couts_matieres']:.2f} EUR"],
+        ['Marge brute', f"{kpis['marge_brute']:.2f} EUR"],
+        ['Taux de marge', f"{kpis['taux_marge']:.1f} %"]
+    ]
+    kpi_table = Table(kpi_data, colWidths=[3*inch, 2*inch])
+    kpi_table.setStyle(_legacy_table_style(
+        ('FONTSIZE', (0, 0), (-1, 0), 12), ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige)
+    ))
+    story.append(kpi_table)
+    story.append(Spacer(1, 0.5*inch))
+
+    story.append(Paragraph("Top 5 Produits par CA", styles['Heading2']))
+    product_table = Table(legacy_product_rows(product_analysis.head(5)),
+                          colWidths=[2.5*inch, 1.5*inch, 1*inch, 1.5*inch])
+    product_table.setStyle(_legacy_table_style(
+        ('FONTSIZE', (0, 0), (-1, 0), 10), ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige)
+    ))
+    story.append(product_table)
+
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+
+def legacy_customer_intelligence(orders_df, reviews_df, customer_analysis):
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    story = []
+    styles = _legacy_header(story, "👥 Rapport Customer Intelligence")
+
+    story.append(Paragraph("📊 Indicateurs Clés", styles['Heading2']))
+    avg_rating = reviews_df['Rating'].mean()
+    repeat_rate = (customer_analysis['Num_Orders'] > 1).sum() / len(customer_analysis) * 100
+    kpi_data = [
+        ['Indicateur', 'Valeur'],
+        ['Clients uniques', str(orders_df['Buyer'].nunique())],
+        ['Commandes totales', str(len(orders_df))],
+        ['Note moyenne', f"{avg_rating:.2f}/5"],
+        ['Pays couverts', str(orders_df['Country'].nunique())],
+        ['Taux clients récurrents', f"{repeat_rate:.1f}%"],
+        ['LTV moyen', f"{customer_analysis['LTV'].mean():.2f} €"]
+    ]
+    kpi_table = Table(kpi_data, colWidths=[3*inch, 2*inch])
+    kpi_table.setStyle(_legacy_table_style())
+    story.append(kpi_table)
+    story.append(Spacer(1, 0.5*inch))
+
+    story.append(Paragraph("🌍 Top 5 Pays", styles['Heading2']))
+    country_sales = orders_df.groupby('Country', observed=True)['Total'].sum().nlargest(5)
+    country_data = [['Pays', 'Chiffre d\'affaires']]
+    for country, revenue in country_sales.items():
+        country_data.append([country, f"{revenue:.2f} €"])
+    country_table = Table(country_data, colWidths=[2.5*inch, 2*inch])
+    country_table.setStyle(_legacy_table_style())
+    story.append(country_table)
+
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+
+def legacy_seo_lines(worst_listings):
+    lines = []
+    for idx, row in worst_listings.iterrows():
+        title_short = row['Title'][:50] + "..." if len(row['Title']) > 50 else row['Title']
+        lines.append(f"<b>{title_short}</b> - Score: {row['SEO_Score']:.0f}/100")
+    return lines
+
+
+def legacy_seo(listings_df, seo_analysis, sales_df=None):
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    story = []
+    styles = _legacy_header(story, "🔍 Rapport SEO Etsy")
+
+    story.append(Paragraph("📊 Score SEO Global", styles['Heading2']))
+    score_data = [
+        ['Indicateur', 'Valeur'],
+        ['Score SEO moyen', f"{seo_analysis['SEO_Score'].mean():.1f}/100"],
+        ['Listings excellents (≥80)', f"{len(seo_analysis[seo_analysis['SEO_Score'] >= 80])}"],
+        ['Listings à optimiser (<60)', f"{len(seo_analysis[seo_analysis['SEO_Score'] < 60])}"]
+    ]
+    score_table = Table(score_data, colWidths=[3*inch, 2*inch])
+    score_table.setStyle(_legacy_table_style())
+    story.append(score_table)
+    story.append(Spacer(1, 0.5*inch))
+
+    story.append(Paragraph("🎯 Top 5 Listings à Optimiser", styles['Heading2']))
+    for line in legacy_seo_lines(seo_analysis.nsmallest(5, 'SEO_Score')):
+        story.append(Paragraph(line, styles['Normal']))
+        story.append(Spacer(1, 0.1*inch))
+
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
+
+
+# ==================== MESURES ====================
+
+def best_time(fn, args, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def check_rows(product_analysis, seo_analysis):
+    top_products = product_analysis.head(5)
+    assert legacy_product_rows(top_products) == table_rows(
+        ['Produit', 'CA', 'Ventes', 'Marge'],
+        truncate(top_products['Product'], 30),
+        format_money(top_products['CA']),
+        format_int(top_products['Ventes']),
+        format_money(top_products['Marge'])
+    ), "Finance : lignes du top produits différentes"
+
+    worst_listings = seo_analysis.nsmallest(5, 'SEO_Score')
+    assert legacy_seo_lines(worst_listings) == [
+        f"<b>{title}</b> - Score: {score}"
+        for title, score in zip(truncate(worst_listings['Title'], 50, '...'),
+                                format_number(worst_listings['SEO_Score'], suffix='/100'))
+    ], "SEO : lignes des listings à optimiser différentes"
+
+
+def main():
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    kpis, product_analysis, orders_df, reviews_df, customer_analysis, seo_analysis = make_shop(products)
+
+    check_rows(product_analysis, seo_analysis)
+
+    print(f"{products} produits, {len(orders_df)} commandes, meilleur temps sur {repeats} rendus")
+    reports = [
+        ("Finance", legacy_finance, generate_pdf_report, (kpis, None, product_analysis)),
+        ("Customer Intelligence", legacy_customer_intelligence, generate_customer_intelligence_pdf,
+         (orders_df, reviews_df, customer_analysis)),
+        ("SEO", legacy_seo, generate_seo_pdf_report, (None, seo_analysis))
+    ]
+
+    for label, legacy_fn, new_fn, args in reports:
+        legacy_time = best_time(legacy_fn, args, repeats)
+        new_time = best_time(new_fn, args, repeats)
+        print(f"{label}")
+        print(f"  générateur historique : {legacy_time * 1000:8.1f} ms")
+        print(f"  reports/pdf.py        : {new_time * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+benchmarks/bench_sentiment.py
+
+Compare le comptage des mots-clés de sentiment (analytics/sentiment.py) à la
+boucle historique de analyze_reviews_sentiment() (`keyword in text` puis
+`text.count(keyword)` pour chaque mot-clé), sur des reviews synthétiques
+(50 000 par défaut), et vérifie que les comptes sont identiques.
+
+Usage : python benchmarks/bench_sentiment.py [nb_reviews]
+"""
+
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.sentiment import DEFAULT_LOCALES, SENTIMENT_KEYWORDS, sentiment_counts
+
+
+def keyword_lists(locales=DEFAULT_LOCALES):
+    positive, negative = [], []
+    for locale in locales:
+        positive += [k for k in SENTIMENT_KEYWORDS[locale]['positive'] if k not in positive]
+        negative += [k for k in SENTIMENT_KEYWORDS[locale]['negative'] if k not in negative]
+    return positive, negative
+
+
+def make_reviews(count, seed=42):
+    """Reviews de 5 à 40 mots, environ 6 % de mots-clés."""
+    rng = np.random.default_rng(seed)
+    positive, negative = keyword_lists()
+    filler = [f"mot{i}" for i in range(300)] + [
+        'le', 'bijou', 'est', 'arrivé', 'très', 'vite', 'the', 'ring', 'stop',
+        'laptop', 'Ravie', 'PARFAIT', 'smaller', 'retarded'
+    ]
+    keywords = positive + negative
+
+    reviews = []
+    for size in rng.integers(5, 41, size=count):
+        words = [keywords[rng.integers(len(keywords))] if rng.random() < 0.06
+                 else filler[rng.integers(len(filler))] for _ in range(size)]
+        reviews.append(' '.join(words))
+
+    reviews[::97] = [None] * len(reviews[::97])
+    return pd.Series(reviews)
+
+
+def legacy_counts(texts):
+    """Boucle historique de analyze_reviews_sentiment."""
+    positive_keywords, negative_keywords = keyword_lists()
+    positive_counts = Counter()
+    negative_counts = Counter()
+
+    for text in texts:
+        if pd.notna(text) and text:
+            text_lower = str(text).lower()
+
+            for keyword in positive_keywords:
+                if keyword in text_lower:
+                    positive_counts[keyword] += text_lower.count(keyword)
+
+            for keyword in negative_keywords:
+                if keyword in text_lower:
+                    negative_counts[keyword] += text_lower.count(keyword)
+
+    return positive_counts, negative_counts
+
+
+def timed(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    reviews = make_reviews(count)
+
+    legacy_time, legacy = timed(legacy_counts, reviews)
+    matcher_time, matched = timed(sentiment_counts, reviews)
+
+    assert legacy == matched, "Comptes différents"
+
+    print(f"{count} reviews")
+    print(f"  boucle historique : {legacy_time * 1000:8.1f} ms")
+    print(f"  sentiment_counts  : {matcher_time * 1000:8.1f} ms  (x{legacy_time / matcher_time:.1f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+benchmarks/bench_text_stats.py
+
+Compare count_terms() (analytics/text_stats.py) aux boucles historiques
+extract_all_words() (avis), extract_keywords_from_titles() (titres) et au
+comptage des tags, sur des colonnes synthétiques (100 000 lignes par défaut) :
+temps, pic mémoire (tracemalloc) et comptes identiques.
+
+Usage : python benchmarks/bench_text_stats.py [nb_lignes]
+"""
+
+import os
+import re
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics.text_stats import count_terms, get_stop_words, top_terms
+
+
+VOCABULARY = (
+    "le la bijou bracelet argent sterling très bien reçu merci parfait collier "
+    "the ring is beautiful and fast shipping love it gift for her handmade "
+    "qualité magnifique joli cadeau femme homme protection perle pierre"
+).split() + [
+    "mot" + chr(97 + i % 26) + chr(97 + i // 26 % 26) for i in range(676)
+]
+
+
+def make_texts(rows, words, separator, seed=42):
+    rng = np.random.default_rng(seed)
+    texts = [separator.join(VOCABULARY[i] for i in rng.integers(0, len(VOCABULARY), size=size))
+             for size in rng.integers(3, words, size=rows)]
+    texts[::50] = [None] * len(texts[::50])
+    return pd.Series(texts)
+
+
+def legacy_reviews(texts):
+    stop_words = get_stop_words('reviews')
+    all_words = []
+    for text in texts:
+        if pd.notna(text) and text:
+            words = re.findall(r'\b[a-zàâäéèêëïîôùûüÿç]{3,}\b', str(text).lower())
+            words = [w for w in words if w not in stop_words]
+            all_words.extend(words)
+    return Counter(all_words)
+
+
+def legacy_titles(titles):
+    all_words = []
+    for title in titles:
+        if pd.notna(title):
+            words = re.split(r'[,\s]+', str(title).lower())
+            words = [w.strip() for w in words if len(w) > 3 and w not in
+                     ['pour', 'avec', 'dans', 'the', 'and', 'for', 'with']]
+            all_words.extend(words)
+    return Counter(all_words)
+
+
+def legacy_tags(tags_column):
+    all_tags = []
+    for tags_str in tags_column:
+        if pd.notna(tags_str):
+            tags = re.split(r'[,;]', str(tags_str))
+            all_tags.extend(tag.strip().lower() for tag in tags if tag.strip())
+    return Counter(all_tags)
+
+
+def measure(fn, *args, **kwargs):
+    """Temps (sans traçage) puis pic mémoire (second appel sous tracemalloc)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def compare(label, legacy_fn, texts, **kwargs):
+    legacy_time, legacy_peak, legacy = measure(legacy_fn, texts)
+    new_time, new_peak, counts = measure(count_terms, texts, **kwargs)
+
+    assert list(legacy.items()) == list(counts.items()), f"{label} : comptes différents"
+    assert legacy.most_common(30) == top_terms(counts, 30), f"{label} : top 30 différent"
+
+    print(f"{label}")
+    print(f"  boucle historique : {legacy_time * 1000:8.1f} ms  pic {legacy_peak / 1e6:6.1f} Mo")
+    print(f"  count_terms       : {new_time * 1000:8.1f} ms  pic {new_peak / 1e6:6.1f} Mo")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{rows} lignes")
+
+    compare("Avis", legacy_reviews, make_texts(rows, 60, ' '),
+            tokenizer='words', stop_words=get_stop_words('reviews'))
+    compare("Titres", legacy_titles, make_texts(rows, 20, ', '),
+            tokenizer='title_words', stop_words=get_stop_words('titles'))
+    compare("Tags", legacy_tags, make_texts(rows, 13, ' , '), tokenizer='tags')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+benchmarks/bench_upload_log.py
+
+Coût d'enregistrement d'un upload selon la taille de l'historique : ancien
+_metadata.txt (téléchargé, complété, renvoyé en entier) comparé au journal
+JSONL (data_collection/upload_log.py : un nouveau segment par flush).
+Mesure aussi la lecture des statistiques d'ingestion avant et après
+compaction.
+
+Stockage simulé (benchmarks/fake_storage.py), sans erreurs réseau.
+
+Usage : python benchmarks/bench_upload_log.py [uploads] [latence_ms]
+"""
+
+import os
+import sys
+import time
+from datetime import date, datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_storage import FakeStorageClient
+from data_collection.blobstore import SupabaseBackend
+from data_collection.upload_log import UploadLog, ingestion_stats
+
+CHECKPOINTS = (10, 100, 1000)
+
+
+def legacy_append(bucket, path):
+    entry = f"\n--- Upload {datetime.now()} ---\nNouveaux fichiers : 1\nFichiers ignorés (doublons) : 0\n".encode()
+    try:
+        entry = bucket.download(path) + entry
+    except Exception:
+        pass
+    bucket.upload(path, entry, {"upsert": "true"})
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0
+
+    legacy_client = FakeStorageClient(latency=latency)
+    bucket = legacy_client.storage.from_('user-data')
+
+    log_client = FakeStorageClient(latency=latency)
+    upload_log = UploadLog(SupabaseBackend(lambda: log_client, root='upload_log'), max_events=50)
+
+    print(f"{'Historique':>10}{'_metadata.txt (octets / upload)':>34}{'journal (octets / upload)':>28}")
+
+    for i in range(1, count + 1):
+        legacy_append(bucket, 'raw_data/user/finance_pro/_metadata.txt')
+        upload_log.record('upload', user_id='user', template_name='finance_pro', files_saved=1,
+                          files_skipped=0, bytes_saved=1000, files=[], seconds=0.1)
+
+        if i in CHECKPOINTS:
+            upload_log.flush()
+            # Ancien format : le fichier entier est téléchargé puis renvoyé à chaque upload
+            size = len(bucket.download('raw_data/user/finance_pro/_metadata.txt'))
+            print(f"{i:>10}{2 * size:>34,}{log_client.bytes_uploaded // i:>28,}")
+
+    upload_log.flush()
+    print(f"\nTransfert total : _metadata.txt {legacy_client.bytes_uploaded / 1e6:.1f} Mo envoyés "
+          f"(+ autant téléchargés), journal {log_client.bytes_uploaded / 1e6:.2f} Mo, {upload_log.segments} segments")
+
+    for label in ("avant compaction", "après compaction"):
+        start = time.perf_counter()
+        stats = ingestion_stats(upload_log.events())
+        print(f"Statistiques {label} : {time.perf_counter() - start:.3f} s ({int(stats['uploads'].sum())} uploads)")
+        if label == "avant compaction":
+            upload_log.compact(date.today())
+
+
+if __name__ == '__main__':
+    main()
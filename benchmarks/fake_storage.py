@@ -0,0 +1,106 @@
+"""
+benchmarks/fake_storage.py
+
+Faux client Supabase Storage en mémoire, pour mesurer la collecte sans réseau.
+
+Même interface que le client : client.storage.from_(bucket).upload / download
+/ list / remove. Chaque appel attend une latence (aller-retour + octets / débit),
+peut échouer aléatoirement (erreur réseau) et partage un nombre limité de
+connexions, comme le pool httpx (auth/supabase_pool.py).
+"""
+
+import random
+import threading
+import time
+
+
+class FakeStorageError(Exception):
+    """Erreur Storage (status 404 : objet absent)."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class FakeBucket:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def upload(self, path, data, file_options=None):
+        self.client._call(len(data))
+        with self.client.lock:
+            self.client.objects[(self.name, path)] = bytes(data)
+            self.client.bytes_uploaded += len(data)
+
+    def download(self, path):
+        with self.client.lock:
+            data = self.client.objects.get((self.name, path))
+        self.client._call(len(data) if data is not None else 0)
+        if data is None:
+            raise FakeStorageError(f"Object not found: {path}", status=404)
+        return data
+
+    def list(self, path, options=None):
+        """Entrées directement sous `path` (fichiers et dossiers), comme Storage."""
+        options = options or {}
+        prefix = path.rstrip('/') + '/'
+        self.client._call(0)
+        with self.client.lock:
+            names = sorted({
+                key[len(prefix):].split('/')[0]
+                for bucket, key in self.client.objects
+                if bucket == self.name and key.startswith(prefix)
+            })
+        offset = options.get('offset', 0)
+        return [{'name': name} for name in names[offset:offset + options.get('limit', 100)]]
+
+    def remove(self, paths):
+        self.client._call(0)
+        with self.client.lock:
+            for path in paths:
+                self.client.objects.pop((self.name, path), None)
+
+
+class FakeStorage:
+    def __init__(self, client):
+        self.client = client
+
+    def from_(self, bucket):
+        return FakeBucket(self.client, bucket)
+
+
+class FakeStorageClient:
+    """
+    Args:
+        latency (float): Aller-retour par appel (secondes)
+        bandwidth (float): Débit par connexion (octets / seconde)
+        failure_rate (float): Probabilité qu'un appel échoue (ConnectionError)
+        max_connections (int): Appels simultanés (pool de connexions)
+    """
+
+    def __init__(self, latency=0.05, bandwidth=20e6, failure_rate=0.0, max_connections=20, seed=0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.failure_rate = failure_rate
+        self.objects = {}
+        self.calls = 0
+        self.failures = 0
+        self.bytes_uploaded = 0
+        self.lock = threading.Lock()
+        self.storage = FakeStorage(self)
+        self._connections = threading.Semaphore(max_connections)
+        self._random = random.Random(seed)
+
+    def _call(self, size):
+        with self.lock:
+            self.calls += 1
+            fail = self._random.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+
+        with self._connections:
+            time.sleep(self.latency + size / self.bandwidth)
+
+        if fail:
+            raise ConnectionError("Fake storage: connexion interrompue")
@@ -0,0 +1,357 @@
+"""
+data_collection/blobstore.py
+
+Stockage adressé par contenu des fichiers collectés.
+
+Chaque contenu est stocké une seule fois, sous son SHA-256 (déjà calculé à
+l'ingestion) :
+
+    raw_data/blobs/<sha[:2]>/<sha>              octets du fichier
+    raw_data/blobs/<sha[:2]>/<sha>.refs.json    références : ["<user>/<template>/<nom>", ...]
+    raw_data/<user>/<template>/_manifest.json   {nom: {sha256, size, type, uploaded_at}}
+
+Le même export uploadé sous un autre nom, sur un autre dashboard ou par un
+autre vendeur n'ajoute qu'une référence (quelques octets) : ni nouveau blob,
+ni nouvel upload. Un blob est supprimé quand sa dernière référence est
+libérée (fichier remplacé, retrait du consentement).
+
+Deux backends : le répertoire local collected_data (développement) et le
+bucket Supabase 'user-data' (production).
+
+Un seul processus écrivain : les fichiers de références et les manifestes
+sont mis à jour en lecture-modification-écriture, protégés par des verrous
+de ce processus (le stockage n'offre pas d'écriture conditionnelle). Toutes
+les écritures passent par le CollectorPipeline unique de l'application ;
+deux processus qui collectent dans le même stockage (plusieurs réplicas de
+l'app, un script en parallèle) peuvent perdre des références. Les lectures
+(job corpus, benchmarks) n'ont pas cette contrainte.
+"""
+
+import json
+import os
+import threading
+import zlib
+from datetime import datetime
+
+# Racine locale du stockage brut (mode développement)
+RAW_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'collected_data', 'raw_data')
+
+BLOBS_DIR = 'blobs'
+MANIFEST_NAME = '_manifest.json'
+
+# Verrous des blobs et des manifestes (répartis par hash)
+LOCK_STRIPES = 64
+
+# Ancien manifeste {nom: sha256} (avant le stockage par contenu)
+LEGACY_HASHES_NAME = '_file_hashes.json'
+
+
+class LocalBackend:
+    """Backend fichiers locaux (racine : collected_data/raw_data)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, path):
+        return os.path.join(self.root, *path.split('/'))
+
+    def read(self, path):
+        try:
+            with open(self._path(path), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, path, data, content_type=None):
+        full_path = self._path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Écriture atomique : un lecteur ne voit jamais un fichier partiel
+        tmp_path = f"{full_path}.tmp{threading.get_ident()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, full_path)
+
+    def delete(self, path):
+        try:
+            os.remove(self._path(path))
+        except FileNotFoundError:
+            pass
+
+    def list(self, path):
+        """Noms des entrées du répertoire `path` ([] s'il n'existe pas)."""
+        try:
+            return sorted(os.listdir(self._path(path)))
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+
+
+def is_not_found(error):
+    """True si l'erreur Storage signale un objet absent (et non une erreur réseau)."""
+    status = getattr(error, 'status', None) or getattr(error, 'status_code', None)
+    if str(status) in ('400', '404'):
+        return True
+    return 'not found' in str(error).lower()
+
+
+class SupabaseBackend:
+    """
+    Backend Supabase Storage (bucket 'user-data').
+
+    Args:
+        client_factory: callable retournant le client service_role partagé
+                        (appelé à chaque opération : le client suit les reconnexions du pool)
+    """
+
+    def __init__(self, client_factory, bucket='user-data', root='raw_data'):
+        self.client_factory = client_factory
+        self.bucket = bucket
+        self.root = root
+
+    def _bucket(self):
+        return self.client_factory().storage.from_(self.bucket)
+
+    def _path(self, path):
+        return f"{self.root}/{path}"
+
+    def read(self, path):
+        try:
+            return self._bucket().download(self._path(path))
+        except Exception as e:
+            # Objet absent : None ; erreur réseau : remontée (l'appelant réessaie)
+            if is_not_found(e):
+                return None
+            raise
+
+    def write(self, path, data, content_type=None):
+        self._bucket().upload(
+            self._path(path),
+            data,
+            file_options={
+                "content-type": content_type or "application/octet-stream",
+                "upsert": "true"
+            }
+        )
+
+    def delete(self, path):
+        try:
+            self._bucket().remove([self._path(path)])
+        except Exception as e:
+            # Déjà supprimé : rien à faire ; erreur réseau : remontée (l'appelant réessaie)
+            if not is_not_found(e):
+                raise
+
+    def list(self, path, page_size=1000):
+        """Noms des objets et dossiers sous `path` (toutes les pages)."""
+        names = []
+        while True:
+            page = self._bucket().list(self._path(path), {'limit': page_size, 'offset': len(names)})
+            names.extend(item['name'] for item in page)
+            if len(page) < page_size:
+                return sorted(names)
+
+
+def _read_json(backend, path, default):
+    data = backend.read(path)
+    if data is None:
+        return default
+    try:
+        return json.loads(data.decode('utf-8'))
+    except ValueError:
+        return default
+
+
+def _write_json(backend, path, value):
+    backend.write(path, json.dumps(value, indent=2).encode('utf-8'), "application/json")
+
+
+class BlobStore:
+    """
+    Blobs adressés par SHA-256, avec manifestes par (utilisateur, dashboard)
+    et compteur de références par blob.
+
+    Les blobs de fichiers différents et les manifestes de dashboards
+    différents s'écrivent en parallèle (verrous répartis par hash) : le
+    fichier de références d'un blob n'est touché que par les uploads de ce
+    contenu, un manifeste que par son utilisateur.
+
+    Les verrous ne protègent que les threads de ce processus : une seule
+    instance doit écrire dans un stockage donné (voir le docstring du module).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._manifest_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._blob_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    # ---------- Chemins ----------
+
+    @staticmethod
+    def blob_path(sha256):
+        return f"{BLOBS_DIR}/{sha256[:2]}/{sha256}"
+
+    @classmethod
+    def refs_path(cls, sha256):
+        return cls.blob_path(sha256) + '.refs.json'
+
+    @staticmethod
+    def manifest_path(user_id, template_name):
+        return f"{user_id}/{template_name}/{MANIFEST_NAME}"
+
+    # ---------- Lecture ----------
+
+    def manifest(self, user_id, template_name):
+        """{nom: {sha256, size, type, uploaded_at}} d'un utilisateur et d'un dashboard."""
+        manifest = _read_json(self.backend, self.manifest_path(user_id, template_name), None)
+        if manifest is not None:
+            return manifest
+
+        # Ancien format : dossier du dashboard avec _file_hashes.json et les fichiers bruts
+        legacy = _read_json(self.backend, f"{user_id}/{template_name}/{LEGACY_HASHES_NAME}", {})
+        return {name: {'sha256': sha256, 'legacy': True} for name, sha256 in legacy.items()}
+
+    def manifests(self):
+        """(utilisateur, dashboard) de tous les dossiers collectés (manifeste ou ancien format)."""
+        for user_id in self.backend.list(''):
+            if user_id == BLOBS_DIR or user_id.startswith(('.', '_')):
+                continue
+            for template_name in self.backend.list(user_id):
+                yield user_id, template_name
+
+    def refs(self, sha256):
+        """Références d'un blob ('<user>/<template>/<nom>')."""
+        return _read_json(self.backend, self.refs_path(sha256), [])
+
+    def read(self, user_id, template_name, name):
+        """Octets d'un fichier d'un manifeste (None si absent)."""
+        entry = self.manifest(user_id, template_name).get(name)
+        if entry is None:
+            return None
+        return self.read_entry(user_id, template_name, name, entry)
+
+    def read_entry(self, user_id, template_name, name, entry):
+        """Octets d'une entrée de manifeste déjà lue (parcours de tous les fichiers)."""
+        if entry.get('legacy'):
+            return self.backend.read(f"{user_id}/{template_name}/{name}")
+        return self.backend.read(self.blob_path(entry['sha256']))
+
+    # ---------- Écriture ----------
+
+    def _blob_lock(self, sha256):
+        return self._blob_locks[int(sha256[:8], 16) % LOCK_STRIPES]
+
+    def _manifest_lock(self, user_id, template_name):
+        return self._manifest_locks[zlib.crc32(self.manifest_path(user_id, template_name).encode()) % LOCK_STRIPES]
+
+    def link(self, ingested, ref):
+        """
+        Ajoute la référence `ref` au blob du fichier ; stocke le blob s'il
+        n'existait pas (idempotent : peut être rejoué après une erreur réseau).
+
+        Returns:
+            list: références précédentes (vide : blob nouvellement stocké)
+        """
+        with self._blob_lock(ingested.sha256):
+            refs = self.refs(ingested.sha256)
+            if not refs:
+                self.backend.write(self.blob_path(ingested.sha256), ingested.content, ingested.type)
+            if ref not in refs:
+                _write_json(self.backend, self.refs_path(ingested.sha256), refs + [ref])
+            return refs
+
+    def release(self, sha256, ref):
+        """Retire une référence ; supprime le blob à la dernière."""
+        with self._blob_lock(sha256):
+            refs = [r for r in self.refs(sha256) if r != ref]
+            if refs:
+                _write_json(self.backend, self.refs_path(sha256), refs)
+            else:
+                self.backend.delete(self.blob_path(sha256))
+                self.backend.delete(self.refs_path(sha256))
+
+    @staticmethod
+    def changed_files(manifest, files):
+        """Fichiers absents du manifeste ou dont le contenu a changé."""
+        return [f for f in files if manifest.get(f.name, {}).get('sha256') != f.sha256]
+
+    def commit(self, user_id, template_name, files):
+        """
+        Enregistre dans le manifeste des fichiers déjà liés (link) ; libère
+        l'ancien blob d'un nom dont le contenu a changé.
+        """
+        with self._manifest_lock(user_id, template_name):
+            manifest = self.manifest(user_id, template_name)
+
+            for ingested in files:
+                entry = manifest.get(ingested.name)
+                if entry is not None and entry['sha256'] == ingested.sha256:
+                    continue
+
+                # Fichier remplacé par un nouveau contenu sous le même nom
+                if entry is not None and not entry.get('legacy'):
+                    self.release(entry['sha256'], f"{user_id}/{template_name}/{ingested.name}")
+
+                manifest[ingested.name] = {
+                    'sha256': ingested.sha256,
+                    'size': ingested.size,
+                    'type': ingested.type,
+                    'uploaded_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                }
+
+            _write_json(self.backend, self.manifest_path(user_id, template_name), manifest)
+
+    def put_many(self, user_id, template_name, files):
+        """
+        Enregistre des fichiers ingérés dans le manifeste (utilisateur, dashboard).
+
+        Args:
+            files (list): IngestedFile (data_collection.ingest), hash déjà calculé
+
+        Returns:
+            list: un dict par fichier {'name', 'sha256', 'status', 'templates'} ;
+                  status : 'stored' (nouveau blob), 'linked' (blob existant,
+                  nouvelle référence) ou 'unchanged' (déjà dans le manifeste) ;
+                  templates : dashboards qui référençaient déjà ce contenu
+        """
+        changed = self.changed_files(self.manifest(user_id, template_name), files)
+        results = {}
+
+        for ingested in changed:
+            previous_refs = self.link(ingested, f"{user_id}/{template_name}/{ingested.name}")
+            results[ingested.name] = link_result(ingested, previous_refs)
+
+        if changed:
+            self.commit(user_id, template_name, changed)
+
+        return [results.get(f.name) or unchanged_result(f, template_name) for f in files]
+
+    def remove_manifest(self, user_id, template_name):
+        """Supprime le manifeste et libère ses références (retrait du consentement)."""
+        with self._manifest_lock(user_id, template_name):
+            manifest = self.manifest(user_id, template_name)
+            for name, entry in manifest.items():
+                if not entry.get('legacy'):
+                    self.release(entry['sha256'], f"{user_id}/{template_name}/{name}")
+            self.backend.delete(self.manifest_path(user_id, template_name))
+            return len(manifest)
+
+
+def link_result(ingested, previous_refs):
+    """Résultat de put_many pour un fichier lié (voir BlobStore.put_many)."""
+    return {
+        'name': ingested.name,
+        'sha256': ingested.sha256,
+        'size': ingested.size,
+        'status': 'linked' if previous_refs else 'stored',
+        'templates': {ref.split('/')[1] for ref in previous_refs}
+    }
+
+
+def unchanged_result(ingested, template_name):
+    """Résultat de put_many pour un fichier déjà dans le manifeste."""
+    return {
+        'name': ingested.name,
+        'sha256': ingested.sha256,
+        'size': ingested.size,
+        'status': 'unchanged',
+        'templates': {template_name}
+    }
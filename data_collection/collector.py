@@ -2,13 +2,25 @@
 data_collection/collector.py - VERSION FINALE
 
 Gestion de la collecte de données avec opt-in obligatoire
+
+Chaque nouveau fichier est conservé brut (CSV d'origine), stocké une seule
+fois par contenu (data_collection/blobstore.py), et en copie Parquet au
+schéma nettoyé des loaders (data_collection/columnar.py). En production,
+les uploads partent en arrière-plan (data_collection/pipeline.py). Chaque
+upload est enregistré dans un journal JSONL (data_collection/upload_log.py).
 """
 
 import streamlit as st
 import hashlib
-from datetime import datetime
 import os
-import json
+import threading
+import time
+
+from data_collection.blobstore import RAW_DATA_DIR, BlobStore, LocalBackend, SupabaseBackend
+from data_collection.columnar import COLUMNAR_DIR, COLUMNAR_PREFIX, columnar_copy
+from data_collection.ingest import ingest_upload
+from data_collection.pipeline import CollectorPipeline
+from data_collection.upload_log import UPLOAD_LOG_DIR, get_upload_log, upload_event
 
 
 def show_data_opt_in(user_email):
@@ -44,12 +56,11 @@ def collect_raw_data(uploaded_files, user_email, template_name):
     """
     try:
         # Vérifier le consentement (déjà vérifié mais double check)
-        from auth.access_manager import get_supabase_client
+        from auth.access_manager import get_supabase_client, get_user_context
         
-        supabase = get_supabase_client()
-        if supabase:
-            response = supabase.table('customers').select('data_consent').eq('email', user_email).execute()
-            if not response.data or not response.data[0].get('data_consent'):
+        if get_supabase_client():
+            context = get_user_context(email=user_email)
+            if context is None or not context.get('data_consent'):
                 return False
         
         # Hash de l'email pour anonymisation
@@ -74,68 +85,100 @@ def _is_production():
         return False
 
 
+_stores = {}
+_stores_lock = threading.Lock()
+_pipeline = None
+
+
+def get_blob_store(production=False):
+    """BlobStore partagé par le processus (local ou Supabase)."""
+    key = 'supabase' if production else 'local'
+
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if production:
+                from auth.access_manager import get_storage_client_factory
+
+                # Client service_role du pool, résolu à chaque opération (threads de fond compris)
+                store = BlobStore(SupabaseBackend(get_storage_client_factory()))
+            else:
+                store = BlobStore(LocalBackend(RAW_DATA_DIR))
+            _stores[key] = store
+
+    return store
+
+
+def get_collector_upload_log(production=False):
+    """Journal des uploads du processus (segments JSONL, local ou bucket Supabase)."""
+    if production:
+        backend_factory = lambda: SupabaseBackend(get_blob_store(production=True).backend.client_factory, root='upload_log')
+        return get_upload_log(backend_factory, 'supabase')
+    return get_upload_log(lambda: LocalBackend(UPLOAD_LOG_DIR), 'local')
+
+
+def get_collector_pipeline():
+    """
+    Pipeline de collecte en arrière-plan du processus (production).
+    Créé au premier appel, depuis le thread de la page (lecture des secrets),
+    puis reprend les jobs restés dans le spool, au démarrage et
+    périodiquement (CollectorPipeline.start).
+    """
+    global _pipeline
+
+    with _stores_lock:
+        if _pipeline is not None:
+            return _pipeline
+
+    store = get_blob_store(production=True)
+    client_factory = store.backend.client_factory
+
+    def write_parquet(name, data):
+        client_factory().storage.from_('user-data').upload(
+            f"{COLUMNAR_PREFIX}/{name}",
+            data,
+            file_options={
+                "content-type": "application/vnd.apache.parquet",
+                "upsert": "true"
+            }
+        )
+
+    upload_log = get_collector_upload_log(production=True)
+
+    with _stores_lock:
+        if _pipeline is None:
+            _pipeline = CollectorPipeline(lambda: store, write_parquet=write_parquet, columnar_copy=columnar_copy,
+                                          upload_log=upload_log)
+            _pipeline.recover()
+            _pipeline.start()
+
+    return _pipeline
+
+
 def save_files_locally(uploaded_files, user_id, template_name):
     """Sauvegarde les fichiers localement (mode développement)."""
-    data_dir = os.path.join(
-        os.path.dirname(__file__), 
-        '..', 
-        'collected_data', 
-        'raw_data',
-        user_id, 
-        template_name
-    )
-    os.makedirs(data_dir, exist_ok=True)
-    
-    # Charger les hashes existants
-    hash_file = os.path.join(data_dir, '_file_hashes.json')
-    if os.path.exists(hash_file):
-        with open(hash_file, 'r') as f:
-            file_hashes = json.load(f)
-    else:
-        file_hashes = {}
-    
-    # Normaliser les fichiers en liste
-    files_list = _normalize_files_input(uploaded_files)
-    files_saved = 0
-    files_skipped = 0
-    
-    for file in files_list:
-        if file is not None:
-            file.seek(0)
-            file_content = file.read()
-            
-            if len(file_content) == 0:
-                file.seek(0)
-                continue
-            
-            current_hash = get_file_hash(file_content)
-            
-            # Vérifier si déjà uploadé
-            if file.name in file_hashes and file_hashes[file.name] == current_hash:
-                files_skipped += 1
-                file.seek(0)
-                continue
-            
-            # Sauvegarder le fichier
-            file_path = os.path.join(data_dir, file.name)
-            with open(file_path, 'wb') as f:
-                f.write(file_content)
-            
-            file_hashes[file.name] = current_hash
-            files_saved += 1
-            file.seek(0)
-    
-    # Sauvegarder les hashes
-    with open(hash_file, 'w') as f:
-        json.dump(file_hashes, f, indent=2)
-    
-    # Sauvegarder metadata
-    metadata_path = os.path.join(data_dir, '_metadata.txt')
-    with open(metadata_path, 'a') as f:
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        f.write(f"\n--- Upload {timestamp} ---\n")
-        f.write(f"Nouveaux fichiers : {files_saved}\n")
-        f.write(f"Fichiers ignorés (doublons) : {files_skipped}\n")
+    store = get_blob_store()
+    start = time.perf_counter()
+
+    # Hash et octets déjà calculés par le loader (aucune relecture)
+    files = [(role, ingest_upload(file)) for role, file in _files_with_roles(uploaded_files)]
+    files = [(role, ingested) for role, ingested in files if ingested.size > 0]
+
+    results = store.put_many(user_id, template_name, [ingested for _, ingested in files])
+
+    for (role, ingested), result in zip(files, results):
+        # Copie Parquet au schéma nettoyé, une fois par contenu et par dashboard
+        if result['status'] != 'unchanged' and template_name not in result['templates']:
+            parquet = columnar_copy(ingested, user_id, template_name, role)
+            if parquet is not None:
+                parquet_path = os.path.join(COLUMNAR_DIR, parquet[0])
+                os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+                with open(parquet_path, 'wb') as f:
+                    f.write(parquet[1])
+
+    # Journal des uploads (écriture en ajout, sans relire l'historique)
+    event = get_collector_upload_log().record('upload', **upload_event(user_id, template_name, results, time.perf_counter() - start))
+    files_saved = event['files_saved']
     
     if files_saved > 0:
         st.success(f"✅ {files_saved} fichier(s) collecté(s) avec succès (local)")
@@ -144,109 +187,16 @@ def save_files_locally(uploaded_files, user_id, template_name):
 
 
 def save_files_to_supabase(uploaded_files, user_id, template_name):
-    """Sauvegarde les fichiers sur Supabase Storage (mode production)."""
+    """
+    Sauvegarde les fichiers sur Supabase Storage (mode production).
+
+    Les fichiers sont déposés dans le spool local puis envoyés en arrière-plan
+    (data_collection/pipeline.py) : la page n'attend pas le stockage.
+    """
     try:
-        from supabase import create_client
-        
-        supabase = create_client(
-            st.secrets["supabase"]["url"],
-            st.secrets["supabase"]["service_role_key"]
-        )
-        
-        base_path = f"raw_data/{user_id}/{template_name}/"
-        hash_file_path = base_path + "_file_hashes.json"
-        
-        # Charger les hashes existants
-        try:
-            hash_data = supabase.storage.from_('user-data').download(hash_file_path)
-            file_hashes = json.loads(hash_data.decode('utf-8'))
-        except:
-            file_hashes = {}
-        
-        # Normaliser les fichiers en liste
-        files_list = _normalize_files_input(uploaded_files)
-        files_saved = 0
-        files_skipped = 0
-        
-        for file in files_list:
-            if file is not None:
-                file.seek(0)
-                file_content = file.read()
-                
-                if len(file_content) == 0:
-                    file.seek(0)
-                    continue
-                
-                current_hash = get_file_hash(file_content)
-                
-                # Vérifier si déjà uploadé
-                if file.name in file_hashes and file_hashes[file.name] == current_hash:
-                    files_skipped += 1
-                    file.seek(0)
-                    continue
-                
-                # Upload vers Supabase
-                file_path = base_path + file.name
-                
-                try:
-                    supabase.storage.from_('user-data').upload(
-                        file_path,
-                        file_content,
-                        file_options={
-                            "content-type": file.type if hasattr(file, 'type') else "text/csv",
-                            "upsert": "true"
-                        }
-                    )
-                    
-                    file_hashes[file.name] = current_hash
-                    files_saved += 1
-                except Exception as e:
-                    print(f"❌ Erreur upload {file.name}: {e}")
-                
-                file.seek(0)
-        
-        # Sauvegarder les hashes mis à jour
-        try:
-            hash_content = json.dumps(file_hashes, indent=2).encode('utf-8')
-            supabase.storage.from_('user-data').upload(
-                hash_file_path,
-                hash_content,
-                file_options={
-                    "content-type": "application/json",
-                    "upsert": "true"
-                }
-            )
-        except Exception as e:
-            print(f"⚠️ Erreur sauvegarde hashes : {e}")
-        
-        # Sauvegarder metadata
-        try:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            metadata_content = f"\n--- Upload {timestamp} ---\nNouveaux fichiers : {files_saved}\nFichiers ignorés (doublons) : {files_skipped}\n".encode()
-            
-            try:
-                old_metadata = supabase.storage.from_('user-data').download(base_path + "_metadata.txt")
-                metadata_content = old_metadata + metadata_content
-            except:
-                pass
-            
-            supabase.storage.from_('user-data').upload(
-                base_path + "_metadata.txt",
-                metadata_content,
-                file_options={
-                    "content-type": "text/plain",
-                    "upsert": "true"
-                }
-            )
-        except Exception as e:
-            print(f"⚠️ Erreur metadata : {e}")
-        
-        # if files_saved > 0:
-        #     st.success(f"✅ {files_saved} fichier(s) collecté(s) avec succès")
-        # elif files_skipped > 0:
-        #     st.info(f"ℹ️ {files_skipped} fichier(s) déjà collecté(s) (doublons ignorés)")
-        
-        return files_saved > 0 or files_skipped > 0
+        pipeline = get_collector_pipeline()
+        pipeline.submit(_files_with_roles(uploaded_files), user_id, template_name)
+        return True
     
     except ImportError:
         st.error("❌ Module supabase non installé.")
@@ -272,6 +222,17 @@ def _normalize_files_input(uploaded_files):
         return [uploaded_files]
 
 
+def _files_with_roles(uploaded_files):
+    """
+    Comme _normalize_files_input, avec la clé de chaque fichier dans le dict
+    ('orderitems', 'orders'...) : elle désigne le loader de la copie Parquet.
+    Clé None pour une liste ou un fichier seul.
+    """
+    if isinstance(uploaded_files, dict):
+        return [(role, f) for role, f in uploaded_files.items() if f is not None]
+    return [(None, f) for f in _normalize_files_input(uploaded_files)]
+
+
 def show_consent_settings(user_email):
     """
     OBSOLÈTE dans le nouveau modèle freemium.
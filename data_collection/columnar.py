@@ -0,0 +1,153 @@
+"""
+data_collection/columnar.py
+
+Copie Parquet des fichiers collectés, au schéma nettoyé des loaders.
+
+Chaque fichier nouvellement collecté est aussi écrit en Parquet (zstd), tel
+que le produit le loader du dashboard (parse_sales, parse_orders...) : mêmes
+colonnes, mêmes types, dates converties. Le DataFrame vient du cache de
+parsing (même clé que la page) : pas de second parsing.
+
+Arborescence (partitions Hive, lues par pandas / pyarrow) :
+
+    parquet/template_name=<dashboard>/export=<type>/upload_date=<AAAA-MM-JJ>/<user_id>_<sha256>.parquet
+
+Les lectures du corpus (read_collected) ne chargent que les colonnes et les
+partitions demandées (filtres poussés jusqu'aux fichiers et row groups).
+"""
+
+import io
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from analytics import customers, finance, seo
+from analytics.normalize import parse_money
+from analytics.schemas import read_export, STATEMENT
+from analytics.streaming import is_large_upload
+from data_collection.parse_cache import parse_cached
+
+# Répertoire racine local du dataset Parquet
+COLUMNAR_DIR = os.path.join(os.path.dirname(__file__), '..', 'collected_data', 'parquet')
+
+# Préfixe du dataset dans le bucket Supabase
+COLUMNAR_PREFIX = 'parquet'
+
+PARQUET_COMPRESSION = 'zstd'
+
+# Lignes par row group (granularité du filtrage par statistiques min/max)
+ROW_GROUP_SIZE = 100_000
+
+
+def _parse_costs(uploaded_file, messages):
+    cost_df = pd.read_csv(uploaded_file)
+    if 'Product' not in cost_df.columns or 'Cost' not in cost_df.columns:
+        return None
+    cost_df['Cost'] = parse_money(cost_df['Cost'])
+    return cost_df[['Product', 'Cost']]
+
+
+def _parse_statement(uploaded_file, messages):
+    df, _ = read_export(uploaded_file, STATEMENT)
+    return df
+
+
+# (dashboard, clé du fichier dans collect_raw_data) → (type d'export, loader du cache de parsing, parse_fn)
+# Les noms de loaders sont ceux des pages : le DataFrame déjà parsé est réutilisé.
+EXPORTS = {
+    ('finance_pro', 'orderitems'): ('order_items', 'finance_sales', finance.parse_sales),
+    ('finance_pro', 'costs'): ('costs', None, _parse_costs),
+    ('finance_pro', 'etsy_statement'): ('statement', None, _parse_statement),
+    ('customer_intelligence', 'orders'): ('orders', 'ci_orders', customers.parse_orders),
+    ('customer_intelligence', 'items'): ('order_items', 'ci_items', customers.parse_items),
+    ('customer_intelligence', 'reviews'): ('reviews', 'ci_reviews', customers.parse_reviews),
+    ('seo_analyzer', 'listings'): ('listings', 'seo_listings', seo.parse_listings),
+    ('seo_analyzer', 'sales'): ('order_items', 'seo_sales', seo.parse_sales)
+}
+
+
+def partition_path(template_name, export, upload_date=None):
+    """Chemin relatif de la partition (template_name=.../export=.../upload_date=...)."""
+    upload_date = upload_date or datetime.now().date()
+    return f"template_name={template_name}/export={export}/upload_date={upload_date.isoformat()}"
+
+
+def parse_for_columnar(uploaded_file, template_name, role):
+    """
+    DataFrame nettoyé d'un fichier collecté (None si pas de loader ou échec).
+
+    Returns:
+        tuple: (type d'export, DataFrame) ou (None, None)
+    """
+    entry = EXPORTS.get((template_name, role))
+    if entry is None:
+        return None, None
+
+    export, loader_name, parse_fn = entry
+
+    # Fichiers volumineux : traités en streaming par la page, jamais chargés entiers
+    if is_large_upload(uploaded_file.size):
+        return None, None
+
+    if loader_name is not None:
+        df, _ = parse_cached(uploaded_file, loader_name, parse_fn)
+    else:
+        df = parse_fn(uploaded_file.stream(), [])
+        uploaded_file.stream()
+
+    if df is None or len(df) == 0:
+        return None, None
+
+    return export, df
+
+
+def to_parquet_bytes(df, user_id, sha256):
+    """Sérialise le DataFrame en Parquet (colonnes user_id et source_sha256 ajoutées)."""
+    df = df.reset_index(drop=True).assign(user_id=user_id, source_sha256=sha256)
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False, compression=PARQUET_COMPRESSION, row_group_size=ROW_GROUP_SIZE)
+    return buffer.getvalue()
+
+
+def columnar_copy(uploaded_file, user_id, template_name, role):
+    """
+    Copie Parquet d'un fichier collecté.
+
+    Args:
+        uploaded_file (IngestedFile): Fichier ingéré (data_collection.ingest)
+        role (str): Clé du fichier dans collect_raw_data ('orderitems', 'orders'...)
+
+    Returns:
+        tuple: (chemin relatif du fichier Parquet, octets) ou None
+    """
+    try:
+        export, df = parse_for_columnar(uploaded_file, template_name, role)
+        if df is None:
+            return None
+
+        name = f"{partition_path(template_name, export)}/{user_id}_{uploaded_file.sha256[:16]}.parquet"
+        return name, to_parquet_bytes(df, user_id, uploaded_file.sha256)
+
+    except Exception as e:
+        # La copie Parquet ne doit jamais faire échouer la collecte du fichier brut
+        print(f"⚠️ Copie Parquet impossible pour {uploaded_file.name}: {e}")
+        return None
+
+
+def read_collected(template_name, export, columns=None, filters=None, root=COLUMNAR_DIR):
+    """
+    Lit les données collectées d'un type d'export (dataset Parquet local).
+
+    Args:
+        columns (list): Colonnes à lire (toutes si None)
+        filters: Filtres pyarrow, ex. [('upload_date', '>=', '2025-01-01'), ('Price', '>', 0)]
+
+    Returns:
+        DataFrame: lignes de tous les fichiers des partitions retenues (vide si aucun)
+    """
+    path = os.path.join(root, f"template_name={template_name}", f"export={export}")
+    if not os.path.isdir(path):
+        return pd.DataFrame(columns=columns)
+
+    return pd.read_parquet(path, columns=columns, filters=filters)
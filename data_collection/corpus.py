@@ -0,0 +1,579 @@
+"""
+data_collection/corpus.py
+
+Benchmarks inter-boutiques calculés sur les données collectées (job hors
+ligne) : les dashboards comparent une boutique à ses pairs sans jamais lire
+les fichiers bruts pendant une requête.
+
+Le job parcourt les manifestes de collected_data/raw_data
+(<utilisateur>/<dashboard>/_manifest.json, ou l'ancien _file_hashes.json)
+et ne parse que les contenus jamais vus : les mesures sont gardées dans
+l'état du job (_processed.json), par SHA-256 pour les listings et les
+commandes, par boutique pour la finance (ventes, fichier de coûts et relevés
+Etsy, remesurés quand l'un d'eux change). Les parsings se font dans un pool
+de processus (loaders d'analytics), puis les mesures sont agrégées par
+boutique, puis entre boutiques :
+
+    margin_rate       taux de marge après frais réels (relevé) et coûts, par boutique
+    average_basket    panier moyen (EUR), par boutique
+    fee_share         part des frais Etsy réels (relevé) dans le CA (%), par boutique
+    seo_score         score SEO moyen des listings, par boutique
+    seo_score_bin     répartition des scores SEO de tous les listings (tranches de 10)
+    shipping_delay    délai d'expédition (jours) de toutes les commandes, par pays
+
+Les frais estimés (~12 % du CA) et les ventes sans coûts ne disent rien des
+boutiques : fee_share ne compte que les boutiques qui ont collecté un relevé
+Etsy, margin_rate que celles qui ont aussi des coûts pour au moins
+MIN_COST_COVERAGE de leur CA (sur la période des relevés).
+
+Résultat : benchmarks.csv, une ligne par indicateur et clé (quelques
+dizaines de lignes), lu par peer_benchmark(). Un indicateur n'est publié
+qu'à partir de MIN_PEERS boutiques.
+
+Usage : python -m data_collection.corpus [--root DIR] [--output DIR] [--workers N] [--full]
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import customers, finance, seo
+from analytics.diagnostics import add_diagnostic
+from analytics.schemas import STATEMENT, classify_export, read_export, read_header
+from analytics.streaming import SalesAggregate
+from data_collection.blobstore import RAW_DATA_DIR, BlobStore, LocalBackend
+
+# Répertoire des résultats du job (état incrémental et benchmarks)
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), '..', 'collected_data', 'corpus')
+
+STATE_NAME = '_processed.json'
+BENCHMARKS_NAME = 'benchmarks.csv'
+BENCHMARKS_PATH = os.path.join(CORPUS_DIR, BENCHMARKS_NAME)
+
+# Nombre minimum de boutiques pour publier un indicateur
+MIN_PEERS = 3
+
+# Part minimum du CA (période des relevés) couverte par des coûts pour compter la marge
+MIN_COST_COVERAGE = 0.8
+
+# Exports mesurés fichier par fichier
+FILE_KINDS = ('listings', 'orders')
+
+# Exports mesurés ensemble, par boutique (ventes, coûts, relevés)
+FINANCE_KINDS = ('order_items', 'costs', 'statement')
+
+# État sauvegardé tous les N parsings (job interrompu : rien à refaire)
+SAVE_EVERY = 50
+
+BENCHMARK_COLUMNS = ['metric', 'key', 'shops', 'n', 'mean', 'p25', 'median', 'p75', 'p90', 'computed_at']
+
+PERCENTILES = (('p25', 25), ('median', 50), ('p75', 75), ('p90', 90))
+
+
+# ==================== MESURES ====================
+
+def _stream(name, data):
+    stream = io.BytesIO(data)
+    stream.name = name
+    return stream
+
+
+def _counts(values):
+    """{valeur entière (str, pour JSON): occurrences}"""
+    return {str(int(value)): int(count) for value, count in pd.Series(values).value_counts().items()}
+
+
+def sniff_kind(data):
+    """Type d'un CSV au nom non reconnu, d'après son en-tête (coûts ou relevé Etsy)."""
+    try:
+        header = set(read_header(io.BytesIO(data), STATEMENT.encoding))
+    except Exception:
+        return None
+
+    if {'Product', 'Cost'} <= header:
+        return 'costs'
+    if header & {'Frais Et Taxes', 'Fees & Taxes'}:
+        return 'statement'
+    return None
+
+
+def measure_file(kind, name, data):
+    """
+    Mesures additives d'un fichier collecté (exécuté dans un processus du pool).
+
+    Returns:
+        tuple: (mesures, messages) ; mesures : {'kind', ...} selon le type
+               d'export (seo_scores, shipping_delays)
+    """
+    stream = _stream(name, data)
+    messages = []
+    measures = {'kind': kind}
+
+    try:
+        if kind == 'listings':
+            df = seo.parse_listings(stream, messages)
+            if df is not None and len(df) > 0:
+                measures['seo_scores'] = _counts(seo.score_titles(df['Title'])['SEO_Score'])
+
+        elif kind == 'orders':
+            df = customers.parse_orders(stream, messages)
+            delays = customers.calculate_shipping_delays(df) if df is not None else None
+            if delays is not None and 'Country' in delays.columns:
+                delays = delays.dropna(subset=['Country', 'Shipping_Delay'])
+                delays = delays[delays['Shipping_Delay'] >= 0]
+                measures['shipping_delays'] = {
+                    str(country): _counts(group['Shipping_Delay'])
+                    for country, group in delays.groupby('Country', observed=True)
+                }
+
+    except Exception as e:
+        add_diagnostic(messages, 'error', 'measure_failed', f"❌ Erreur : {e}", error=repr(e))
+
+    return measures, messages
+
+
+def _statement_sales(df, name, data):
+    """Ventes de la période du relevé (toutes les ventes si le relevé n'a pas de dates)."""
+    statement_df, _ = read_export(_stream(name, data), STATEMENT)
+    if 'Date' not in statement_df.columns or statement_df['Date'].isna().all():
+        return df
+
+    first = statement_df['Date'].min().normalize()
+    last = statement_df['Date'].max().normalize() + pd.Timedelta(days=1)
+    return df[(df['Date'] >= first) & (df['Date'] < last)]
+
+
+def measure_finance(items, costs, statements):
+    """
+    Mesures financières d'une boutique (exécuté dans un processus du pool).
+
+    Les coûts collectés sont appliqués aux ventes (apply_costs) ; les frais
+    viennent des relevés Etsy (calculate_fees), rapportés aux ventes de la
+    période de chaque relevé. Sans relevé, aucun frais n'est mesuré.
+
+    Args:
+        items, costs, statements (list): [(nom, octets)] par type d'export
+
+    Returns:
+        tuple: (mesures, messages) ; mesures : revenue, sales (toutes les
+               ventes) et, avec des relevés, statement_revenue,
+               statement_fees, statement_costs, costed_revenue
+    """
+    messages = []
+    measures = {}
+
+    try:
+        frames = [df for df in (finance.parse_sales(_stream(name, data), messages) for name, data in items)
+                  if df is not None and len(df) > 0]
+        if not frames:
+            return measures, messages
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+        for name, data in costs:
+            df, cost_messages = finance.apply_costs(df, finance.COSTS_FILE_METHOD, cost_file=_stream(name, data))
+            messages.extend(cost_messages)
+
+        sales = SalesAggregate().add(df)
+        measures.update(revenue=float(sales.revenue), sales=int(sales.rows))
+
+        totals = {'statement_revenue': 0.0, 'statement_fees': 0.0, 'statement_costs': 0.0, 'costed_revenue': 0.0}
+        for name, data in statements:
+            period = _statement_sales(df, name, data)
+            period_sales = SalesAggregate().add(period)
+            fees = finance.calculate_fees(period_sales, {'statement_file': _stream(name, data)})
+            if fees['fees_source'] != finance.STATEMENT_FEES_SOURCE or period_sales.revenue <= 0:
+                add_diagnostic(messages, 'warning', 'statement_ignored',
+                               f"⚠️ Relevé {name} ignoré (illisible ou sans ventes sur sa période)", name=name)
+                continue
+
+            totals['statement_revenue'] += float(period_sales.revenue)
+            totals['statement_fees'] += float(fees['frais_etsy'])
+            if 'Cost' in period.columns:
+                totals['statement_costs'] += float(period['Cost'].sum())
+                totals['costed_revenue'] += float(period.loc[period['Cost'] > 0, 'Price'].sum())
+
+        if totals['statement_revenue'] > 0:
+            measures.update(totals)
+
+    except Exception as e:
+        add_diagnostic(messages, 'error', 'measure_failed', f"❌ Erreur : {e}", error=repr(e))
+
+    return measures, messages
+
+
+# ==================== AGRÉGATION ====================
+
+def _summary_row(metric, values):
+    """Ligne de benchmark depuis une valeur par boutique."""
+    values = np.asarray(values, dtype=float)
+    row = {'metric': metric, 'key': '', 'shops': len(values), 'n': len(values), 'mean': float(values.mean())}
+    for name, q in PERCENTILES:
+        row[name] = float(np.percentile(values, q))
+    return row
+
+
+def _weighted_row(metric, key, counts, shops):
+    """Ligne de benchmark depuis {valeur: occurrences} (toutes les commandes ou tous les listings)."""
+    values = np.array(sorted(counts), dtype=float)
+    weights = np.array([counts[value] for value in sorted(counts)], dtype=float)
+    cumulative = np.cumsum(weights)
+    total = cumulative[-1]
+
+    row = {'metric': metric, 'key': key, 'shops': shops, 'n': int(total),
+           'mean': float((values * weights).sum() / total)}
+    for name, q in PERCENTILES:
+        row[name] = float(values[np.searchsorted(cumulative, q / 100 * total)])
+    return row
+
+
+def _shop_totals(measures_list):
+    """Cumule les mesures (listings, commandes) des fichiers d'une boutique."""
+    totals = {'seo_scores': Counter(), 'shipping_delays': {}}
+
+    for measures in measures_list:
+        for score, count in measures.get('seo_scores', {}).items():
+            totals['seo_scores'][int(score)] += count
+        for country, delays in measures.get('shipping_delays', {}).items():
+            country_delays = totals['shipping_delays'].setdefault(country, Counter())
+            for delay, count in delays.items():
+                country_delays[int(delay)] += count
+
+    return totals
+
+
+def compute_benchmarks(measures, shops, finances, min_peers=MIN_PEERS):
+    """
+    Benchmarks inter-boutiques.
+
+    Args:
+        measures (dict): {sha256: mesures de measure_file}
+        shops (dict): {utilisateur: set des sha256 de ses fichiers}
+        finances (dict): {utilisateur: mesures de measure_finance}
+        min_peers (int): Boutiques minimum par indicateur
+
+    Returns:
+        DataFrame: BENCHMARK_COLUMNS
+    """
+    margins, baskets, fee_shares, seo_means = [], [], [], []
+    seo_scores = Counter()
+    delays = {}
+    delay_shops = Counter()
+    shops_with_delays = 0
+
+    for shop_finance in finances.values():
+        if shop_finance.get('sales', 0) > 0 and shop_finance.get('revenue', 0) > 0:
+            baskets.append(shop_finance['revenue'] / shop_finance['sales'])
+
+        # Frais réels uniquement (relevé Etsy), rapportés aux ventes de la même période
+        revenue = shop_finance.get('statement_revenue', 0)
+        if revenue > 0:
+            fee_shares.append(shop_finance['statement_fees'] / revenue * 100)
+            if shop_finance['costed_revenue'] >= MIN_COST_COVERAGE * revenue:
+                margin = revenue - shop_finance['statement_fees'] - shop_finance['statement_costs']
+                margins.append(margin / revenue * 100)
+
+    for user_id, hashes in shops.items():
+        totals = _shop_totals(measures[sha256] for sha256 in hashes if sha256 in measures)
+
+        if totals['seo_scores']:
+            count = sum(totals['seo_scores'].values())
+            seo_means.append(sum(score * n for score, n in totals['seo_scores'].items()) / count)
+            seo_scores.update(totals['seo_scores'])
+
+        if totals['shipping_delays']:
+            shops_with_delays += 1
+        for country, country_delays in totals['shipping_delays'].items():
+            delays.setdefault(country, Counter()).update(country_delays)
+            delay_shops[country] += 1
+
+    rows = []
+    for metric, values in (('margin_rate', margins), ('average_basket', baskets),
+                           ('fee_share', fee_shares), ('seo_score', seo_means)):
+        if len(values) >= min_peers:
+            rows.append(_summary_row(metric, values))
+
+    if len(seo_means) >= min_peers:
+        total = sum(seo_scores.values())
+        for low in range(0, 100, 10):
+            high = 100 if low == 90 else low + 9
+            count = sum(n for score, n in seo_scores.items() if low <= score <= high)
+            rows.append({'metric': 'seo_score_bin', 'key': f"{low}-{high}", 'shops': len(seo_means),
+                         'n': count, 'mean': count / total * 100})
+
+    # Toutes les commandes (clé vide), puis par pays
+    if shops_with_delays >= min_peers:
+        all_delays = Counter()
+        for country_delays in delays.values():
+            all_delays.update(country_delays)
+        rows.append(_weighted_row('shipping_delay', '', all_delays, shops_with_delays))
+
+    for country in sorted(delays):
+        if delay_shops[country] >= min_peers:
+            rows.append(_weighted_row('shipping_delay', country, delays[country], delay_shops[country]))
+
+    benchmarks = pd.DataFrame(rows, columns=BENCHMARK_COLUMNS).round(2)
+    benchmarks['computed_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return benchmarks
+
+
+# ==================== JOB ====================
+
+def _load_state(path):
+    """(mesures par fichier, finances par boutique) de la dernière exécution."""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+        return state.get('files', {}), state.get('finances', {})
+    except (OSError, ValueError):
+        return {}, {}
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _save_state(path, measures, finances):
+    _write_atomic(path, json.dumps({'files': measures, 'finances': finances}).encode('utf-8'))
+
+
+def scan_corpus(store):
+    """
+    Fichiers collectés, dédoublonnés par boutique et par contenu (le même
+    export envoyé à deux dashboards n'est compté qu'une fois).
+
+    Returns:
+        tuple: ({utilisateur: set des sha256}, {sha256: (utilisateur, dashboard, nom, entrée du manifeste)})
+    """
+    shops = {}
+    files = {}
+
+    for user_id, template_name in store.manifests():
+        for name, entry in store.manifest(user_id, template_name).items():
+            sha256 = entry.get('sha256')
+            if not sha256:
+                continue
+            shops.setdefault(user_id, set()).add(sha256)
+            files.setdefault(sha256, (user_id, template_name, name, entry))
+
+    return shops, files
+
+
+def run_corpus(store, output_dir=CORPUS_DIR, workers=None, full=False, min_peers=MIN_PEERS, progress=None):
+    """
+    Met à jour les mesures des fichiers collectés et recalcule les benchmarks.
+
+    Args:
+        store (BlobStore): Stockage des fichiers collectés (local ou Supabase)
+        workers (int): Processus du pool (défaut : nombre de cœurs ; 1 = sans pool)
+        full (bool): Ignorer l'état et tout reparser
+        progress: fonction(parsings terminés, total à parser, nom) (optionnel)
+
+    Returns:
+        dict: {'files', 'parsed', 'cached', 'skipped', 'errors', 'shops', 'benchmarks', 'seconds'}
+              (parsed : fichiers et boutiques remesurés ; skipped : exports non mesurés, avis par exemple)
+    """
+    start = time.perf_counter()
+    state_path = os.path.join(output_dir, STATE_NAME)
+    measures, finances = ({}, {}) if full else _load_state(state_path)
+
+    shops, files = scan_corpus(store)
+
+    # Contenus et boutiques qui ne sont plus référencés (fichier remplacé, consentement retiré)
+    measures = {sha256: m for sha256, m in measures.items() if sha256 in files}
+    finances = {user_id: f for user_id, f in finances.items() if user_id in shops}
+
+    summary = {'files': len(files), 'parsed': 0, 'cached': len(measures), 'skipped': 0, 'errors': 0}
+
+    def read(user_id, template_name, name, entry):
+        try:
+            return store.read_entry(user_id, template_name, name, entry)
+        except Exception as e:
+            print(f"⚠️ Lecture impossible de {user_id}/{template_name}/{name} : {e}")
+            return None
+
+    # Tâches : (nom, fonction du pool, chargement des arguments, enregistrement du résultat)
+    tasks = []
+
+    for sha256, (user_id, template_name, name, entry) in files.items():
+        if sha256 in measures:
+            continue
+
+        kind = classify_export(name)
+        if kind is None and name.lower().endswith('.csv'):
+            data = read(user_id, template_name, name, entry)
+            kind = sniff_kind(data) if data is not None else None
+
+        if kind in FILE_KINDS:
+            def load(file=(user_id, template_name, name, entry), kind=kind):
+                data = read(*file)
+                return None if data is None else (kind, file[2], data)
+
+            def save(result, sha256=sha256):
+                measures[sha256] = result
+
+            tasks.append((name, measure_file, load, save))
+        else:
+            measures[sha256] = {'kind': kind}
+            summary['skipped'] += 1
+
+    # Finance : une tâche par boutique dont les ventes, coûts ou relevés ont changé
+    for user_id, hashes in shops.items():
+        inputs = {
+            kind: sorted(sha256 for sha256 in hashes if measures.get(sha256, {}).get('kind') == kind)
+            for kind in FINANCE_KINDS
+        }
+        if not inputs['order_items']:
+            finances.pop(user_id, None)
+            continue
+        if finances.get(user_id, {}).get('inputs') == inputs:
+            continue
+
+        def load(inputs=inputs):
+            args = []
+            for kind in FINANCE_KINDS:
+                loaded = []
+                for sha256 in inputs[kind]:
+                    file = files[sha256]
+                    data = read(*file)
+                    if data is None:
+                        return None
+                    loaded.append((file[2], data))
+                args.append(loaded)
+            return tuple(args)
+
+        def save(result, user_id=user_id, inputs=inputs):
+            finances[user_id] = {'inputs': inputs, 'measures': result}
+
+        tasks.append((f"{user_id[:12]} (finance)", measure_finance, load, save))
+
+    def done(task, result):
+        name, _, _, save = task
+        task_measures, messages = result
+        for message in messages:
+            if message.level == 'error':
+                summary['errors'] += 1
+                print(f"⚠️ {name} : {' '.join(message.text.split())}")
+        save(task_measures)
+        summary['parsed'] += 1
+        if summary['parsed'] % SAVE_EVERY == 0:
+            _save_state(state_path, measures, finances)
+        if progress is not None:
+            progress(summary['parsed'], len(tasks), name)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks) or 1))
+
+    if workers == 1:
+        for task in tasks:
+            args = task[2]()
+            if args is not None:
+                done(task, task[1](*args))
+    else:
+        # Fichiers lus au fil de l'eau : au plus 2 tâches par processus en mémoire
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            pending = {}
+            queue = iter(tasks)
+            while True:
+                while len(pending) < 2 * workers:
+                    task = next(queue, None)
+                    if task is None:
+                        break
+                    args = task[2]()
+                    if args is not None:
+                        pending[executor.submit(task[1], *args)] = task
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done(pending.pop(future), future.result())
+
+    _save_state(state_path, measures, finances)
+
+    shop_finances = {user_id: f['measures'] for user_id, f in finances.items()}
+    benchmarks = compute_benchmarks(measures, shops, shop_finances, min_peers)
+    _write_atomic(os.path.join(output_dir, BENCHMARKS_NAME), benchmarks.to_csv(index=False).encode('utf-8'))
+
+    summary.update(shops=len(shops), benchmarks=len(benchmarks), seconds=time.perf_counter() - start)
+    return summary
+
+
+# ==================== LECTURE (DASHBOARDS) ====================
+
+_benchmarks_cache = {}
+
+
+def load_benchmarks(path=BENCHMARKS_PATH):
+    """Table des benchmarks (None si le job n'a jamais tourné) ; relue quand le fichier change."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = _benchmarks_cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    try:
+        # keep_default_na=False : la clé 'NA' (Namibie) n'est pas une valeur manquante
+        benchmarks = pd.read_csv(path, dtype={'metric': str, 'key': str}, keep_default_na=False)
+        for column in BENCHMARK_COLUMNS[2:-1]:
+            benchmarks[column] = pd.to_numeric(benchmarks[column], errors='coerce')
+    except Exception as e:
+        print(f"⚠️ Benchmarks illisibles ({path}) : {e}")
+        return None
+
+    _benchmarks_cache[path] = (mtime, benchmarks)
+    return benchmarks
+
+
+def peer_benchmark(metric, key='', path=BENCHMARKS_PATH):
+    """
+    Benchmark d'un indicateur entre boutiques.
+
+    Returns:
+        dict: {'shops', 'n', 'mean', 'p25', 'median', 'p75', 'p90', 'computed_at'} ou None
+    """
+    benchmarks = load_benchmarks(path)
+    if benchmarks is None:
+        return None
+
+    rows = benchmarks[(benchmarks['metric'] == metric) & (benchmarks['key'] == key)]
+    if rows.empty:
+        return None
+    return rows.iloc[0].drop(['metric', 'key']).to_dict()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks inter-boutiques sur les données collectées (local)")
+    parser.add_argument('--root', default=RAW_DATA_DIR, help="Racine du stockage brut (collected_data/raw_data)")
+    parser.add_argument('--output', default=CORPUS_DIR, help="Répertoire de l'état et de benchmarks.csv")
+    parser.add_argument('--workers', type=int, default=None, help="Processus en parallèle (défaut : nombre de cœurs)")
+    parser.add_argument('--min-peers', type=int, default=MIN_PEERS, help="Boutiques minimum par indicateur")
+    parser.add_argument('--full', action='store_true', help="Reparser tous les fichiers (ignorer l'état)")
+    args = parser.parse_args(argv)
+
+    summary = run_corpus(BlobStore(LocalBackend(args.root)), args.output, workers=args.workers,
+                         full=args.full, min_peers=args.min_peers)
+    print(f"{summary['shops']} boutiques, {summary['files']} fichiers ({summary['parsed']} parsés, "
+          f"{summary['cached']} déjà traités, {summary['skipped']} non mesurés, {summary['errors']} erreurs), {summary['benchmarks']} benchmarks "
+          f"en {summary['seconds']:.1f} s → {os.path.join(args.output, BENCHMARKS_NAME)}")
+
+
+if __name__ == '__main__':
+    main()
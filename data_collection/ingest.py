@@ -0,0 +1,97 @@
+"""
+data_collection/ingest.py
+
+Étape d'ingestion des fichiers uploadés : chaque fichier est lu une seule fois.
+
+Le SHA-256 est calculé par blocs directement sur le buffer de l'upload (sans
+copie), puis réutilisé par le cache de parsing (clé) et par le collector
+(détection des doublons) ; le collector reçoit les mêmes octets, sans
+seek/read ni hash supplémentaire. Seuls la taille et le hash sont mémorisés
+par upload, jamais les octets.
+"""
+
+import hashlib
+import io
+import threading
+import weakref
+
+# Taille des blocs de hash (octets)
+CHUNK_SIZE = 1024 * 1024
+
+
+class IngestedFile:
+    """
+    Fichier uploadé, hashé une fois.
+
+    Attributs : name, type, size, sha256.
+
+    Args:
+        uploaded_file: Upload Streamlit, BytesIO ou flux quelconque
+        digest (tuple): (size, sha256) déjà calculés pour cet upload (optionnel)
+    """
+
+    def __init__(self, uploaded_file, digest=None):
+        self.name = getattr(uploaded_file, 'name', None)
+        self.type = getattr(uploaded_file, 'type', None) or "text/csv"
+
+        if hasattr(uploaded_file, 'getbuffer'):
+            self.file = uploaded_file
+        else:
+            # Flux quelconque : une seule lecture, conservée en mémoire
+            uploaded_file.seek(0)
+            self.file = io.BytesIO(uploaded_file.read())
+            self.file.name = self.name
+
+        if digest is not None:
+            self.size, self.sha256 = digest
+            return
+
+        hasher = hashlib.sha256()
+        # Vue mémoire sur le buffer de l'upload : aucune copie
+        with self.file.getbuffer() as view:
+            self.size = len(view)
+            for start in range(0, self.size, CHUNK_SIZE):
+                hasher.update(view[start:start + CHUNK_SIZE])
+        self.sha256 = hasher.hexdigest()
+
+    @property
+    def content(self):
+        """Octets du fichier (getvalue() partage le buffer de l'upload)."""
+        return self.file.getvalue()
+
+    def stream(self):
+        """Flux positionné au début, pour le parser (pd.read_csv, json.load)."""
+        self.file.seek(0)
+        return self.file
+
+
+# Upload → (size, sha256). Les valeurs ne référencent pas l'upload : l'entrée
+# disparaît avec lui (une valeur qui garderait l'upload le rendrait immortel).
+_digests = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def ingest_upload(uploaded_file):
+    """
+    Retourne l'IngestedFile d'un upload (hash calculé une seule fois par objet fichier).
+
+    Le loader de la page et collect_raw_data() appellent tous deux cette
+    fonction : le second appel réutilise le hash du premier.
+    """
+    if uploaded_file is None or isinstance(uploaded_file, IngestedFile):
+        return uploaded_file
+
+    try:
+        with _lock:
+            digest = _digests.get(uploaded_file)
+    except TypeError:
+        # Objet sans référence faible possible : hashé à chaque appel
+        return IngestedFile(uploaded_file)
+
+    ingested = IngestedFile(uploaded_file, digest)
+
+    if digest is None:
+        with _lock:
+            _digests[uploaded_file] = (ingested.size, ingested.sha256)
+
+    return ingested
@@ -0,0 +1,224 @@
+"""
+data_collection/parse_cache.py
+
+Cache des DataFrames parsés depuis les exports Etsy uploadés.
+
+Clé : (type de loader, SHA-256 du contenu) — le hash calculé à l'ingestion
+(data_collection/ingest.py), réutilisé ensuite par le collector.
+Deux vendeurs (ou deux onglets) qui uploadent le même export ne le parsent
+qu'une fois. Le cache est partagé par le processus, plafonné en mémoire (LRU)
+et peut déborder sur disque au format Parquet (PARSE_CACHE_DIR).
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+from analytics.diagnostics import as_diagnostic
+from data_collection.ingest import ingest_upload
+
+# Plafond mémoire du cache (octets)
+PARSE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Répertoire de débordement Parquet (désactivé si vide)
+PARSE_CACHE_DIR = os.environ.get('PARSE_CACHE_DIR', '')
+
+
+def _frame_size(df):
+    try:
+        return int(df.memory_usage(deep=True).sum())
+    except Exception:
+        return 0
+
+
+class ParseCache:
+    """
+    Cache LRU de (DataFrame, messages) plafonné en octets, avec débordement Parquet.
+
+    Args:
+        max_bytes (int): Taille mémoire maximale des DataFrames en cache
+        spill_dir (str): Répertoire Parquet pour les entrées évincées (optionnel)
+    """
+
+    def __init__(self, max_bytes=PARSE_CACHE_MAX_BYTES, spill_dir=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir or None
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+    def _spill_paths(self, key):
+        name = f"{key[0]}_{key[1]}"
+        return (os.path.join(self.spill_dir, name + '.parquet'),
+                os.path.join(self.spill_dir, name + '.json'))
+
+    def get(self, key):
+        """
+        Returns:
+            tuple ou None: (DataFrame copié, messages)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0].copy(), list(entry[1])
+
+        entry = self._load_spilled(key)
+        if entry is not None:
+            self.disk_hits += 1
+            self.put(key, entry[0], entry[1], spill=False)
+            return entry[0].copy(), list(entry[1])
+
+        self.misses += 1
+        return None
+
+    def put(self, key, df, messages, spill=True):
+        size = _frame_size(df)
+
+        # Trop gros pour la mémoire : directement sur disque
+        if size > self.max_bytes:
+            if spill:
+                self._spill(key, df, messages)
+            return
+
+        evicted = []
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[2]
+
+            self._entries[key] = (df, list(messages), size)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_entry = self._entries.popitem(last=False)
+                self.current_bytes -= old_entry[2]
+                evicted.append((old_key, old_entry))
+
+        if spill:
+            for old_key, old_entry in evicted:
+                self._spill(old_key, old_entry[0], old_entry[1])
+
+    def _spill(self, key, df, messages):
+        if not self.spill_dir:
+            return
+
+        parquet_path, messages_path = self._spill_paths(key)
+        if os.path.exists(parquet_path):
+            return
+
+        try:
+            df.to_parquet(parquet_path, index=True)
+            with open(messages_path, 'w') as f:
+                json.dump(messages, f)
+        except Exception as e:
+            # Colonnes non sérialisables en Parquet : on garde seulement la mémoire
+            print(f"⚠️ Débordement Parquet impossible pour {key[0]}: {e}")
+            for path in (parquet_path, messages_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _load_spilled(self, key):
+        if not self.spill_dir:
+            return None
+
+        parquet_path, messages_path = self._spill_paths(key)
+        if not os.path.exists(parquet_path):
+            return None
+
+        try:
+            import pandas as pd
+            df = pd.read_parquet(parquet_path)
+            messages = []
+            if os.path.exists(messages_path):
+                with open(messages_path) as f:
+                    messages = [as_diagnostic(m) for m in json.load(f)]
+            return df, messages
+        except Exception:
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses
+            }
+
+
+_cache = ParseCache(spill_dir=PARSE_CACHE_DIR)
+
+
+def get_parse_cache():
+    """Retourne le cache partagé par le processus (toutes sessions confondues)."""
+    return _cache
+
+
+def show_messages(messages):
+    """Affiche les messages d'un loader : liste de Diagnostic → st.success/info/warning/error."""
+    for message in messages:
+        diagnostic = as_diagnostic(message)
+        getattr(st, diagnostic.level)(diagnostic.text)
+
+
+def parse_cached(uploaded_file, loader_name, parse_fn):
+    """
+    Parse un fichier uploadé une seule fois par contenu, sans rien afficher.
+
+    Args:
+        uploaded_file: Fichier Streamlit (UploadedFile)
+        loader_name (str): Identifiant du loader (fait partie de la clé)
+        parse_fn: fonction(uploaded_file, messages) -> DataFrame ou None ;
+                  `messages` est une liste de Diagnostic à compléter (add_diagnostic)
+
+    Returns:
+        tuple: (DataFrame (copie propre à l'appelant) ou None, messages)
+    """
+    ingested = ingest_upload(uploaded_file)
+    key = (loader_name, ingested.sha256)
+
+    cache = get_parse_cache()
+    cached = cache.get(key)
+
+    if cached is not None:
+        return cached
+
+    messages = []
+    df = parse_fn(ingested.stream(), messages)
+    ingested.stream()
+
+    if df is not None:
+        cache.put(key, df, messages)
+        return df.copy(), messages
+
+    return None, messages
+
+
+def load_cached(uploaded_file, loader_name, parse_fn):
+    """
+    Parse un fichier uploadé une seule fois par contenu et affiche les messages du loader.
+
+    Returns:
+        DataFrame (copie propre à l'appelant) ou None
+    """
+    df, messages = parse_cached(uploaded_file, loader_name, parse_fn)
+    show_messages(messages)
+    return df
@@ -0,0 +1,410 @@
+"""
+data_collection/pipeline.py
+
+Collecte en arrière-plan : la page dépose les fichiers dans un spool local et
+continue son rendu ; les uploads vers le stockage se font dans un pool de
+threads.
+
+Étapes d'un upload (job) :
+    1. submit()   : octets écrits dans le spool (disque local), job planifié ;
+                    fichiers déjà collectés ou en cours écartés (aucune écriture)
+    2. prepare    : lecture du manifeste, fichiers déjà collectés écartés
+    3. link       : un blob par fichier, en parallèle (au plus max_workers)
+    4. finalize   : manifeste, copie Parquet, journal des uploads, spool supprimé
+
+Chaque étape est réessayée avec un délai exponentiel (avec gigue) ; un job
+qui échoue malgré tout reste dans le spool et est repris par recover(), au
+démarrage puis toutes les RECOVER_INTERVAL secondes (thread de fond) : le
+spool se vide dès que le stockage redevient disponible, sans redémarrage.
+Les étapes sont idempotentes (voir BlobStore.link).
+"""
+
+import io
+import json
+import os
+import random
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from data_collection.blobstore import link_result, unchanged_result
+from data_collection.ingest import IngestedFile, ingest_upload
+from data_collection.upload_log import upload_event
+
+# Répertoire du spool local (survit au redémarrage du processus)
+SPOOL_DIR = os.environ.get(
+    'COLLECTOR_SPOOL_DIR',
+    os.path.join(os.path.dirname(__file__), '..', 'collected_data', 'spool')
+)
+
+# Uploads simultanés vers le stockage
+MAX_PARALLEL_UPLOADS = int(os.environ.get('COLLECTOR_MAX_PARALLEL_UPLOADS', '4'))
+
+# Tentatives par étape, délai de base entre deux tentatives (secondes, doublé à chaque échec)
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+# Intervalle entre deux reprises des jobs en échec restés dans le spool (secondes)
+RECOVER_INTERVAL = int(os.environ.get('COLLECTOR_RECOVER_INTERVAL', '300'))
+
+JOB_FILE = 'job.json'
+
+
+def with_retries(fn, *args, attempts=MAX_ATTEMPTS, backoff=BACKOFF_BASE):
+    """Appelle fn(*args), réessaie après une exception (délai exponentiel avec gigue)."""
+    for attempt in range(attempts):
+        try:
+            return fn(*args)
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            delay = min(BACKOFF_MAX, backoff * 2 ** attempt)
+            time.sleep(delay * (0.5 + random.random()))
+
+
+class CollectorJob:
+    """Upload en cours : fichiers d'un utilisateur pour un dashboard, spoolés."""
+
+    def __init__(self, job_dir, user_id, template_name, files):
+        self.job_dir = job_dir
+        self.user_id = user_id
+        self.template_name = template_name
+        self.files = files          # [(role, IngestedFile)]
+        self.changed = []           # [(role, IngestedFile)] absents du manifeste
+        self.results = {}           # nom → résultat de link (voir BlobStore.put_many)
+        self.pending = 0
+        self.error = None
+        self.created = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def keys(self):
+        return file_keys(self.user_id, self.template_name, self.files)
+
+
+def file_keys(user_id, template_name, files):
+    """Clés (utilisateur, dashboard, nom, sha256) de fichiers [(rôle, IngestedFile)]."""
+    return {(user_id, template_name, ingested.name, ingested.sha256) for _, ingested in files}
+
+
+class CollectorPipeline:
+    """
+    Pipeline de collecte en arrière-plan (spool local + pool d'uploads).
+
+    Args:
+        store_factory: callable retournant le BlobStore (appelé dans les threads du pool)
+        write_parquet: fonction(chemin relatif, octets) pour la copie Parquet (optionnel)
+        columnar_copy: fonction(IngestedFile, user_id, template_name, role) -> (chemin, octets) ou None
+        upload_log: UploadLog où enregistrer chaque upload terminé (optionnel)
+        spool_dir (str): Répertoire du spool
+        max_workers (int): Uploads simultanés
+        recover_interval (float): Secondes entre deux reprises du spool (voir start)
+    """
+
+    def __init__(self, store_factory, write_parquet=None, columnar_copy=None, upload_log=None, spool_dir=SPOOL_DIR,
+                 max_workers=MAX_PARALLEL_UPLOADS, attempts=MAX_ATTEMPTS, backoff=BACKOFF_BASE,
+                 recover_interval=RECOVER_INTERVAL):
+        self.store_factory = store_factory
+        self.write_parquet = write_parquet
+        self.columnar_copy = columnar_copy
+        self.upload_log = upload_log
+        self.spool_dir = spool_dir
+        self.attempts = attempts
+        self.backoff = backoff
+        self.recover_interval = recover_interval
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.files_saved = 0
+        self.files_skipped = 0
+        self._active = set()
+        self._collected = set()     # clés déjà dans un manifeste (commit ou manifeste lu)
+        self._queued = set()        # clés des jobs en cours ou en échec (dans le spool)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='collector')
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+    # ---------- Spool ----------
+
+    def submit(self, uploaded_files, user_id, template_name):
+        """
+        Dépose les fichiers dans le spool et planifie leur upload (non bloquant).
+
+        Args:
+            uploaded_files (list): [(clé, fichier uploadé)] (voir collector._files_with_roles)
+
+        Appelé à chaque rerun : des fichiers déjà collectés (ou en cours
+        d'envoi) sont écartés sans écriture dans le spool ni lecture du
+        manifeste (hash déjà calculé par le loader).
+
+        Returns:
+            str: identifiant du job (None si aucun fichier non vide à collecter)
+        """
+        files = [(role, ingest_upload(file)) for role, file in uploaded_files if file is not None]
+        files = [(role, ingested) for role, ingested in files if ingested.size > 0]
+
+        with self._lock:
+            files = [(role, ingested) for role, ingested in files
+                     if not self._is_known((user_id, template_name, ingested.name, ingested.sha256))]
+        if not files:
+            return None
+
+        job_id = f"{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        job_dir = os.path.join(self.spool_dir, job_id)
+
+        # Job actif avant d'exister sur disque : recover() ne le prend pas pour un job incomplet
+        with self._lock:
+            self._active.add(job_dir)
+
+        try:
+            os.makedirs(job_dir)
+
+            for _, ingested in files:
+                with open(os.path.join(job_dir, ingested.sha256), 'wb') as f:
+                    f.write(ingested.content)
+
+            # job.json écrit en dernier (renommage atomique) : un job sans job.json est incomplet
+            description = {
+                'user_id': user_id,
+                'template_name': template_name,
+                'files': [
+                    {'role': role, 'name': ingested.name, 'type': ingested.type, 'sha256': ingested.sha256}
+                    for role, ingested in files
+                ]
+            }
+            tmp_path = os.path.join(job_dir, JOB_FILE + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(description, f)
+            os.replace(tmp_path, os.path.join(job_dir, JOB_FILE))
+        except Exception:
+            with self._lock:
+                self._active.discard(job_dir)
+                self._idle.notify_all()
+            raise
+
+        self._schedule(CollectorJob(job_dir, user_id, template_name, files))
+        return job_id
+
+    def _is_known(self, key):
+        return key in self._collected or key in self._queued
+
+    def recover(self):
+        """
+        Replanifie les jobs restés dans le spool (arrêt du processus, stockage
+        indisponible). Les jobs incomplets (sans job.json) sont supprimés ;
+        les jobs en cours ne sont pas touchés.
+
+        Returns:
+            int: Nombre de jobs replanifiés
+        """
+        with self._lock:
+            active = set(self._active)
+
+        recovered = 0
+        for entry in sorted(os.scandir(self.spool_dir), key=lambda entry: entry.name):
+            if not entry.is_dir() or entry.path in active:
+                continue
+
+            job = self._load_job(entry.path)
+            if job is None:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+
+            self._schedule(job)
+            recovered += 1
+
+        return recovered
+
+    def start(self):
+        """Démarre le thread de reprise périodique du spool (idempotent)."""
+        if not self.recover_interval:
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="collector-recover", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.recover_interval):
+            try:
+                recovered = self.recover()
+                if recovered:
+                    print(f"ℹ️ Collecte : {recovered} job(s) du spool replanifié(s)")
+            except Exception as e:
+                print(f"⚠️ Reprise du spool impossible : {e}")
+
+    def _load_job(self, job_dir):
+        try:
+            with open(os.path.join(job_dir, JOB_FILE)) as f:
+                description = json.load(f)
+
+            files = []
+            for item in description['files']:
+                with open(os.path.join(job_dir, item['sha256']), 'rb') as f:
+                    stream = io.BytesIO(f.read())
+                stream.name = item['name']
+                stream.type = item['type']
+                ingested = IngestedFile(stream)
+                # Contenu du spool altéré : le job est abandonné
+                if ingested.sha256 != item['sha256']:
+                    return None
+                files.append((item['role'], ingested))
+
+            return CollectorJob(job_dir, description['user_id'], description['template_name'], files)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    # ---------- Étapes ----------
+
+    def _schedule(self, job):
+        with self._lock:
+            self._active.add(job.job_dir)
+            self._queued.update(job.keys)
+            self.submitted += 1
+        self._executor.submit(self._prepare, job)
+
+    def _retry(self, fn, *args):
+        return with_retries(fn, *args, attempts=self.attempts, backoff=self.backoff)
+
+    def _prepare(self, job):
+        try:
+            store = self.store_factory()
+            manifest = self._retry(store.manifest, job.user_id, job.template_name)
+            with self._lock:
+                self._collected.update(
+                    (job.user_id, job.template_name, name, entry['sha256'])
+                    for name, entry in manifest.items() if entry.get('sha256')
+                )
+            changed = {f.name for f in store.changed_files(manifest, [ingested for _, ingested in job.files])}
+            job.changed = [(role, ingested) for role, ingested in job.files if ingested.name in changed]
+        except Exception as e:
+            self._fail(job, e)
+            return
+
+        if not job.changed:
+            self._executor.submit(self._finalize, job)
+            return
+
+        # Un blob par fichier, en parallèle ; le dernier terminé planifie finalize
+        job.pending = len(job.changed)
+        for role, ingested in job.changed:
+            self._executor.submit(self._link, job, store, ingested)
+
+    def _link(self, job, store, ingested):
+        try:
+            ref = f"{job.user_id}/{job.template_name}/{ingested.name}"
+            previous_refs = self._retry(store.link, ingested, ref)
+            job.results[ingested.name] = link_result(ingested, previous_refs)
+        except Exception as e:
+            job.error = e
+
+        with job._lock:
+            job.pending -= 1
+            last = job.pending == 0
+
+        if last:
+            self._executor.submit(self._finalize, job)
+
+    def _finalize(self, job):
+        if job.error is not None:
+            self._fail(job, job.error)
+            return
+
+        try:
+            store = self.store_factory()
+            changed = [ingested for _, ingested in job.changed]
+            if changed:
+                self._retry(store.commit, job.user_id, job.template_name, changed)
+
+            self._write_columnar(job)
+
+            files_saved = len(changed)
+            files_skipped = len(job.files) - files_saved
+            if self.upload_log is not None:
+                results = [job.results.get(f.name) or unchanged_result(f, job.template_name) for _, f in job.files]
+                self.upload_log.record('upload', **upload_event(
+                    job.user_id, job.template_name, results, time.monotonic() - job.created
+                ))
+        except Exception as e:
+            self._fail(job, e)
+            return
+
+        shutil.rmtree(job.job_dir, ignore_errors=True)
+
+        with self._lock:
+            self.completed += 1
+            self.files_saved += files_saved
+            self.files_skipped += files_skipped
+            self._collected.update(job.keys)
+            self._queued.difference_update(job.keys)
+            self._active.discard(job.job_dir)
+            self._idle.notify_all()
+
+    def _write_columnar(self, job):
+        """Copie Parquet, une fois par contenu et par dashboard (échec sans effet sur le job)."""
+        if self.columnar_copy is None or self.write_parquet is None:
+            return
+
+        for role, ingested in job.changed:
+            result = job.results.get(ingested.name)
+            if result is None or job.template_name in result['templates']:
+                continue
+            parquet = self.columnar_copy(ingested, job.user_id, job.template_name, role)
+            if parquet is not None:
+                try:
+                    self._retry(self.write_parquet, *parquet)
+                except Exception as e:
+                    print(f"⚠️ Erreur upload Parquet {ingested.name}: {e}")
+
+    def _fail(self, job, error):
+        # Le job reste dans le spool (clés toujours en attente) : repris par recover()
+        print(f"⚠️ Collecte en échec ({job.template_name}), conservée dans le spool : {error}")
+        with self._lock:
+            self.failed += 1
+            self._active.discard(job.job_dir)
+            self._idle.notify_all()
+
+    # ---------- Suivi ----------
+
+    def drain(self, timeout=None):
+        """Attend la fin des jobs en cours. Retourne True si tous sont terminés."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'active': len(self._active),
+                'files_saved': self.files_saved,
+                'files_skipped': self.files_skipped
+            }
+
+    def shutdown(self, timeout=30):
+        """Attend les jobs en cours puis arrête le pool (les jobs restants restent dans le spool)."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+        self.drain(timeout)
+        self._executor.shutdown(wait=False)
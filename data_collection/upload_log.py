@@ -0,0 +1,316 @@
+"""
+data_collection/upload_log.py
+
+Journal des uploads collectés : un événement JSON par upload, en segments
+JSONL écrits une seule fois.
+
+    <AAAA-MM-JJ>/<horodatage>-<pid>-<id>.jsonl         segments (une écriture par flush)
+    <AAAA-MM-JJ>/compacted-<horodatage>-<id>.jsonl     segments fusionnés (compact)
+
+Les événements sont bufferisés et écrits en un nouveau segment toutes les
+FLUSH_INTERVAL secondes, dès SEGMENT_MAX_EVENTS événements (rotation) et à
+l'arrêt du processus : une écriture ne relit jamais l'historique (coût
+constant, sans course entre deux uploads simultanés), contrairement à
+l'ancien _metadata.txt téléchargé, complété puis renvoyé en entier.
+
+compact() fusionne les segments d'un jour passé en un seul ; les lectures
+dédoublonnent les événements par id (un lecteur peut voir un segment et sa
+version compactée le temps de la suppression).
+
+Usage : python -m data_collection.upload_log stats|compact [--days N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.write_behind import register_queue
+
+# Répertoire local du journal (mode développement)
+UPLOAD_LOG_DIR = os.path.join(os.path.dirname(__file__), '..', 'collected_data', 'upload_log')
+
+# Rotation : nombre maximum d'événements par segment
+SEGMENT_MAX_EVENTS = 500
+
+# Intervalle entre deux flushs automatiques (secondes)
+FLUSH_INTERVAL = 10
+
+SEGMENT_SUFFIX = '.jsonl'
+
+
+def _day_name(day):
+    return day.isoformat()
+
+
+class UploadLog:
+    """
+    Journal append-only des uploads (segments JSONL sur un backend du BlobStore).
+
+    Args:
+        backend: LocalBackend ou SupabaseBackend (data_collection/blobstore.py)
+        max_events (int): Événements par segment avant rotation
+        interval (float): Secondes entre deux flushs automatiques
+    """
+
+    def __init__(self, backend, max_events=SEGMENT_MAX_EVENTS, interval=FLUSH_INTERVAL):
+        self.backend = backend
+        self.max_events = max_events
+        self.interval = interval
+        self.written = 0
+        self.segments = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # ---------- Écriture ----------
+
+    def record(self, event_type, **fields):
+        """Ajoute un événement (horodaté, avec un id unique) ; flush si le segment est plein."""
+        event = {
+            'id': uuid.uuid4().hex,
+            'ts': datetime.now().isoformat(timespec='seconds'),
+            'event': event_type,
+            **fields
+        }
+
+        with self._lock:
+            self._buffer.append(event)
+            full = len(self._buffer) >= self.max_events
+
+        if full:
+            self.flush()
+        else:
+            self.start()
+
+        return event
+
+    def flush(self):
+        """
+        Écrit les événements en attente dans un nouveau segment par jour.
+
+        Returns:
+            int: Nombre d'événements écrits
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._buffer
+                self._buffer = []
+
+            if not batch:
+                return 0
+
+            by_day = {}
+            for event in batch:
+                by_day.setdefault(event['ts'][:10], []).append(event)
+
+            written = 0
+            for day, events in by_day.items():
+                name = f"{day}/{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}{SEGMENT_SUFFIX}"
+                data = ''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in events).encode('utf-8')
+                try:
+                    self.backend.write(name, data, "application/x-ndjson")
+                    written += len(events)
+                    self.segments += 1
+                except Exception as e:
+                    # Remis en tête du buffer : réessayé au prochain flush
+                    print(f"⚠️ Journal des uploads non écrit ({len(events)} événements) : {e}")
+                    with self._lock:
+                        self._buffer[:0] = events
+
+            self.written += written
+            return written
+
+    def start(self):
+        """Démarre le thread de flush périodique (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="upload-log-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+
+    def stop(self, timeout=10):
+        """Arrête le thread et écrit les événements en attente (arrêt du processus)."""
+        self._stop_event.set()
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+        self.flush()
+
+    # ---------- Lecture ----------
+
+    def days(self):
+        """Jours présents dans le journal."""
+        names = []
+        for name in self.backend.list(''):
+            try:
+                names.append(date.fromisoformat(name))
+            except ValueError:
+                continue
+        return sorted(names)
+
+    def _segments(self, day):
+        return [name for name in self.backend.list(_day_name(day)) if name.endswith(SEGMENT_SUFFIX)]
+
+    def _read_segment(self, day, name):
+        data = self.backend.read(f"{_day_name(day)}/{name}")
+        if not data:
+            return []
+        return [json.loads(line) for line in data.decode('utf-8').splitlines() if line.strip()]
+
+    def events(self, since=None, until=None):
+        """
+        Événements du journal, du plus ancien au plus récent.
+
+        Args:
+            since, until (date): Bornes incluses (tout le journal si None)
+
+        Returns:
+            DataFrame: une ligne par événement (colonnes id, ts, event, ...)
+        """
+        events = {}
+        for day in self.days():
+            if (since is not None and day < since) or (until is not None and day > until):
+                continue
+            for name in self._segments(day):
+                for event in self._read_segment(day, name):
+                    events[event['id']] = event
+
+        df = pd.DataFrame(list(events.values()))
+        if df.empty:
+            return df
+        df['ts'] = pd.to_datetime(df['ts'])
+        return df.sort_values('ts', kind='stable').reset_index(drop=True)
+
+    # ---------- Maintenance ----------
+
+    def compact(self, day):
+        """
+        Fusionne les segments d'un jour en un seul (jour terminé de préférence).
+
+        Returns:
+            int: Nombre de segments fusionnés (0 si déjà compact)
+        """
+        names = self._segments(day)
+        if len(names) <= 1:
+            return 0
+
+        events = {}
+        for name in names:
+            for event in self._read_segment(day, name):
+                events[event['id']] = event
+
+        ordered = sorted(events.values(), key=lambda event: event['ts'])
+        data = ''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in ordered).encode('utf-8')
+
+        # Nouveau segment écrit avant la suppression des anciens : aucun événement perdu
+        compacted = f"compacted-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}{SEGMENT_SUFFIX}"
+        self.backend.write(f"{_day_name(day)}/{compacted}", data, "application/x-ndjson")
+        for name in names:
+            self.backend.delete(f"{_day_name(day)}/{name}")
+
+        return len(names)
+
+    def compact_before(self, day):
+        """Compacte tous les jours antérieurs à `day`. Retourne le nombre de segments fusionnés."""
+        return sum(self.compact(d) for d in self.days() if d < day)
+
+
+def ingestion_stats(events):
+    """
+    Statistiques d'ingestion par jour et par dashboard.
+
+    Args:
+        events (DataFrame): UploadLog.events()
+
+    Returns:
+        DataFrame: day, template_name, uploads, users, files_saved, files_skipped, bytes_saved
+    """
+    columns = ['day', 'template_name', 'uploads', 'users', 'files_saved', 'files_skipped', 'bytes_saved']
+    if events.empty:
+        return pd.DataFrame(columns=columns)
+
+    uploads = events[events['event'] == 'upload']
+    stats = uploads.assign(day=uploads['ts'].dt.date).groupby(['day', 'template_name']).agg(
+        uploads=('id', 'size'),
+        users=('user_id', 'nunique'),
+        files_saved=('files_saved', 'sum'),
+        files_skipped=('files_skipped', 'sum'),
+        bytes_saved=('bytes_saved', 'sum')
+    ).reset_index()
+    return stats[columns]
+
+
+def upload_event(user_id, template_name, results, seconds=None):
+    """Champs d'un événement 'upload' depuis les résultats de BlobStore.put_many."""
+    saved = [result for result in results if result['status'] != 'unchanged']
+    return {
+        'user_id': user_id,
+        'template_name': template_name,
+        'files_saved': len(saved),
+        'files_skipped': len(results) - len(saved),
+        'bytes_saved': sum(result.get('size', 0) for result in saved if result['status'] == 'stored'),
+        'files': [
+            {'name': result['name'], 'sha256': result['sha256'], 'status': result['status']}
+            for result in results
+        ],
+        'seconds': round(seconds, 3) if seconds is not None else None
+    }
+
+
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def get_upload_log(backend_factory, key):
+    """Journal partagé par le processus pour `key` (flush garanti à l'arrêt)."""
+    with _logs_lock:
+        log = _logs.get(key)
+        if log is None:
+            log = register_queue(UploadLog(backend_factory()))
+            _logs[key] = log
+    return log
+
+
+def main(argv=None):
+    from data_collection.blobstore import LocalBackend
+
+    parser = argparse.ArgumentParser(description="Journal des uploads collectés (local)")
+    parser.add_argument('command', choices=['stats', 'compact'])
+    parser.add_argument('--days', type=int, default=None,
+                        help="stats : N derniers jours (30) ; compact : jours antérieurs aux N derniers (0 : avant aujourd'hui)")
+    parser.add_argument('--root', default=UPLOAD_LOG_DIR)
+    args = parser.parse_args(argv)
+
+    log = UploadLog(LocalBackend(args.root))
+    if args.command == 'compact':
+        cutoff = date.today() - timedelta(days=args.days or 0)
+        print(f"{log.compact_before(cutoff)} segments fusionnés")
+    else:
+        cutoff = date.today() - timedelta(days=args.days or 30)
+        print(ingestion_stats(log.events(since=cutoff)).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+import os
+import sys
+import tempfile
+import zipfile
+
+# Ajouter le chemin parent pour les imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.access_manager import check_access, has_insights_subscription, show_insights_upgrade_cta
+from analytics.schemas import EXPORT_KINDS, classify_export
+from reports.batch import run_batch
+
+# Limites de l'archive importée, vérifiées avant extraction (archive piégée, « zip bomb »)
+MAX_EXTRACTED_BYTES = 2 * 1024 ** 3
+MAX_ARCHIVE_ENTRIES = 10000
+
+# Configuration de la page
+st.set_page_config(
+    page_title="Export par lots - Etsy Analytics",
+    page_icon="📦",
+    layout="wide"
+)
+
+st.markdown("""
+    <style>
+    /* Masquer les pages home, dashboard et signup dans la navigation */
+    [data-testid="stSidebarNav"] li:has(a[href*="home"]),
+    [data-testid="stSidebarNav"] li:has(a[href*="dashboard"]),
+    [data-testid="stSidebarNav"] li:has(a[href*="thank_you"]),
+    [data-testid="stSidebarNav"] li:has(a[href*="signup"]) {
+        display: none !important;
+    }
+    </style>
+""", unsafe_allow_html=True)
+
+# ========== VÉRIFICATION D'ACCÈS ==========
+user_info = check_access()
+customer_id = user_info.get('id')
+
+st.title("📦 Export par lots")
+st.markdown("### Rapports Finance, Customer Intelligence et SEO de toutes vos boutiques, en une archive")
+
+# Export PDF : réservé aux abonnés Insights
+if not has_insights_subscription(customer_id):
+    st.warning("🔒 **Export par lots réservé aux abonnés Insights Premium**")
+    show_insights_upgrade_cta()
+    st.stop()
+
+with st.expander("📁 Format de l'archive à importer"):
+    st.markdown("""
+    Une archive **.zip** avec **un dossier par boutique**, contenant les exports Etsy de la boutique :
+
+    ```
+    boutique_a/EtsySoldOrderItems2024.csv
+    boutique_a/EtsySoldOrders2024.csv
+    boutique_a/EtsyListingsDownload.csv
+    boutique_a/reviews.json
+    boutique_b/...
+    ```
+    """)
+    st.dataframe(pd.DataFrame(
+        [(kind, ', '.join(fragments)) for kind, fragments in EXPORT_KINDS],
+        columns=['Export', 'Le nom du fichier contient']
+    ), hide_index=True)
+
+exports_zip = st.file_uploader("Archive des exports (un dossier par boutique)", type=['zip'])
+
+col1, col2 = st.columns(2)
+days = col1.selectbox(
+    "Période",
+    [None, 30, 90, 365],
+    format_func=lambda value: "Tout" if value is None else f"{value} derniers jours"
+)
+workers = col2.number_input(
+    "Processus en parallèle",
+    min_value=1,
+    max_value=os.cpu_count() or 1,
+    value=os.cpu_count() or 1
+)
+
+if exports_zip is not None and st.button("📥 Générer tous les rapports", type="primary", use_container_width=True):
+    with tempfile.TemporaryDirectory() as work_dir:
+        exports_dir = os.path.join(work_dir, 'exports')
+        output_path = os.path.join(work_dir, 'rapports.zip')
+
+        try:
+            with zipfile.ZipFile(exports_zip) as archive:
+                members = archive.infolist()
+                extracted_bytes = sum(member.file_size for member in members)
+                if len(members) > MAX_ARCHIVE_ENTRIES or extracted_bytes > MAX_EXTRACTED_BYTES:
+                    st.error(f"❌ Archive trop volumineuse : {len(members)} fichiers, "
+                             f"{extracted_bytes / 1024 ** 2:,.0f} Mo une fois décompressée "
+                             f"(maximum {MAX_ARCHIVE_ENTRIES} fichiers, {MAX_EXTRACTED_BYTES / 1024 ** 3:.0f} Go)")
+                    st.stop()
+                archive.extractall(exports_dir, members)
+        except zipfile.BadZipFile:
+            st.error("❌ Archive zip invalide")
+            st.stop()
+
+        # Archive d'un seul dossier racine : les boutiques sont ses sous-dossiers
+        entries = [entry for entry in os.scandir(exports_dir) if not entry.name.startswith(('.', '_'))]
+        if len(entries) == 1 and entries[0].is_dir() and not any(
+            entry.is_file() and classify_export(entry.name) for entry in os.scandir(entries[0].path)
+        ):
+            exports_dir = entries[0].path
+
+        progress_bar = st.progress(0.0, text="Analyse des boutiques...")
+
+        def show_progress(done, total, result):
+            progress_bar.progress(done / total, text=f"{done}/{total} boutiques ({result['shop']})")
+
+        summary = run_batch(exports_dir, output_path, workers=int(workers), days=days, progress=show_progress)
+        progress_bar.empty()
+
+        if summary['shops'] == 0:
+            st.error("❌ Aucune boutique trouvée : l'archive doit contenir un dossier d'exports par boutique")
+            st.stop()
+
+        with open(output_path, 'rb') as f:
+            st.session_state['batch_export'] = (f.read(), summary)
+
+if 'batch_export' in st.session_state:
+    data, summary = st.session_state['batch_export']
+
+    st.success(f"✅ {summary['shops']} boutiques, {summary['files']} fichiers en {summary['seconds']:.1f} s")
+    if summary['errors']:
+        st.warning(f"⚠️ {summary['errors']} erreurs : voir journal.csv dans l'archive")
+
+    st.dataframe(pd.DataFrame(summary['results']).rename(columns={
+        'shop': 'Boutique', 'seconds': 'Temps (s)', 'files': 'Fichiers', 'errors': 'Erreurs'
+    }), width='stretch', hide_index=True)
+
+    st.download_button(
+        label="⬇️ Télécharger l'archive des rapports",
+        data=data,
+        file_name=f"rapports_etsy_{datetime.now().strftime('%Y%m%d')}.zip",
+        mime="application/zip",
+        use_container_width=True
+    )
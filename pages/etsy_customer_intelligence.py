@@ -3,16 +3,8 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import io
-import json
+from datetime import datetime
 from collections import Counter
-import re
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
 import sys
 import os
 
@@ -28,12 +20,26 @@ from auth.access_manager import (
     show_insights_upgrade_cta,
     show_locked_recommendation,
     check_usage_limit,
-    increment_usage,
     show_usage_limit_message,
     should_increment_usage,
-    increment_usage_with_timestamp
+    record_analysis
 )
 from data_collection.collector import show_data_opt_in
+from data_collection.corpus import peer_benchmark
+from data_collection.parse_cache import load_cached
+from data_collection.ingest import ingest_upload
+from analytics.schemas import SOLD_ORDERS
+from analytics.streaming import is_large_upload, stream_orders
+from analytics.customers import (
+    analyze_customer_retention, analyze_geography, analyze_reviews_sentiment, calculate_shipping_delays,
+    extract_all_words, parse_items, parse_orders, parse_reviews
+)
+from analytics.text_stats import top_terms
+from analytics.cube import DailyCube, ORDERS_MEASURES, WEEKDAYS, get_cube, period_start
+from analytics.timeindex import since
+from reports.jobs import content_hash
+from reports.pdf import generate_customer_intelligence_pdf
+from reports.download import show_pdf_export
 
 # Configuration de la page
 st.set_page_config(
@@ -117,401 +123,25 @@ st.markdown("""
 
 # ==================== FONCTIONS DE CHARGEMENT ====================
 
-@st.cache_data
+# Périodes d'analyse (sidebar) → nombre de jours
+PERIOD_DAYS = {
+    "30 derniers jours": 30,
+    "90 derniers jours": 90,
+    "6 mois": 180,
+    "1 an": 365
+}
+
 def load_orders_data(uploaded_file):
-    """Charge les données de commandes Etsy"""
-    try:
-        df = pd.read_csv(uploaded_file, encoding='utf-8')
-        
-        # Mapping des colonnes
-        column_mapping = {
-            'Date de vente': 'Date',
-            'Sale Date': 'Date',
-            'Commande n°': 'Order_ID',
-            'Order ID': 'Order_ID',
-            'Acheteur': 'Buyer',
-            'Buyer': 'Buyer',
-            'Nom complet': 'Buyer_Name',
-            'Full Name': 'Buyer_Name',
-            'Pays de livraison': 'Country',
-            'Ship Country': 'Country',
-            'Ville de livraison': 'City',
-            'Ship City': 'City',
-            'Total de la commande': 'Total',
-            'Order Total': 'Total',
-            'Date d\'envoi': 'Ship_Date',
-            'Date Shipped': 'Ship_Date',
-            'Date Paid': 'Date_Paid'
-        }
-        
-        for old_col, new_col in column_mapping.items():
-            if old_col in df.columns and new_col not in df.columns:
-                df = df.rename(columns={old_col: new_col})
-        
-        # Conversion des dates
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce', format='mixed')
-        if 'Ship_Date' in df.columns:
-            df['Ship_Date'] = pd.to_datetime(df['Ship_Date'], errors='coerce', format='mixed')
-        if 'Date_Paid' in df.columns:
-            df['Date_Paid'] = pd.to_datetime(df['Date_Paid'], errors='coerce', format='mixed')
-        
-        # Nettoyage des montants
-        if 'Total' in df.columns:
-            df['Total'] = (df['Total'].astype(str)
-                          .str.replace(',', '.', regex=False)
-                          .str.replace(' ', '', regex=False)
-                          .str.replace('€', '', regex=False)
-                          .str.replace('EUR', '', regex=False))
-            df['Total'] = pd.to_numeric(df['Total'], errors='coerce')
-        
-        # Nettoyage des pays
-        if 'Country' in df.columns:
-            country_mapping = {
-                'Etats-Unis': 'United States',
-                'États-Unis': 'United States',
-                'Grande-Bretagne': 'United Kingdom',
-                'Royaume-Uni': 'United Kingdom',
-                'Allemagne': 'Germany',
-                'Espagne': 'Spain',
-                'Italie': 'Italy',
-                'Pays-Bas': 'Netherlands',
-                'Suisse': 'Switzerland',
-                'Belgique': 'Belgium',
-                'Andorre': 'Andorra',
-                'Grèce': 'Greece',
-                'Norvège': 'Norway'
-            }
-            df['Country'] = df['Country'].replace(country_mapping)
-        
-        df = df.dropna(subset=['Date'])
-        
-        st.success(f"✅ {len(df)} commandes chargées avec succès !")
-        
-        return df
-        
-    except Exception as e:
-        st.error(f"❌ Erreur : {e}")
-        return None
+    """Charge les commandes (parsées une seule fois par contenu de fichier)"""
+    return load_cached(uploaded_file, 'ci_orders', parse_orders)
 
-@st.cache_data
 def load_items_data(uploaded_file):
-    """Charge les données d'items Etsy"""
-    try:
-        df = pd.read_csv(uploaded_file, encoding='utf-8')
-        
-        column_mapping = {
-            'Sale Date': 'Date',
-            'Item Name': 'Product',
-            'Price': 'Price',
-            'Item Price': 'Price',
-            'Quantity': 'Quantity',
-            'Order ID': 'Order_ID'
-        }
-        
-        for old_col, new_col in column_mapping.items():
-            if old_col in df.columns and new_col not in df.columns:
-                df = df.rename(columns={old_col: new_col})
-        
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce', format='mixed')
-        
-        if 'Price' in df.columns:
-            df['Price'] = pd.to_numeric(df['Price'], errors='coerce')
-        
-        if 'Quantity' not in df.columns:
-            df['Quantity'] = 1
-        
-        df = df.dropna(subset=['Date'])
-        
-        st.success(f"✅ {len(df)} items chargés avec succès !")
-        
-        return df
-        
-    except Exception as e:
-        st.error(f"❌ Erreur : {e}")
-        return None
+    """Charge les items (parsés une seule fois par contenu de fichier)"""
+    return load_cached(uploaded_file, 'ci_items', parse_items)
 
-@st.cache_data
 def load_reviews_data(uploaded_file):
-    """Charge les données de reviews (JSON ou CSV)"""
-    try:
-        file_extension = uploaded_file.name.split('.')[-1].lower()
-        
-        if file_extension == 'json':
-            # Charger depuis JSON
-            reviews_data = json.load(uploaded_file)
-            df = pd.DataFrame(reviews_data)
-            
-            # Mapping des colonnes JSON
-            column_mapping = {
-                'reviewer': 'Reviewer',
-                'date_reviewed': 'Date',
-                'star_rating': 'Rating',
-                'message': 'Review_Text',
-                'order_id': 'Order_ID'
-            }
-            
-            df = df.rename(columns=column_mapping)
-            
-        else:
-            # Charger depuis CSV
-            df = pd.read_csv(uploaded_file, encoding='utf-8')
-            
-            column_mapping = {
-                'Date': 'Date',
-                'Review Date': 'Date',
-                'Rating': 'Rating',
-                'Star Rating': 'Rating',
-                'Review': 'Review_Text',
-                'Comment': 'Review_Text',
-                'Message': 'Review_Text',
-                'Reviewer': 'Reviewer',
-                'Buyer': 'Reviewer',
-                'Order ID': 'Order_ID'
-            }
-            
-            for old_col, new_col in column_mapping.items():
-                if old_col in df.columns and new_col not in df.columns:
-                    df = df.rename(columns={old_col: new_col})
-        
-        # Conversion des dates
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce', format='mixed')
-        
-        # S'assurer que Rating est numérique
-        if 'Rating' in df.columns:
-            df['Rating'] = pd.to_numeric(df['Rating'], errors='coerce')
-        
-        # Remplir les reviews vides
-        if 'Review_Text' in df.columns:
-            df['Review_Text'] = df['Review_Text'].fillna('')
-        
-        df = df.dropna(subset=['Date', 'Rating'])
-        
-        st.success(f"✅ {len(df)} avis chargés avec succès !")
-        
-        return df
-        
-    except Exception as e:
-        st.error(f"❌ Erreur lors du chargement des reviews : {e}")
-        return None
-
-# ==================== FONCTIONS D'ANALYSE ====================
-
-def analyze_geography(orders_df):
-    """Analyse géographique des clients"""
-    
-    if 'Country' not in orders_df.columns:
-        return None, None
-    
-    # Analyse par pays
-    country_analysis = orders_df.groupby('Country').agg({
-        'Order_ID': 'count',
-        'Total': 'sum'
-    }).reset_index()
-    country_analysis.columns = ['Country', 'Orders', 'Revenue']
-    country_analysis['Avg_Basket'] = country_analysis['Revenue'] / country_analysis['Orders']
-    country_analysis = country_analysis.sort_values('Revenue', ascending=False)
-    
-    # Analyse par ville
-    city_analysis = None
-    if 'City' in orders_df.columns:
-        city_analysis = orders_df.groupby('City').agg({
-            'Order_ID': 'count',
-            'Total': 'sum'
-        }).reset_index()
-        city_analysis.columns = ['City', 'Orders', 'Revenue']
-        city_analysis = city_analysis.sort_values('Orders', ascending=False).head(10)
-    
-    return country_analysis, city_analysis
-
-def analyze_customer_retention(orders_df):
-    """Analyse de la fidélisation clients"""
-    
-    if 'Buyer' not in orders_df.columns:
-        return None
-    
-    customer_analysis = orders_df.groupby('Buyer').agg({
-        'Order_ID': 'count',
-        'Total': 'sum',
-        'Date': ['min', 'max']
-    }).reset_index()
-    
-    customer_analysis.columns = ['Buyer', 'Num_Orders', 'Total_Spent', 'First_Order', 'Last_Order']
-    
-    # Calcul du délai entre achats
-    customer_analysis['Days_Between_Orders'] = (
-        customer_analysis['Last_Order'] - customer_analysis['First_Order']
-    ).dt.days / (customer_analysis['Num_Orders'] - 1)
-    
-    customer_analysis['Days_Between_Orders'] = customer_analysis['Days_Between_Orders'].fillna(0)
-    
-    # Lifetime Value
-    customer_analysis['LTV'] = customer_analysis['Total_Spent']
-    
-    # Clients à risque (pas d'achat depuis 90+ jours)
-    customer_analysis['Days_Since_Last'] = (datetime.now() - customer_analysis['Last_Order']).dt.days
-    customer_analysis['Churn_Risk'] = customer_analysis['Days_Since_Last'] > 90
-    
-    return customer_analysis
-
-def analyze_reviews_sentiment(reviews_df):
-    """Analyse de sentiment des reviews"""
-    
-    if reviews_df is None or 'Review_Text' not in reviews_df.columns:
-        return None, None
-    
-    # Mots-clés positifs et négatifs (français et anglais)
-    positive_keywords = [
-        'parfait', 'super', 'excellent', 'magnifique', 'beautiful', 'love', 'great',
-        'rapide', 'soigné', 'qualité', 'quality', 'recommande', 'recommend', 'joli',
-        'conforme', 'ravie', 'ravi', 'merci', 'thank', 'top', 'perfect'
-    ]
-    
-    negative_keywords = [
-        'déçue', 'déçu', 'disappointed', 'abîme', 'broken', 'bad', 'poor',
-        'retard', 'late', 'delay', 'problème', 'problem', 'mauvais', 'petit',
-        'small', 'pas reçu', 'not received', 'scam', 'fraude'
-    ]
-    
-    # Compter les occurrences
-    positive_counts = Counter()
-    negative_counts = Counter()
-    
-    for text in reviews_df['Review_Text']:
-        if pd.notna(text) and text:
-            text_lower = str(text).lower()
-            
-            for keyword in positive_keywords:
-                if keyword in text_lower:
-                    positive_counts[keyword] += text_lower.count(keyword)
-            
-            for keyword in negative_keywords:
-                if keyword in text_lower:
-                    negative_counts[keyword] += text_lower.count(keyword)
-    
-    return positive_counts, negative_counts
-
-def extract_all_words(reviews_df):
-    """Extrait tous les mots significatifs des reviews"""
-    
-    if reviews_df is None or 'Review_Text' not in reviews_df.columns:
-        return Counter()
-    
-    all_words = []
-    
-    # Mots à ignorer (stop words)
-    stop_words = {
-        'le', 'la', 'les', 'un', 'une', 'des', 'de', 'du', 'et', 'à', 'a', 'au',
-        'pour', 'avec', 'dans', 'sur', 'par', 'est', 'qui', 'que', 'the', 'and',
-        'for', 'with', 'in', 'on', 'at', 'to', 'a', 'of', 'is', 'it', 'my', 'i',
-        'très', 'bien', 'pas', 'très', 'c', 'il', 'j', 'ai', 'me', 'ma', 'mon'
-    }
-    
-    for text in reviews_df['Review_Text']:
-        if pd.notna(text) and text:
-            # Nettoyer et tokenizer
-            words = re.findall(r'\b[a-zàâäéèêëïîôùûüÿç]{3,}\b', str(text).lower())
-            # Filtrer les stop words
-            words = [w for w in words if w not in stop_words]
-            all_words.extend(words)
-    
-    return Counter(all_words)
-
-def calculate_shipping_delays(orders_df):
-    """Calcule les délais de livraison"""
-    
-    if 'Date_Paid' not in orders_df.columns or 'Ship_Date' not in orders_df.columns:
-        return None
-    
-    orders_df['Shipping_Delay'] = (
-        orders_df['Ship_Date'] - orders_df['Date_Paid']
-    ).dt.days
-    
-    return orders_df
-
-# ==================== GÉNÉRATION PDF ====================
-
-def generate_customer_intelligence_pdf(orders_df, reviews_df, customer_analysis):
-    """Génère un rapport PDF Customer Intelligence"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Titre
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#F56400'),
-        spaceAfter=30,
-        alignment=1
-    )
-    story.append(Paragraph("👥 Rapport Customer Intelligence", title_style))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Date
-    date_text = f"Généré le : {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
-    story.append(Paragraph(date_text, styles['Normal']))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # KPIs principaux
-    story.append(Paragraph("📊 Indicateurs Clés", styles['Heading2']))
-    
-    total_customers = orders_df['Buyer'].nunique() if 'Buyer' in orders_df.columns else 0
-    total_orders = len(orders_df)
-    avg_rating = reviews_df['Rating'].mean() if reviews_df is not None and 'Rating' in reviews_df.columns else 0
-    
-    kpi_data = [
-        ['Indicateur', 'Valeur'],
-        ['Clients uniques', str(total_customers)],
-        ['Commandes totales', str(total_orders)],
-        ['Note moyenne', f"{avg_rating:.2f}/5" if avg_rating > 0 else 'N/A'],
-        ['Pays couverts', str(orders_df['Country'].nunique()) if 'Country' in orders_df.columns else 'N/A']
-    ]
-    
-    if customer_analysis is not None:
-        repeat_rate = (customer_analysis['Num_Orders'] > 1).sum() / len(customer_analysis) * 100
-        avg_ltv = customer_analysis['LTV'].mean()
-        kpi_data.append(['Taux clients récurrents', f"{repeat_rate:.1f}%"])
-        kpi_data.append(['LTV moyen', f"{avg_ltv:.2f} €"])
-    
-    kpi_table = Table(kpi_data, colWidths=[3*inch, 2*inch])
-    kpi_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F56400')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    story.append(kpi_table)
-    story.append(Spacer(1, 0.5*inch))
-    
-    # Top 5 pays
-    if 'Country' in orders_df.columns:
-        story.append(Paragraph("🌍 Top 5 Pays", styles['Heading2']))
-        
-        country_sales = orders_df.groupby('Country')['Total'].sum().nlargest(5)
-        
-        country_data = [['Pays', 'Chiffre d\'affaires']]
-        for country, revenue in country_sales.items():
-            country_data.append([country, f"{revenue:.2f} €"])
-        
-        country_table = Table(country_data, colWidths=[2.5*inch, 2*inch])
-        country_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F56400')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(country_table)
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+    """Charge les reviews (parsées une seule fois par contenu de fichier)"""
+    return load_cached(uploaded_file, 'ci_reviews', parse_reviews)
 
 # ==================== INTERFACE PRINCIPALE ====================
 
@@ -625,6 +255,51 @@ else:
         show_usage_limit_message(usage_info)
         st.stop()
 
+    # Très gros export de commandes : synthèse calculée par blocs, détail à la demande
+    upload_size = ingest_upload(orders_file).size
+    if is_large_upload(upload_size):
+        st.info(f"📦 Fichier volumineux ({upload_size / 1024 / 1024:.0f} Mo) : synthèse calculée par blocs, sans charger toutes les commandes en mémoire.")
+        
+        if not st.checkbox("Charger le détail complet (avis, comportement d'achat, recommandations)", key='ci_full_detail'):
+            cutoff_date = None
+            if period in PERIOD_DAYS:
+                cutoff_date = period_start(PERIOD_DAYS[period])
+            
+            with st.spinner("⏳ Agrégation des commandes par blocs..."):
+                orders = stream_orders(ingest_upload(orders_file).stream(), SOLD_ORDERS, since=cutoff_date)
+            
+            if items_file is not None and should_increment_usage(customer_id):
+                usage_info = record_analysis(customer_id)
+                if usage_info.get('counted') and not usage_info.get('is_premium'):
+                    st.info(f"📊 Analyse {usage_info['usage_count']}/{usage_info['limit']} cette semaine (reset dans {usage_info['days_until_reset']} jours)")
+            
+            country_analysis, city_analysis = analyze_geography(orders)
+            customer_analysis = analyze_customer_retention(orders)
+            
+            st.markdown("## 🌍 Profil Géographique des Clients")
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Commandes", f"{orders.rows:,}")
+            col2.metric("Pays Couverts", len(country_analysis) if country_analysis is not None else 0)
+            if customer_analysis is not None and len(customer_analysis) > 0:
+                col3.metric("Clients Uniques", f"{len(customer_analysis):,}")
+                col4.metric("Clients Récurrents", f"{(customer_analysis['Num_Orders'] > 1).mean() * 100:.1f}%")
+            
+            if country_analysis is not None:
+                st.dataframe(country_analysis.head(20), width='stretch', hide_index=True)
+            
+            if customer_analysis is not None:
+                st.markdown("## 🔄 Meilleurs Clients")
+                st.dataframe(
+                    customer_analysis.nlargest(20, 'LTV')[['Buyer', 'Num_Orders', 'LTV', 'Days_Since_Last']],
+                    width='stretch', hide_index=True
+                )
+            
+            # Collecte des fichiers (mêmes règles que le mode complet)
+            all_files = {'orders': orders_file, 'items': items_file, 'reviews': reviews_file}
+            from data_collection.collector import collect_raw_data
+            collect_raw_data(all_files, user_info['email'], 'customer_intelligence')
+            st.stop()
+    
     # Chargement des données
     orders_df = load_orders_data(orders_file)
     items_df = None
@@ -635,13 +310,11 @@ else:
 
         # ========== INCRÉMENTER USAGE SI NÉCESSAIRE ==========
         if should_increment_usage(customer_id):
-            increment_usage_with_timestamp(customer_id)
-            
-            # Rafraîchir usage_info
-            usage_info = check_usage_limit(customer_id)
+            # Comptage atomique : retourne directement le quota à jour
+            usage_info = record_analysis(customer_id)
             
             # Message discret pour utilisateurs gratuits
-            if not has_insights_subscription(customer_id):
+            if usage_info.get('counted') and not usage_info.get('is_premium'):
                 st.info(f"📊 Analyse {usage_info['usage_count']}/{usage_info['limit']} cette semaine (reset dans {usage_info['days_until_reset']} jours)")
         
     
@@ -650,23 +323,26 @@ else:
     
     if orders_df is not None:
         
+        # Cube journalier des commandes (jour × pays), construit une fois par fichier
+        orders_cube = None
+        if 'Date' in orders_df.columns:
+            orders_cube = get_cube(
+                ('ci_orders', ingest_upload(orders_file).sha256),
+                lambda: DailyCube.build(orders_df, ORDERS_MEASURES, ('Country',))
+            )
+        
         # Filtrage par période
         if period != "Tout" and 'Date' in orders_df.columns:
-            days_map = {
-                "30 derniers jours": 30,
-                "90 derniers jours": 90,
-                "6 mois": 180,
-                "1 an": 365
-            }
-            if period in days_map:
-                cutoff_date = datetime.now() - timedelta(days=days_map[period])
-                orders_df = orders_df[orders_df['Date'] >= cutoff_date]
+            if period in PERIOD_DAYS:
+                cutoff_date = period_start(PERIOD_DAYS[period])
+                orders_df = since(orders_df, cutoff_date)
+                orders_cube = orders_cube.since(cutoff_date)
                 
                 if items_df is not None and 'Date' in items_df.columns:
-                    items_df = items_df[items_df['Date'] >= cutoff_date]
+                    items_df = since(items_df, cutoff_date)
                 
                 if reviews_df is not None and 'Date' in reviews_df.columns:
-                    reviews_df = reviews_df[reviews_df['Date'] >= cutoff_date]
+                    reviews_df = since(reviews_df, cutoff_date)
         
         # Analyses
         country_analysis, city_analysis = analyze_geography(orders_df)
@@ -926,7 +602,7 @@ else:
                     st.markdown("---")
                     st.markdown("### ☁️ Nuage de Mots des Avis")
                     
-                    top_words = dict(all_words.most_common(30))
+                    top_words = dict(top_terms(all_words, 30))
                     
                     # Créer un graphique à bulles comme nuage de mots
                     words_df = pd.DataFrame({
@@ -984,7 +660,15 @@ else:
                 
                 with col1:
                     avg_delay = orders_with_delays['Shipping_Delay'].mean()
-                    st.metric("Délai Moyen Livraison", f"{avg_delay:.1f} jours")
+                    # Comparaison avec les boutiques collectées (data_collection/corpus.py)
+                    peers = peer_benchmark('shipping_delay')
+                    if peers is not None:
+                        st.metric("Délai Moyen Livraison", f"{avg_delay:.1f} jours",
+                                 delta=f"{avg_delay - peers['mean']:+.1f} j vs boutiques",
+                                 delta_color="inverse",
+                                 help=f"Délai moyen de {int(peers['shops'])} boutiques Etsy : {peers['mean']:.1f} jours")
+                    else:
+                        st.metric("Délai Moyen Livraison", f"{avg_delay:.1f} jours")
                 
                 with col2:
                     median_delay = orders_with_delays['Shipping_Delay'].median()
@@ -1020,7 +704,7 @@ else:
                     st.markdown("### 🌍 Délai Moyen par Pays")
                     
                     if 'Country' in orders_with_delays.columns:
-                        delay_by_country = orders_with_delays.groupby('Country')['Shipping_Delay'].mean().nlargest(10).reset_index()
+                        delay_by_country = orders_with_delays.groupby('Country', observed=True)['Shipping_Delay'].mean().nlargest(10).reset_index()
                         
                         fig = px.bar(
                             delay_by_country,
@@ -1044,8 +728,7 @@ else:
                 with col1:
                     st.markdown("### 📅 Saisonnalité des Ventes (par mois)")
                     
-                    orders_df['Month'] = orders_df['Date'].dt.month
-                    monthly_orders = orders_df.groupby('Month').size().reset_index(name='Orders')
+                    monthly_orders = orders_cube.by_month('Count').reset_index(name='Orders')
                     monthly_orders['Month_Name'] = monthly_orders['Month'].apply(
                         lambda x: ['Jan', 'Fév', 'Mar', 'Avr', 'Mai', 'Jun', 
                                   'Jul', 'Aoû', 'Sep', 'Oct', 'Nov', 'Déc'][x-1]
@@ -1066,11 +749,9 @@ else:
                 with col2:
                     st.markdown("### 📊 Ventes par Jour de la Semaine")
                     
-                    orders_df['DayOfWeek'] = orders_df['Date'].dt.day_name()
-                    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
                     day_names_fr = ['Lun', 'Mar', 'Mer', 'Jeu', 'Ven', 'Sam', 'Dim']
                     
-                    daily_orders = orders_df.groupby('DayOfWeek').size().reindex(day_order).reset_index(name='Orders')
+                    daily_orders = orders_cube.by_weekday('Count').reset_index(name='Orders')
                     daily_orders['Day'] = day_names_fr
                     
                     fig = px.bar(
@@ -1512,14 +1193,11 @@ else:
             
             # Recommandation 4 : Comportement d'achat
             if 'Date' in orders_df.columns:
-                orders_df_temp = orders_df.copy()
-                orders_df_temp['DayOfWeek'] = orders_df_temp['Date'].dt.day_name()
-                day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
                 day_names_fr = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
                 
-                daily_sales = orders_df_temp.groupby('DayOfWeek').size().reindex(day_order)
+                daily_sales = orders_cube.by_weekday('Count')
                 best_day_idx = daily_sales.idxmax()
-                best_day_name = day_names_fr[day_order.index(best_day_idx)]
+                best_day_name = day_names_fr[WEEKDAYS.index(best_day_idx)]
                 
                 recommendations.append({
                     'priority': '🟢 OPPORTUNITÉ',
@@ -1660,20 +1338,16 @@ else:
             st.markdown("</div>", unsafe_allow_html=True)
 
         else:
-            # MODE PAYANT : Export disponible
-            if st.button("📥 Générer le rapport PDF", type="primary", use_container_width=True):
-                with st.spinner("Génération du rapport en cours..."):
-                    pdf_buffer = generate_pdf_report(kpis, df, product_analysis)
-                    
-                    st.download_button(
-                        label="⬇️ Télécharger le rapport PDF",
-                        data=pdf_buffer,
-                        file_name=f"rapport_etsy_{datetime.now().strftime('%Y%m%d')}.pdf",
-                        mime="application/pdf",
-                        use_container_width=True
-                    )
-                    
-                    st.success("✅ Rapport généré avec succès !")
+            # MODE PAYANT : Export disponible (rendu à la demande, hors du script de la page)
+            show_pdf_export(
+                content_hash(
+                    'ci_pdf', ingest_upload(orders_file).sha256,
+                    ingest_upload(reviews_file).sha256 if reviews_file is not None else None,
+                    period, datetime.now().date()
+                ),
+                generate_customer_intelligence_pdf, (orders_df, reviews_df, customer_analysis),
+                file_name=f"rapport_customer_intelligence_{datetime.now().strftime('%Y%m%d')}.pdf"
+            )
 
 # Footer
 st.markdown("---")
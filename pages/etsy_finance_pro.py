@@ -3,13 +3,7 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import io
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
+from datetime import datetime
 import sys
 import os
 
@@ -17,8 +11,23 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # NOUVEAUX IMPORTS
-from auth.access_manager import check_access, has_access_to_dashboard, show_upgrade_message, has_insights_subscription, show_insights_upgrade_cta, show_locked_recommendation, check_usage_limit, increment_usage, show_usage_limit_message, should_increment_usage, increment_usage_with_timestamp
+from auth.access_manager import check_access, has_access_to_dashboard, show_upgrade_message, has_insights_subscription, show_insights_upgrade_cta, show_locked_recommendation, check_usage_limit, show_usage_limit_message, should_increment_usage, record_analysis
 from data_collection.collector import show_data_opt_in
+from data_collection.corpus import peer_benchmark
+from data_collection.parse_cache import load_cached, parse_cached, show_messages
+from data_collection.ingest import ingest_upload
+from analytics.normalize import parse_money
+from analytics.schemas import ORDER_ITEMS
+from analytics.streaming import SalesAggregate, is_large_upload, stream_sales
+from analytics.pipeline import AnalysisGraph
+from analytics.finance import (
+    PERIOD_DAYS, analyze_products, apply_costs, build_kpis, calculate_fees, calculate_health_score,
+    calculate_kpis, calculate_month_comparison, filter_period, generate_alerts, parse_sales
+)
+from analytics.cube import DailyCube, SALES_MEASURES, period_start
+from reports.jobs import content_hash
+from reports.pdf import generate_pdf_report
+from reports.download import show_pdf_export
 
 # Configuration de la page
 st.set_page_config(
@@ -88,620 +97,44 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Fonction pour charger les données
-@st.cache_data
 def load_data(uploaded_file):
-    """Charge et prépare les données depuis un CSV Etsy"""
-    try:
-        # Essayer de détecter l'encodage
-        df = pd.read_csv(uploaded_file, encoding='utf-8')
-        
-        # Mapping complet des colonnes Etsy vers nos colonnes standardisées
-        column_mapping = {
-            # Dates (format Etsy réel - anglais)
-            'Sale Date': 'Date',
-            'Order Date': 'Date',
-            'date': 'Date',
-            'order_date': 'Date',
-            'Date Paid': 'Date',
-            
-            # Dates (format Etsy français)
-            'Date de vente': 'Date',
-            'Date de commande': 'Date',
-            
-            # Produits (format Etsy réel - anglais)
-            'Item Name': 'Product',
-            'item_name': 'Product',
-            'Product': 'Product',
-            'product': 'Product',
-            'Title': 'Product',
-            
-            # Prix (format Etsy réel - anglais)
-            'Item Price': 'Price',
-            'item_price': 'Price',
-            'Price': 'Price',
-            'price': 'Price',
-            
-            # Prix (format Etsy français)
-            'Valeur de la commande': 'Price',
-            'Total de la commande': 'Price',
-            
-            # Quantité (anglais et français)
-            'Quantity': 'Quantity',
-            'quantity': 'Quantity',
-            "Nombre d'articles": 'Quantity',
-            
-            # Coûts (ajouté manuellement par l'utilisateur)
-            'Cost': 'Cost',
-            'cost': 'Cost',
-            'Cout': 'Cost',
-            'Coût': 'Cost',
-            
-            # Frais de livraison (format Etsy - anglais)
-            'Shipping Price': 'Shipping',
-            'shipping_price': 'Shipping',
-            'Order Shipping': 'Shipping',
-            
-            # Frais de livraison (format Etsy - français)
-            'Frais de livraison': 'Shipping',
-            
-            # Catégorie (ajouté manuellement)
-            'Category': 'Category',
-            'category': 'Category',
-            'Catégorie': 'Category',
-            'Categorie': 'Category'
-        }
-        
-        # Renommer les colonnes avec priorité (éviter les doublons)
-        columns_to_rename = {}
-        target_columns_used = set()
-        
-        for old_name, new_name in column_mapping.items():
-            if old_name in df.columns:
-                if new_name not in target_columns_used:
-                    columns_to_rename[old_name] = new_name
-                    target_columns_used.add(new_name)
-        
-        # Appliquer le renommage
-        if columns_to_rename:
-            df = df.rename(columns=columns_to_rename)
-            st.info(f"📋 Colonnes mappées : {', '.join([f'{k}→{v}' for k, v in columns_to_rename.items()])}")
-        
-        # Vérifier les colonnes essentielles
-        required_columns = ['Date', 'Product', 'Price']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
-        if missing_columns:
-            st.error(f"❌ Colonnes obligatoires manquantes : {', '.join(missing_columns)}")
-            st.info("""
-            💡 **Format CSV attendu (minimum requis):**
-            - **Date** : 'Sale Date', 'Order Date', ou 'Date'
-            - **Produit** : 'Item Name', 'Product', ou 'Title'  
-            - **Prix** : 'Item Price' ou 'Price'
-            
-            **Colonnes optionnelles mais recommandées:**
-            - 'Quantity' (défaut: 1)
-            - 'Cost' (coûts matières - défaut: 0)
-            - 'Category' (catégorie produit)
-            """)
-            return None
-        
-        # Conversion des colonnes de dates
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce', format='mixed')
-            invalid_dates = df['Date'].isna().sum()
-            if invalid_dates > 0:
-                st.warning(f"⚠️ {invalid_dates} lignes avec dates invalides ont été ignorées")
-            df = df.dropna(subset=['Date'])
-        
-        # Nettoyage des colonnes numériques
-        numeric_columns = ['Price', 'Quantity', 'Cost', 'Shipping']
-        for col in numeric_columns:
-            if col in df.columns:
-                try:
-                    if pd.api.types.is_numeric_dtype(df[col]):
-                        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                    else:
-                        df[col] = (df[col].fillna('0')
-                                  .astype(str)
-                                  .str.replace('€', '', regex=False)
-                                  .str.replace('$', '', regex=False)
-                                  .str.replace('USD', '', regex=False)
-                                  .str.replace('EUR', '', regex=False)
-                                  .str.replace(' ', '', regex=False)
-                                  .str.replace(',', '.', regex=False)
-                                  .str.strip())
-                        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                except Exception as e:
-                    st.warning(f"⚠️ Problème de nettoyage pour la colonne {col}: {e}")
-                    df[col] = 0
-        
-        # Ajouter Quantity si manquant
-        if 'Quantity' not in df.columns:
-            df['Quantity'] = 1
-            st.info("ℹ️ Colonne 'Quantity' absente - Quantité fixée à 1 par défaut")
-        
-        # Ajouter Cost si manquant
-        if 'Cost' not in df.columns:
-            df['Cost'] = 0
-            st.warning("""
-            ⚠️ **Colonne 'Cost' non trouvée** 
-            
-            Les marges sont calculées sans coûts matières (Cost = 0€).
-            
-            **Pour ajouter vos coûts :**
-            1. Utilisez le module "Gestion des coûts" dans la barre latérale
-            2. Ou ajoutez une colonne 'Cost' à votre CSV
-            """)
-        
-        # Ajouter Category si manquant
-        if 'Category' not in df.columns:
-            df['Category'] = 'Non catégorisé'
-            st.info("ℹ️ Colonne 'Category' absente - Tous les produits classés en 'Non catégorisé'")
-        
-        # Supprimer les lignes avec prix invalides
-        invalid_prices = (df['Price'].isna()) | (df['Price'] <= 0)
-        if invalid_prices.sum() > 0:
-            st.warning(f"⚠️ {invalid_prices.sum()} lignes avec prix invalides ont été ignorées")
-        df = df[~invalid_prices]
-        
-        # Vérifier qu'il reste des données
-        if len(df) == 0:
-            st.error("❌ Aucune donnée valide trouvée après nettoyage !")
-            return None
-        
-        # Afficher un résumé détaillé
-        st.success(f"""
-        ✅ **{len(df)} ventes chargées avec succès !**
-        
-        📊 Période : {df['Date'].min().strftime('%d/%m/%Y')} → {df['Date'].max().strftime('%d/%m/%Y')}
-        💰 CA Total : {df['Price'].sum():.2f} €
-        """)
-        
-        return df
-        
-    except Exception as e:
-        st.error(f"❌ Erreur lors du chargement des données : {e}")
-        st.info("💡 Vérifiez que votre fichier est bien au format CSV et qu'il contient les colonnes nécessaires.")
-        return None
-    
+    """Charge le CSV Etsy (parsé une seule fois par contenu, toutes sessions confondues)"""
+    return load_cached(uploaded_file, 'finance_sales', parse_sales)
 
-# ========== FONCTIONS HELPERS POUR INSIGHTS 9€ ==========
 
-def calculate_health_score(kpis, product_analysis):
-    """Calcule un score global de santé financière (0-100)"""
-    score = 0
-    details = {}
-    
-    # 1. Score Marge (0-30 points)
-    marge_pct = kpis.get('taux_marge', 0)
-    if marge_pct >= 40:
-        marge_score = 30
-    elif marge_pct >= 35:
-        marge_score = 25
-    elif marge_pct >= 30:
-        marge_score = 20
-    elif marge_pct >= 25:
-        marge_score = 15
-    else:
-        marge_score = int(marge_pct / 2.5)
-    
-    details['Marge'] = {
-        'score': marge_score,
-        'max': 30,
-        'value': f"{marge_pct:.1f}%",
-        'target': "35%+"
-    }
-    score += marge_score
-    
-    # 2. Score Panier moyen (0-25 points)
-    panier = kpis.get('panier_moyen', 0)
-    if panier >= 40:
-        panier_score = 25
-    elif panier >= 35:
-        panier_score = 20
-    elif panier >= 30:
-        panier_score = 15
-    elif panier >= 25:
-        panier_score = 10
-    else:
-        panier_score = int(panier / 2.5)
-    
-    details['Panier moyen'] = {
-        'score': panier_score,
-        'max': 25,
-        'value': f"{panier:.2f}€",
-        'target': "35€+"
-    }
-    score += panier_score
-    
-    # 3. Score Diversification (0-25 points)
-    if product_analysis is not None and len(product_analysis) > 0:
-        product_analysis_sorted = product_analysis.sort_values('CA', ascending=False)
-        product_analysis_sorted['CA_cumul_pct'] = (
-            product_analysis_sorted['CA'].cumsum() / product_analysis_sorted['CA'].sum() * 100
-        )
-        products_for_80 = len(product_analysis_sorted[product_analysis_sorted['CA_cumul_pct'] <= 80])
-        total_products = len(product_analysis_sorted)
-        
-        concentration_ratio = products_for_80 / total_products if total_products > 0 else 0
-        
-        if concentration_ratio >= 0.5:
-            diversification_score = 5
-        elif concentration_ratio >= 0.3:
-            diversification_score = 10
-        elif concentration_ratio >= 0.2:
-            diversification_score = 15
-        elif concentration_ratio >= 0.1:
-            diversification_score = 20
-        else:
-            diversification_score = 25
-        
-        details['Diversification'] = {
-            'score': diversification_score,
-            'max': 25,
-            'value': f"{products_for_80}/{total_products} produits = 80% CA",
-            'target': "< 20%"
-        }
-        score += diversification_score
-    else:
-        details['Diversification'] = {
-            'score': 0,
-            'max': 25,
-            'value': "N/A",
-            'target': "< 20%"
-        }
-    
-    # 4. Score Rotation/Activité (0-20 points)
-    nb_ventes = kpis.get('nb_ventes', 0)
-    if nb_ventes >= 100:
-        activity_score = 20
-    elif nb_ventes >= 50:
-        activity_score = 15
-    elif nb_ventes >= 25:
-        activity_score = 10
-    elif nb_ventes >= 10:
-        activity_score = 5
-    else:
-        activity_score = 2
-    
-    details['Activité'] = {
-        'score': activity_score,
-        'max': 20,
-        'value': f"{nb_ventes} ventes",
-        'target': "50+ ventes"
-    }
-    score += activity_score
-    
-    return score, details
-
-
-def calculate_month_comparison(df):
-    """Compare le mois actuel avec le mois précédent"""
-    if 'Date' not in df.columns or len(df) == 0:
-        return None
-    
-    now = datetime.now()
-    current_month_start = datetime(now.year, now.month, 1)
-    
-    if now.month == 1:
-        previous_month_start = datetime(now.year - 1, 12, 1)
-    else:
-        previous_month_start = datetime(now.year, now.month - 1, 1)
-    
-    # Filtrer les données
-    df_current = df[df['Date'] >= current_month_start]
-    df_previous = df[(df['Date'] >= previous_month_start) & (df['Date'] < current_month_start)]
-    
-    if len(df_previous) == 0:
-        return None
-    
-    comparison = {
-        'current_ca': df_current['Price'].sum() if len(df_current) > 0 else 0,
-        'previous_ca': df_previous['Price'].sum(),
-        'current_ventes': len(df_current),
-        'previous_ventes': len(df_previous),
-        'current_panier': df_current['Price'].sum() / len(df_current) if len(df_current) > 0 else 0,
-        'previous_panier': df_previous['Price'].sum() / len(df_previous)
-    }
-    
-    # Calculer les variations
-    comparison['ca_variation'] = ((comparison['current_ca'] - comparison['previous_ca']) / 
-                                  comparison['previous_ca'] * 100) if comparison['previous_ca'] > 0 else 0
-    comparison['ventes_variation'] = ((comparison['current_ventes'] - comparison['previous_ventes']) / 
-                                      comparison['previous_ventes'] * 100) if comparison['previous_ventes'] > 0 else 0
-    comparison['panier_variation'] = ((comparison['current_panier'] - comparison['previous_panier']) / 
-                                      comparison['previous_panier'] * 100) if comparison['previous_panier'] > 0 else 0
-    
-    return comparison
-
-
-def generate_alerts(kpis, comparison, product_analysis):
-    """Génère des alertes opportunités basées sur les données (max 3)"""
-    alerts = []
-    
-    # Alerte 1 : Baisse de CA
-    if comparison and comparison.get('ca_variation', 0) < -10:
-        alerts.append({
-            'type': 'warning',
-            'icon': '⚠️',
-            'title': 'Baisse significative du CA',
-            'message': f"Votre CA a baissé de {abs(comparison['ca_variation']):.1f}% ce mois",
-            'action': "Analysez les causes : saisonnalité, concurrence, ou problème de stock ?"
-        })
-    
-    # Alerte 2 : Hausse de CA
-    if comparison and comparison.get('ca_variation', 0) > 15:
-        alerts.append({
-            'type': 'success',
-            'icon': '📈',
-            'title': 'Excellente performance',
-            'message': f"Votre CA a augmenté de {comparison['ca_variation']:.1f}% ce mois !",
-            'action': "Identifiez ce qui fonctionne et répliquez la stratégie"
-        })
-    
-    # Alerte 3 : Produit qui cartonne
-    if product_analysis is not None and len(product_analysis) > 0:
-        top_product = product_analysis.iloc[0]
-        if top_product['Ventes'] >= 10:
-            alerts.append({
-                'type': 'success',
-                'icon': '⚡',
-                'title': 'Best-seller détecté',
-                'message': f"'{top_product['Product'][:40]}...' performe excellemment ({int(top_product['Ventes'])} ventes)",
-                'action': "Créez des variantes, augmentez le stock, boostez avec Etsy Ads"
-            })
-    
-    # Alerte 4 : Marge faible
-    if kpis.get('taux_marge', 0) < 30:
-        alerts.append({
-            'type': 'warning',
-            'icon': '📉',
-            'title': 'Marge sous le seuil critique',
-            'message': f"Votre marge de {kpis['taux_marge']:.1f}% est inférieure à 30%",
-            'action': "Réduisez vos coûts ou augmentez vos prix de 5-10%"
-        })
-    
-    # Alerte 5 : Panier moyen faible
-    if kpis.get('panier_moyen', 0) < 25:
-        alerts.append({
-            'type': 'info',
-            'icon': '💡',
-            'title': 'Opportunité : Augmenter le panier moyen',
-            'message': f"Votre panier moyen ({kpis['panier_moyen']:.2f}€) peut être amélioré",
-            'action': "Créez des bundles ou proposez la livraison gratuite à partir de 40€"
-        })
-    
-    return alerts[:3]  # Limiter à 3 alertes max
-
-# Fonction pour calculer les KPIs - VERSION AMÉLIORÉE avec frais Etsy détaillés
-def calculate_kpis(df, etsy_fees_config=None):
-    """Calcule tous les KPIs essentiels avec frais Etsy réalistes"""
-    kpis = {}
-    
-    # CA total
-    kpis['ca_total'] = df['Price'].sum() if 'Price' in df.columns else 0
-    
-    # Nombre de ventes
-    kpis['nb_ventes'] = len(df)
-    
-    # Panier moyen
-    kpis['panier_moyen'] = kpis['ca_total'] / kpis['nb_ventes'] if kpis['nb_ventes'] > 0 else 0
-    
-    # CALCUL DES FRAIS ETSY - NOUVELLE LOGIQUE
-    if etsy_fees_config and etsy_fees_config.get('statement_file'):
-        # MODE 1 : Relevé mensuel (frais exacts)
-        try:
-            statement_df = pd.read_csv(etsy_fees_config['statement_file'], encoding='latin1')
-            
-            # Nettoyer et extraire les frais par type
-            def clean_fees(series):
-                return abs(series.str.replace(',', '.').str.replace(' €', '').str.replace('', '').str.strip().astype(float).sum())
-            
-            frais_transaction = clean_fees(statement_df[statement_df['Type'] == 'Transaction']['Frais Et Taxes'])
-            frais_marketing = clean_fees(statement_df[statement_df['Type'] == 'Marketing']['Frais Et Taxes'])
-            frais_listing = clean_fees(statement_df[statement_df['Type'] == 'Fiche produit']['Frais Et Taxes'])
-            frais_vat = clean_fees(statement_df[statement_df['Type'] == 'VAT']['Frais Et Taxes'])
-            frais_tva = clean_fees(statement_df[statement_df['Type'] == 'TVA']['Frais Et Taxes'])
-            frais_abonnement = clean_fees(statement_df[statement_df['Type'] == 'Abonnement']['Frais Et Taxes'])
-            
-            kpis['frais_etsy_detail'] = {
-                'Transaction (6,5%)': frais_transaction,
-                'Marketing (Ads)': frais_marketing,
-                'Mise en vente (0,20€)': frais_listing,
-                'Traitement paiement': frais_vat,
-                'TVA (20%)': frais_tva,
-                'Abonnement': frais_abonnement
-            }
-            
-            kpis['frais_etsy'] = sum(kpis['frais_etsy_detail'].values())
-            kpis['fees_source'] = "Relevé mensuel (frais réels)"
-            
-        except Exception as e:
-            # En cas d'erreur, retomber sur l'estimation
-            kpis['frais_etsy'] = kpis['ca_total'] * 0.12
-            kpis['frais_etsy_detail'] = {}
-            kpis['fees_source'] = f"Estimation (erreur)"
-    
-    elif etsy_fees_config and etsy_fees_config.get('method') == "Configurateur détaillé (recommandé)":
-        # MODE 2 : Configurateur détaillé
-        ca = kpis['ca_total']
-        nb = kpis['nb_ventes']
-        
-        # Frais de base
-        frais_transaction = ca * 0.065
-        frais_listing = nb * 0.20
-        frais_payment = ca * 0.04 + nb * 0.30
-        
-        # Frais optionnels
-        frais_offsite = ca * etsy_fees_config.get('offsite_ads_rate', 0) if etsy_fees_config.get('use_offsite_ads') else 0
-        frais_etsy_ads = etsy_fees_config.get('etsy_ads_budget', 0)
-        frais_plus = etsy_fees_config.get('etsy_plus_fee', 0)
-        
-        # TVA (20% sur tous les frais hors Etsy Ads qui a déjà la TVA)
-        total_before_vat = frais_transaction + frais_listing + frais_payment + frais_offsite + frais_plus
-        frais_tva = total_before_vat * 0.20
-        
-        kpis['frais_etsy_detail'] = {
-            'Transaction (6,5%)': frais_transaction,
-            'Mise en vente (0,20€)': frais_listing,
-            'Traitement paiement': frais_payment,
-            'Offsite Ads': frais_offsite,
-            'Etsy Ads': frais_etsy_ads,
-            'Abonnement': frais_plus,
-            'TVA (20%)': frais_tva
-        }
-        
-        kpis['frais_etsy'] = sum(kpis['frais_etsy_detail'].values())
-        kpis['fees_source'] = "Configurateur détaillé"
-    
-    else:
-        # MODE 3 : Estimation standard (rapide)
-        ca = kpis['ca_total']
-        nb = kpis['nb_ventes']
-        
-        frais_transaction = ca * 0.065
-        frais_listing = nb * 0.20
-        frais_payment = ca * 0.04 + nb * 0.30
-        
-        total_before_vat = frais_transaction + frais_listing + frais_payment
-        frais_tva = total_before_vat * 0.20
-        
-        kpis['frais_etsy_detail'] = {
-            'Transaction (6,5%)': frais_transaction,
-            'Mise en vente (0,20€)': frais_listing,
-            'Traitement paiement': frais_payment,
-            'TVA (20%)': frais_tva
-        }
-        
-        kpis['frais_etsy'] = total_before_vat + frais_tva
-        kpis['fees_source'] = "Estimation standard (~12%)"
-    
-    # Coûts matières (si fournis)
-    if 'Cost' in df.columns:
-        kpis['couts_matieres'] = df['Cost'].sum()
-    else:
-        kpis['couts_matieres'] = 0
-    
-    # Marge brute
-    kpis['marge_brute'] = kpis['ca_total'] - kpis['frais_etsy'] - kpis['couts_matieres']
-    kpis['taux_marge'] = (kpis['marge_brute'] / kpis['ca_total'] * 100) if kpis['ca_total'] > 0 else 0
-    
-    return kpis
-
-# Fonction pour l'analyse produits
-def analyze_products(df):
-    """Analyse avancée des produits"""
-    if 'Product' not in df.columns:
-        return None
-    
-    # Construction de l'agrégation dynamique
-    agg_dict = {
-        'Price': ['sum', 'count', 'mean']
-    }
-    
-    # Ajouter Cost seulement s'il existe
-    if 'Cost' in df.columns:
-        agg_dict['Cost'] = 'sum'
-    
-    product_analysis = df.groupby('Product').agg(agg_dict).reset_index()
-    
-    # Renommer les colonnes proprement
-    if 'Cost' in df.columns:
-        product_analysis.columns = ['Product', 'CA', 'Ventes', 'Prix_moyen', 'Cout_total']
-    else:
-        product_analysis.columns = ['Product', 'CA', 'Ventes', 'Prix_moyen']
-        product_analysis['Cout_total'] = 0  # Ajouter colonne Cost à 0 si absente
-    
-    # Calculs de marges
-    product_analysis['Marge'] = product_analysis['CA'] - product_analysis['Cout_total']
-    product_analysis['Taux_marge'] = (product_analysis['Marge'] / product_analysis['CA'] * 100).round(2)
-    
-    # Convertir en types compatibles
-    product_analysis['Ventes'] = product_analysis['Ventes'].astype(int)
-    
-    return product_analysis.sort_values('CA', ascending=False)
-
-# Fonction pour générer le PDF
-def generate_pdf_report(kpis, df, product_analysis):
-    """Génère un rapport PDF avec les principales métriques"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Titre
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#F56400'),
-        spaceAfter=30,
-        alignment=1
-    )
-    story.append(Paragraph("Rapport Etsy Analytics Pro", title_style))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Date du rapport
-    date_text = f"Généré le : {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
-    story.append(Paragraph(date_text, styles['Normal']))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # KPIs principaux
-    story.append(Paragraph("Indicateurs Financiers", styles['Heading2']))
-    kpi_data = [
-        ['Indicateur', 'Valeur'],
-        ['Chiffre d\'affaires', f"{kpis['ca_total']:.2f} EUR"],
-        ['Nombre de ventes', str(kpis['nb_ventes'])],
-        ['Panier moyen', f"{kpis['panier_moyen']:.2f} EUR"],
-        ['Frais Etsy', f"{kpis['frais_etsy']:.2f} EUR"],
-        ['Coûts matières', f"{kpis['couts_matieres']:.2f} EUR"],
-        ['Marge brute', f"{kpis['marge_brute']:.2f} EUR"],
-        ['Taux de marge', f"{kpis['taux_marge']:.1f} %"]
-    ]
-    
-    kpi_table = Table(kpi_data, colWidths=[3*inch, 2*inch])
-    kpi_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F56400')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    story.append(kpi_table)
-    story.append(Spacer(1, 0.5*inch))
-    
-    # Top produits
-    if product_analysis is not None and len(product_analysis) > 0:
-        story.append(Paragraph("Top 5 Produits par CA", styles['Heading2']))
-        top_products = product_analysis.head(5)
-        product_data = [['Produit', 'CA', 'Ventes', 'Marge']]
-        for _, row in top_products.iterrows():
-            product_data.append([
-                row['Product'][:30],
-                f"{row['CA']:.2f} EUR",
-                str(int(row['Ventes'])),
-                f"{row['Marge']:.2f} EUR"
-            ])
-        
-        product_table = Table(product_data, colWidths=[2.5*inch, 1.5*inch, 1*inch, 1.5*inch])
-        product_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F56400')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(product_table)
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
+# Graphe des étapes de la page (rerun incrémental)
+def build_finance_graph(store):
+    """
+    Déclare les étapes d'analyse et leurs entrées ; `store` conserve les résultats entre reruns.
+    
+    Entrées : upload, cost_method, avg_cost, cost_file, period, today, fees_config.
+    Le cube journalier (jour × produit) est construit une fois après l'application des
+    coûts ; période, KPIs, produits et graphiques temporels sont lus sur le cube.
+    Ex : modifier le budget Etsy Ads ne recalcule que fees, kpis, health et alerts.
+    
+    Les lignes (data, costed) ne sont pas gardées en session : data est relu dans le
+    cache de parsing (partagé et borné), costed n'est recalculé que pour reconstruire le cube.
+    """
+    graph = AnalysisGraph(store)
+    
+    graph.add_stage('data', lambda upload: parse_cached(upload, 'finance_sales', parse_sales), ['upload'],
+                    transient=True)
+    graph.add_stage('costed', lambda data, cost_method, avg_cost, cost_file: apply_costs(data[0], cost_method, avg_cost, cost_file),
+                    ['data', 'cost_method', 'avg_cost', 'cost_file'], transient=True)
+    graph.add_stage('cube', lambda costed: (DailyCube.build(costed[0], SALES_MEASURES, ('Product',)), costed[1]),
+                    ['costed'])
+    graph.add_stage('period_cube', lambda cube, period, today: filter_period(cube[0], period),
+                    ['cube', 'period', 'today'])
+    graph.add_stage('sales', lambda period_cube: SalesAggregate().add_cube(period_cube[0]), ['period_cube'])
+    graph.add_stage('fees', calculate_fees, ['sales', 'fees_config'])
+    graph.add_stage('kpis', build_kpis, ['sales', 'fees'])
+    graph.add_stage('products', analyze_products, ['sales'])
+    graph.add_stage('health', calculate_health_score, ['kpis', 'products'])
+    graph.add_stage('comparison', lambda period_cube, today: calculate_month_comparison(period_cube[0]),
+                    ['period_cube', 'today'])
+    graph.add_stage('alerts', generate_alerts, ['kpis', 'comparison', 'products'])
+    
+    return graph
 
 # En-tête de l'application
 st.markdown('<p class="main-header">💎 Etsy Analytics Pro - Bijoux Fantaisie</p>', unsafe_allow_html=True)
@@ -961,82 +394,137 @@ else:
         show_usage_limit_message(usage_info)
         st.stop()
 
+    # Très gros export : synthèse calculée par blocs, détail ligne à ligne à la demande
+    upload_size = ingest_upload(uploaded_file).size
+    if is_large_upload(upload_size):
+        st.info(f"📦 Fichier volumineux ({upload_size / 1024 / 1024:.0f} Mo) : synthèse calculée par blocs, sans charger toutes les lignes en mémoire.")
+        
+        if not st.checkbox("Charger le détail complet (évolution, insights, recommandations)", key='finance_full_detail'):
+            cutoff_date = None
+            if period in PERIOD_DAYS:
+                cutoff_date = period_start(PERIOD_DAYS[period])
+            
+            # Coûts : coût moyen ou CSV de coûts par produit
+            cost_value = avg_cost if cost_method == "Coût moyen par produit" else None
+            cost_map = None
+            if cost_method == "Upload CSV avec coûts détaillés" and cost_file is not None:
+                cost_df = pd.read_csv(cost_file)
+                if 'Product' in cost_df.columns and 'Cost' in cost_df.columns:
+                    cost_map = dict(zip(cost_df['Product'], parse_money(cost_df['Cost'])))
+            
+            with st.spinner("⏳ Agrégation de l'export par blocs..."):
+                all_sales, period_sales = stream_sales(
+                    ingest_upload(uploaded_file).stream(), ORDER_ITEMS,
+                    since=cutoff_date, cost_value=cost_value, cost_map=cost_map
+                )
+            
+            sales = all_sales
+            if period_sales is not None:
+                if period_sales.rows == 0:
+                    st.warning(f"⚠️ Aucune donnée dans la période '{period}'. Affichage de toutes les données disponibles.")
+                else:
+                    sales = period_sales
+            
+            if sales.rows == 0:
+                st.error("❌ Aucune donnée valide trouvée après nettoyage !")
+                st.stop()
+            
+            if should_increment_usage(customer_id):
+                usage_info = record_analysis(customer_id)
+                if usage_info.get('counted') and not usage_info.get('is_premium'):
+                    st.success(f"✅ Analyse comptée : {usage_info['usage_count']}/{usage_info['limit']} cette semaine")
+            
+            kpis = calculate_kpis(sales, etsy_fees_config)
+            product_analysis = analyze_products(sales)
+            
+            st.markdown("## 💰 Indicateurs Financiers")
+            st.caption(f"📊 {sales.rows:,} ventes du {sales.first_date.strftime('%d/%m/%Y')} au {sales.last_date.strftime('%d/%m/%Y')}")
+            
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Chiffre d'affaires", f"{kpis['ca_total']:,.2f} €")
+            col2.metric("Nombre de ventes", f"{kpis['nb_ventes']:,}")
+            col3.metric("Marge brute", f"{kpis['marge_brute']:,.2f} €")
+            col4.metric("Taux de marge", f"{kpis['taux_marge']:.1f} %")
+            
+            if product_analysis is not None:
+                st.markdown("## 🏆 Analyse Produits")
+                st.dataframe(product_analysis.head(50), width='stretch', hide_index=True)
+            
+            # Collecte des fichiers (mêmes règles que le mode complet)
+            all_files = {'orderitems': uploaded_file}
+            if cost_method == "Upload CSV avec coûts détaillés" and cost_file is not None:
+                all_files['costs'] = cost_file
+            if fees_method == "Relevé mensuel Etsy (précis)" and statement_file is not None:
+                all_files['etsy_statement'] = statement_file
+            
+            from data_collection.collector import collect_raw_data
+            collect_raw_data(all_files, user_info['email'], 'finance_pro')
+            st.stop()
+    
+    # Étapes d'analyse mémoïsées : un changement de widget ne recalcule que les étapes concernées
+    graph = build_finance_graph(st.session_state.setdefault('finance_graph', {}))
+    graph.set_input('upload', uploaded_file, token=ingest_upload(uploaded_file).sha256)
+    
     # Chargement des données
-    df = load_data(uploaded_file)
+    df, load_messages = graph.get('data')
+    show_messages(load_messages)
     
     if df is not None:
         # Vérifier si on doit compter cette analyse
         if should_increment_usage(customer_id):
-            increment_usage_with_timestamp(customer_id)
-            
-            # Rafraîchir usage_info pour afficher compteur à jour
-            usage_info = check_usage_limit(customer_id)
+            # Comptage atomique : retourne directement le quota à jour
+            usage_info = record_analysis(customer_id)
             
             # Afficher message discret
-            if not has_insights_subscription(customer_id):
+            if usage_info.get('counted') and not usage_info.get('is_premium'):
                 st.success(f"✅ Analyse comptée : {usage_info['usage_count']}/{usage_info['limit']} cette semaine")
 
         # Appliquer la méthode de coûts choisie
-        if cost_method == "Coût moyen par produit":
-            df['Cost'] = avg_cost
-            st.success(f"✅ Coût moyen de {avg_cost}€ appliqué à tous les produits")
+        selected_cost_file = None
+        if cost_method == "Upload CSV avec coûts détaillés" and 'cost_file' in st.session_state:
+            selected_cost_file = cost_file
         
-        elif cost_method == "Upload CSV avec coûts détaillés" and 'cost_file' in st.session_state and cost_file is not None:
-            try:
-                cost_df = pd.read_csv(cost_file)
-                if 'Product' in cost_df.columns and 'Cost' in cost_df.columns:
-                    # Nettoyer la colonne Cost pour accepter format français (virgules)
-                    cost_df['Cost'] = (cost_df['Cost']
-                                      .astype(str)
-                                      .str.replace(',', '.', regex=False)
-                                      .str.replace(' ', '', regex=False)
-                                      .str.strip())
-                    cost_df['Cost'] = pd.to_numeric(cost_df['Cost'], errors='coerce').fillna(0)
-                    
-                    # Merger les coûts avec les données principales
-                    df = df.merge(cost_df[['Product', 'Cost']], on='Product', how='left', suffixes=('', '_new'))
-                    if 'Cost_new' in df.columns:
-                        df['Cost'] = df['Cost_new'].fillna(df.get('Cost', 0))
-                        df = df.drop('Cost_new', axis=1)
-                    df['Cost'] = df['Cost'].fillna(0)
-                    st.success(f"✅ Coûts importés pour {df[df['Cost'] > 0]['Product'].nunique()} produits")
-                else:
-                    st.error("❌ Le CSV doit contenir les colonnes 'Product' et 'Cost'")
-            except Exception as e:
-                st.error(f"❌ Erreur lors de l'import des coûts : {e}")
+        graph.set_input('cost_method', cost_method)
+        graph.set_input('avg_cost', avg_cost if cost_method == "Coût moyen par produit" else None)
+        graph.set_input('cost_file', selected_cost_file,
+                        token=ingest_upload(selected_cost_file).sha256 if selected_cost_file is not None else None)
         
-        # Filtrage par période
-        if period != "Tout" and 'Date' in df.columns:
-            days_map = {
-                "7 derniers jours": 7,
-                "30 derniers jours": 30,
-                "90 derniers jours": 90,
-                "1 an": 365
-            }
-            if period in days_map:
-                cutoff_date = datetime.now() - timedelta(days=days_map[period])
-                df_filtered = df[df['Date'] >= cutoff_date]
-                
-                if len(df_filtered) == 0:
-                    st.warning(f"⚠️ Aucune donnée dans la période '{period}'. Affichage de toutes les données disponibles.")
-                else:
-                    df = df_filtered
+        _, cost_messages = graph.get('cube')
+        show_messages(cost_messages)
+        
+        # Filtrage par période sur le cube journalier (recalculé aussi au changement de jour)
+        graph.set_input('period', period)
+        graph.set_input('today', datetime.now().date())
+        
+        cube, period_messages = graph.get('period_cube')
+        show_messages(period_messages)
+        
+        # Configuration des frais Etsy (le relevé est identifié par son contenu)
+        statement = etsy_fees_config.get('statement_file')
+        graph.set_input('fees_config', etsy_fees_config, token=(
+            tuple(sorted((key, value) for key, value in etsy_fees_config.items() if key != 'statement_file')),
+            ingest_upload(statement).sha256 if statement is not None else None
+        ))
         
         # Calcul des KPIs avec configuration des frais Etsy
-        kpis = calculate_kpis(df, etsy_fees_config)
+        kpis = graph.get('kpis')
 
         # Analyse des produits
-        product_analysis = analyze_products(df)
+        product_analysis = graph.get('products')
 
         # ===== NOUVELLES ANALYSES INSIGHTS 9€ =====
         # Calcul du score santé
-        health_score, health_details = calculate_health_score(kpis, product_analysis)
+        health_score, health_details = graph.get('health')
         
         # Comparaison mensuelle
-        month_comparison = calculate_month_comparison(df)
+        month_comparison = graph.get('comparison')
         
         # Génération des alertes
-        alerts = generate_alerts(kpis, month_comparison, product_analysis)
+        alerts = graph.get('alerts')
+        
+        with st.sidebar:
+            with st.expander("⏱️ Temps de calcul"):
+                st.dataframe(pd.DataFrame(graph.timing_rows()), width='stretch', hide_index=True)
         # =========================================
 
         # ========== NOUVEAU : COLLECTE DE DONNÉES ==========
@@ -1284,8 +772,8 @@ else:
                 
                 # Analyse ABC (80/20)
                 st.markdown("### 📊 Analyse ABC (Pareto)")
-                product_analysis['CA_cumul_pct'] = (product_analysis['CA'].cumsum() / product_analysis['CA'].sum() * 100)
-                products_80 = product_analysis[product_analysis['CA_cumul_pct'] <= 80]
+                ca_cumul_pct = product_analysis['CA'].cumsum() / product_analysis['CA'].sum() * 100
+                products_80 = product_analysis[ca_cumul_pct <= 80]
                 
                 st.info(f"💡 **{len(products_80)} produits** (sur {len(product_analysis)}) génèrent **80% de votre CA** !")
             
@@ -1295,9 +783,9 @@ else:
         with tab3:
             st.markdown("## 📈 Évolution dans le temps")
             
-            if 'Date' in df.columns and len(df) > 0:
+            if not cube.empty:
                 # Évolution du CA
-                daily_sales = df.groupby(df['Date'].dt.date)['Price'].sum().reset_index()
+                daily_sales = cube.by_day('Revenue').reset_index()
                 daily_sales.columns = ['Date', 'CA']
                 
                 fig = px.line(
@@ -1312,7 +800,7 @@ else:
                 st.plotly_chart(fig, width='stretch')
                 
                 # Évolution du nombre de ventes
-                daily_count = df.groupby(df['Date'].dt.date).size().reset_index()
+                daily_count = cube.by_day('Count').reset_index()
                 daily_count.columns = ['Date', 'Ventes']
                 
                 fig = px.bar(
@@ -1327,11 +815,9 @@ else:
                 st.plotly_chart(fig, width='stretch')
                 
                 # Analyse jour de la semaine
-                df['DayOfWeek'] = df['Date'].dt.day_name()
-                day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
                 day_names_fr = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
                 
-                weekly_sales = df.groupby('DayOfWeek')['Price'].sum().reindex(day_order).reset_index()
+                weekly_sales = cube.by_weekday('Revenue').reset_index()
                 weekly_sales['DayOfWeek'] = day_names_fr
                 weekly_sales.columns = ['Jour', 'CA']
                 
@@ -1520,6 +1006,20 @@ else:
                 st.markdown("---")
                 st.markdown("### 🎯 Benchmarks Secteur")
                 
+                # Benchmarks calculés sur les boutiques collectées (data_collection/corpus.py),
+                # valeurs de référence du secteur à défaut
+                peers = peer_benchmark('margin_rate')
+                if peers is not None:
+                    benchmark_marge = round(peers['median'], 1)
+                    top_performers = round(peers['p90'], 1)
+                    benchmark_label = "Médiane des boutiques"
+                    benchmark_caption = f"{int(peers['shops'])} boutiques Etsy comparées"
+                else:
+                    benchmark_marge = 37
+                    top_performers = 42
+                    benchmark_label = "Moyenne secteur"
+                    benchmark_caption = "Moyenne bijoux fantaisie"
+                
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
@@ -1527,19 +1027,17 @@ else:
                     st.caption("Votre performance actuelle")
                 
                 with col2:
-                    benchmark_marge = 37
                     delta_vs_benchmark = kpis['taux_marge'] - benchmark_marge
                     delta_color = "normal" if delta_vs_benchmark >= 0 else "inverse"
                     st.metric(
-                        "Moyenne secteur",
+                        benchmark_label,
                         f"{benchmark_marge}%",
                         delta=f"{delta_vs_benchmark:+.1f} points",
                         delta_color=delta_color
                     )
-                    st.caption("Moyenne bijoux fantaisie")
+                    st.caption(benchmark_caption)
                 
                 with col3:
-                    top_performers = 42
                     st.metric("Top performers", f"{top_performers}%")
                     st.caption("Top 10% du secteur")
                 
@@ -1635,8 +1133,8 @@ else:
                 })
             
             # Recommandation 5 : Prévision
-            if 'Date' in df.columns and len(df) > 7:
-                daily_sales = df.groupby(df['Date'].dt.date)['Price'].sum()
+            if cube.rows > 7:
+                daily_sales = cube.by_day('Revenue')
                 moving_avg_7 = daily_sales.rolling(window=7).mean().iloc[-1]
                 next_month_prediction = moving_avg_7 * 30
                 
@@ -1787,20 +1285,12 @@ else:
             st.markdown("</div>", unsafe_allow_html=True)
 
         else:
-            # MODE PAYANT : Export disponible
-            if st.button("📥 Générer le rapport PDF", type="primary", use_container_width=True):
-                with st.spinner("Génération du rapport en cours..."):
-                    pdf_buffer = generate_pdf_report(kpis, df, product_analysis)
-                    
-                    st.download_button(
-                        label="⬇️ Télécharger le rapport PDF",
-                        data=pdf_buffer,
-                        file_name=f"rapport_etsy_{datetime.now().strftime('%Y%m%d')}.pdf",
-                        mime="application/pdf",
-                        use_container_width=True
-                    )
-                    
-                    st.success("✅ Rapport généré avec succès !")
+            # MODE PAYANT : Export disponible (rendu à la demande, hors du script de la page)
+            show_pdf_export(
+                content_hash('finance_pdf', graph.token('kpis'), graph.token('products')),
+                generate_pdf_report, (kpis, df, product_analysis),
+                file_name=f"rapport_etsy_{datetime.now().strftime('%Y%m%d')}.pdf"
+            )
 
 # Footer
 st.markdown("---")
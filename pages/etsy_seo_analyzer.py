@@ -4,14 +4,7 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import io
 from collections import Counter
-import re
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib import colors
 import sys
 import os
 
@@ -27,12 +20,20 @@ from auth.access_manager import (
     show_insights_upgrade_cta,
     show_locked_recommendation,
     check_usage_limit,
-    increment_usage,
     show_usage_limit_message,
     should_increment_usage,
-    increment_usage_with_timestamp
+    record_analysis
 )
 from data_collection.collector import show_data_opt_in
+from data_collection.corpus import peer_benchmark
+from data_collection.parse_cache import load_cached
+from data_collection.ingest import ingest_upload
+from analytics.seo import analyze_tags, build_seo_analysis, parse_listings, parse_sales, title_feedback
+from analytics.text_stats import count_terms, top_terms
+from analytics.cube import DailyCube, WEEKDAYS, get_cube
+from reports.jobs import content_hash
+from reports.pdf import generate_seo_pdf_report
+from reports.download import show_pdf_export
 
 # Configuration de la page
 st.set_page_config(
@@ -116,177 +117,19 @@ st.markdown("""
 
 # ==================== FONCTIONS DE CHARGEMENT ====================
 
-@st.cache_data
 def load_listings(uploaded_file):
-    """Charge les listings Etsy"""
-    try:
-        df = pd.read_csv(uploaded_file, encoding='utf-8')
-        
-        # Mapping des colonnes
-        column_mapping = {
-            'TITRE': 'Title',
-            'Title': 'Title',
-            'DESCRIPTION': 'Description',
-            'Description': 'Description',
-            'PRIX': 'Price',
-            'Price': 'Price',
-            'TAGS': 'Tags',
-            'Tags': 'Tags',
-            'QUANTITÉ': 'Quantity',
-            'Quantity': 'Quantity',
-            'RÉFÉRENCE': 'SKU',
-            'SKU': 'SKU',
-            'Reference': 'SKU'
-        }
-        
-        # Renommer les colonnes
-        for old_col, new_col in column_mapping.items():
-            if old_col in df.columns and new_col not in df.columns:
-                df = df.rename(columns={old_col: new_col})
-        
-        # Vérifier les colonnes essentielles
-        required = ['Title', 'Price']
-        missing = [col for col in required if col not in df.columns]
-        
-        if missing:
-            st.error(f"❌ Colonnes manquantes : {', '.join(missing)}")
-            return None
-        
-        # Nettoyer les données
-        if 'Price' in df.columns:
-            df['Price'] = pd.to_numeric(df['Price'], errors='coerce')
-        
-        # Compter le nombre d'images
-        image_cols = [col for col in df.columns if 'IMAGE' in col.upper()]
-        df['Num_Images'] = df[image_cols].notna().sum(axis=1)
-        
-        st.success(f"✅ {len(df)} listings chargés avec succès !")
-        
-        return df
-        
-    except Exception as e:
-        st.error(f"❌ Erreur : {e}")
-        return None
+    """Charge les listings (parsés une seule fois par contenu de fichier)"""
+    return load_cached(uploaded_file, 'seo_listings', parse_listings)
 
-@st.cache_data
 def load_sales_data(uploaded_file):
-    """Charge les données de ventes"""
-    try:
-        df = pd.read_csv(uploaded_file, encoding='utf-8')
-        
-        # Mapping colonnes ventes
-        column_mapping = {
-            'Sale Date': 'Date',
-            'Date de vente': 'Date',
-            'Item Name': 'Product',
-            'Price': 'Price',
-            'Item Price': 'Price',
-            'Quantity': 'Quantity'
-        }
-        
-        for old_col, new_col in column_mapping.items():
-            if old_col in df.columns and new_col not in df.columns:
-                df = df.rename(columns={old_col: new_col})
-        
-        if 'Date' in df.columns:
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce', format='mixed')
-            df = df.dropna(subset=['Date'])
-        
-        if 'Price' in df.columns:
-            df['Price'] = pd.to_numeric(df['Price'], errors='coerce')
-        
-        if 'Quantity' not in df.columns:
-            df['Quantity'] = 1
-        
-        st.success(f"✅ {len(df)} ventes chargées avec succès !")
-        
-        return df
-        
-    except Exception as e:
-        st.error(f"❌ Erreur : {e}")
-        return None
+    """Charge les ventes (parsées une seule fois par contenu de fichier)"""
+    return load_cached(uploaded_file, 'seo_sales', parse_sales)
 
 # ==================== FONCTIONS D'ANALYSE SEO ====================
 
-def calculate_title_seo_score(title):
-    """Calcule le score SEO d'un titre (0-100)"""
-    score = 0
-    issues = []
-    recommendations = []
-    
-    if pd.isna(title):
-        return 0, ["❌ Titre manquant"], ["Ajoutez un titre descriptif"]
-    
-    title_len = len(str(title))
-    
-    # Longueur optimale (140 caractères max Etsy)
-    if 100 <= title_len <= 140:
-        score += 30
-    elif 80 <= title_len < 100:
-        score += 20
-        recommendations.append("📏 Augmentez la longueur du titre (optimal: 100-140 caractères)")
-    elif title_len < 80:
-        score += 10
-        issues.append("❌ Titre trop court")
-        recommendations.append("📏 Allongez votre titre à 100-140 caractères")
-    else:
-        score += 15
-        issues.append("⚠️ Titre trop long")
-        recommendations.append("✂️ Réduisez à 140 caractères maximum")
-    
-    # Nombre de mots
-    words = str(title).split(',')
-    num_words = len(words)
-    
-    if num_words >= 3:
-        score += 25
-    elif num_words >= 2:
-        score += 15
-        recommendations.append("📝 Ajoutez plus de mots-clés séparés par des virgules")
-    else:
-        score += 5
-        issues.append("❌ Pas assez de mots-clés")
-        recommendations.append("📝 Utilisez des virgules pour séparer les mots-clés")
-    
-    # Présence de mots-clés importants pour bijoux
-    jewelry_keywords = ['bracelet', 'bague', 'collier', 'boucles', 'bijou', 'argent', 
-                       'or', 'protection', 'cadeau', 'femme', 'homme', 'sterling']
-    
-    title_lower = str(title).lower()
-    keywords_found = sum(1 for kw in jewelry_keywords if kw in title_lower)
-    
-    if keywords_found >= 2:
-        score += 25
-    elif keywords_found >= 1:
-        score += 15
-        recommendations.append("🎯 Ajoutez plus de mots-clés pertinents")
-    else:
-        score += 5
-        issues.append("❌ Manque de mots-clés pertinents")
-        recommendations.append("🎯 Incluez des mots comme 'bracelet', 'argent', 'cadeau', etc.")
-    
-    # Utilisation de caractères spéciaux attrayants
-    if any(char in str(title) for char in ['✨', '💎', '🎁', '❤️']):
-        score += 10
-    
-    # Première lettre en majuscule
-    if str(title)[0].isupper():
-        score += 10
-    else:
-        recommendations.append("🔤 Mettez la première lettre en majuscule")
-    
-    return min(score, 100), issues, recommendations
+# Listings détaillés par page (onglet analyse des titres)
+LISTINGS_PER_PAGE = 25
 
-def analyze_tags(tags_str):
-    """Analyse les tags d'un listing"""
-    if pd.isna(tags_str):
-        return []
-    
-    # Séparer les tags (par virgule ou point-virgule)
-    tags = re.split(r'[,;]', str(tags_str))
-    tags = [tag.strip().lower() for tag in tags if tag.strip()]
-    
-    return tags
 
 def get_seo_category(score):
     """Retourne la catégorie SEO en fonction du score"""
@@ -299,105 +142,6 @@ def get_seo_category(score):
     else:
         return "🔴 Faible", "seo-score-low"
 
-# ==================== FONCTIONS D'ANALYSE AVANCÉE ====================
-
-def analyze_listing_performance(listings_df, sales_df):
-    """Croise les listings avec les ventes pour identifier les performances"""
-    
-    if sales_df is None or 'Product' not in sales_df.columns:
-        return None
-    
-    # Compter les ventes par produit
-    sales_count = sales_df.groupby('Product').agg({
-        'Quantity': 'sum',
-        'Price': 'sum'
-    }).reset_index()
-    sales_count.columns = ['Title', 'Sales_Count', 'Revenue']
-    
-    # Merger avec les listings
-    performance = listings_df.merge(sales_count, on='Title', how='left')
-    performance['Sales_Count'] = performance['Sales_Count'].fillna(0)
-    performance['Revenue'] = performance['Revenue'].fillna(0)
-    
-    return performance
-
-def extract_keywords_from_titles(titles):
-    """Extrait les mots-clés les plus fréquents des titres"""
-    all_words = []
-    
-    for title in titles:
-        if pd.notna(title):
-            # Séparer par virgules et espaces
-            words = re.split(r'[,\s]+', str(title).lower())
-            # Filtrer les mots courts et communs
-            words = [w.strip() for w in words if len(w) > 3 and w not in 
-                    ['pour', 'avec', 'dans', 'the', 'and', 'for', 'with']]
-            all_words.extend(words)
-    
-    return Counter(all_words)
-
-# ==================== GÉNÉRATION PDF ====================
-
-def generate_seo_pdf_report(listings_df, seo_analysis, sales_df=None):
-    """Génère un rapport PDF avec l'analyse SEO"""
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Titre
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#F56400'),
-        spaceAfter=30,
-        alignment=1
-    )
-    story.append(Paragraph("🔍 Rapport SEO Etsy", title_style))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Date
-    date_text = f"Généré le : {datetime.now().strftime('%d/%m/%Y à %H:%M')}"
-    story.append(Paragraph(date_text, styles['Normal']))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Score SEO global
-    avg_score = seo_analysis['SEO_Score'].mean()
-    story.append(Paragraph("📊 Score SEO Global", styles['Heading2']))
-    
-    score_data = [
-        ['Indicateur', 'Valeur'],
-        ['Score SEO moyen', f"{avg_score:.1f}/100"],
-        ['Listings excellents (≥80)', f"{len(seo_analysis[seo_analysis['SEO_Score'] >= 80])}"],
-        ['Listings à optimiser (<60)', f"{len(seo_analysis[seo_analysis['SEO_Score'] < 60])}"]
-    ]
-    
-    score_table = Table(score_data, colWidths=[3*inch, 2*inch])
-    score_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F56400')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    story.append(score_table)
-    story.append(Spacer(1, 0.5*inch))
-    
-    # Top 5 listings à optimiser
-    story.append(Paragraph("🎯 Top 5 Listings à Optimiser", styles['Heading2']))
-    
-    worst_listings = seo_analysis.nsmallest(5, 'SEO_Score')
-    
-    for idx, row in worst_listings.iterrows():
-        title_short = row['Title'][:50] + "..." if len(row['Title']) > 50 else row['Title']
-        story.append(Paragraph(f"<b>{title_short}</b> - Score: {row['SEO_Score']:.0f}/100", styles['Normal']))
-        story.append(Spacer(1, 0.1*inch))
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
-
 # ==================== INTERFACE PRINCIPALE ====================
 
 # En-tête
@@ -518,52 +262,33 @@ else:
     listings_df = load_listings(listings_file)
     sales_df = None
     
+    sales_cube = None
+    
     if sales_file is not None:
         sales_df = load_sales_data(sales_file)
+        
+        # Cube des ventes (jour × heure), construit une fois par fichier
+        if sales_df is not None and 'Date' in sales_df.columns:
+            sales_cube = get_cube(
+                ('seo_sales', ingest_upload(sales_file).sha256),
+                lambda: DailyCube.build(sales_df, {'Revenue': 'Price'}, hourly=True)
+            )
 
         # ========== INCRÉMENTER USAGE SI NÉCESSAIRE ==========
         if should_increment_usage(customer_id):
-            increment_usage_with_timestamp(customer_id)
-            
-            # Rafraîchir usage_info
-            usage_info = check_usage_limit(customer_id)
+            # Comptage atomique : retourne directement le quota à jour
+            usage_info = record_analysis(customer_id)
             
             # Message discret pour utilisateurs gratuits
-            if not has_insights_subscription(customer_id):
+            if usage_info.get('counted') and not usage_info.get('is_premium'):
                 st.info(f"📊 Analyse {usage_info['usage_count']}/{usage_info['limit']} cette semaine (reset dans {usage_info['days_until_reset']} jours)")
         
     
     if listings_df is not None:
         
-        # Analyse SEO de tous les listings
-        seo_results = []
-        
+        # Analyse SEO de tous les listings (scores calculés en colonnes), croisée avec les ventes
         with st.spinner("🔍 Analyse SEO en cours..."):
-            for idx, row in listings_df.iterrows():
-                score, issues, recs = calculate_title_seo_score(row['Title'])
-                
-                seo_results.append({
-                    'Title': row['Title'],
-                    'SEO_Score': score,
-                    'Price': row.get('Price', 0),
-                    'Num_Images': row.get('Num_Images', 0),
-                    'Issues': issues,
-                    'Recommendations': recs
-                })
-        
-        seo_analysis = pd.DataFrame(seo_results)
-        
-        # Croiser avec les ventes si disponibles
-        if sales_df is not None:
-            performance_df = analyze_listing_performance(listings_df, sales_df)
-            if performance_df is not None:
-                seo_analysis = seo_analysis.merge(
-                    performance_df[['Title', 'Sales_Count', 'Revenue']], 
-                    on='Title', 
-                    how='left'
-                )
-                seo_analysis['Sales_Count'] = seo_analysis['Sales_Count'].fillna(0)
-                seo_analysis['Revenue'] = seo_analysis['Revenue'].fillna(0)
+            seo_analysis = build_seo_analysis(listings_df, sales_df)
 
         # ========== NOUVEAU : COLLECTE DE DONNÉES ==========
         # if st.session_state.get('consent_asked', False):
@@ -604,7 +329,14 @@ else:
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.metric("Score SEO Moyen", f"{avg_score:.1f}/100")
+                # Comparaison avec les boutiques collectées (data_collection/corpus.py)
+                peers = peer_benchmark('seo_score')
+                if peers is not None:
+                    st.metric("Score SEO Moyen", f"{avg_score:.1f}/100",
+                             delta=f"{avg_score - peers['median']:+.1f} vs médiane des boutiques",
+                             help=f"Médiane de {int(peers['shops'])} boutiques Etsy : {peers['median']:.1f}/100")
+                else:
+                    st.metric("Score SEO Moyen", f"{avg_score:.1f}/100")
             
             with col2:
                 st.metric("Listings Excellents", f"{excellent_count}", 
@@ -737,8 +469,17 @@ else:
             # Analyse listing par listing
             st.markdown("### 📝 Analyse détaillée par listing")
             
-            for idx, row in seo_analysis.iterrows():
+            # Problèmes et recommandations générés uniquement pour la page affichée
+            num_pages = (len(seo_analysis) - 1) // LISTINGS_PER_PAGE + 1
+            page = 1
+            if num_pages > 1:
+                page = st.number_input(f"Page (sur {num_pages})", min_value=1, max_value=num_pages, value=1)
+            
+            page_rows = seo_analysis.iloc[(page - 1) * LISTINGS_PER_PAGE:page * LISTINGS_PER_PAGE]
+            
+            for idx, row in page_rows.iterrows():
                 category, css_class = get_seo_category(row['SEO_Score'])
+                issues, recommendations = title_feedback(row)
                 
                 with st.expander(f"{category} - {row['Title'][:60]}... (Score: {row['SEO_Score']:.0f}/100)"):
                     
@@ -756,29 +497,26 @@ else:
                     with col2:
                         st.metric("Score SEO", f"{row['SEO_Score']:.0f}/100")
                     
-                    if row['Issues']:
+                    if issues:
                         st.markdown("**⚠️ Problèmes détectés :**")
-                        for issue in row['Issues']:
+                        for issue in issues:
                             st.markdown(f"- {issue}")
                     
-                    if row['Recommendations']:
+                    if recommendations:
                         st.markdown("**💡 Recommandations :**")
-                        for rec in row['Recommendations']:
+                        for rec in recommendations:
                             st.markdown(f"- {rec}")
         
         with tab3:
             st.markdown("## 🏷️ Analyse des Tags")
             
-            # Extraire tous les tags
-            all_tags = []
-            for idx, row in listings_df.iterrows():
-                if 'Tags' in row and pd.notna(row['Tags']):
-                    tags = analyze_tags(row['Tags'])
-                    all_tags.extend(tags)
+            # Compter tous les tags
+            tag_counter = Counter()
+            if 'Tags' in listings_df.columns:
+                tag_counter = count_terms(listings_df['Tags'], 'tags')
             
-            if all_tags:
-                tag_counter = Counter(all_tags)
-                most_common_tags = tag_counter.most_common(20)
+            if tag_counter:
+                most_common_tags = top_terms(tag_counter, 20)
                 
                 col1, col2 = st.columns(2)
                 
@@ -803,8 +541,9 @@ else:
                     st.markdown("### 📊 Statistiques des tags")
                     
                     st.metric("Tags uniques", len(tag_counter))
-                    st.metric("Tags total", len(all_tags))
-                    st.metric("Moyenne par listing", f"{len(all_tags)/len(listings_df):.1f}")
+                    total_tags = sum(tag_counter.values())
+                    st.metric("Tags total", total_tags)
+                    st.metric("Moyenne par listing", f"{total_tags/len(listings_df):.1f}")
                     
                     st.markdown("---")
                     
@@ -816,8 +555,8 @@ else:
                         'adjustable', 'womens', 'mens', 'couple', 'birthday'
                     ]
                     
-                    tags_present = [tag for tag in recommended_tags if tag in all_tags]
-                    tags_missing = [tag for tag in recommended_tags if tag not in all_tags]
+                    tags_present = [tag for tag in recommended_tags if tag in tag_counter]
+                    tags_missing = [tag for tag in recommended_tags if tag not in tag_counter]
                     
                     st.markdown("**✅ Tags présents :**")
                     st.write(", ".join(tags_present) if tags_present else "Aucun")
@@ -993,11 +732,9 @@ else:
                     st.markdown("### 📅 Analyse Temporelle des Ventes")
                     
                     # Meilleurs jours
-                    sales_df['DayOfWeek'] = sales_df['Date'].dt.day_name()
-                    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
                     day_names_fr = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
                     
-                    daily_sales = sales_df.groupby('DayOfWeek')['Price'].sum().reindex(day_order).reset_index()
+                    daily_sales = sales_cube.by_weekday('Revenue').reset_index()
                     daily_sales['DayOfWeek'] = day_names_fr
                     daily_sales.columns = ['Jour', 'CA']
                     
@@ -1100,9 +837,9 @@ else:
                 })
             
             # Recommandation 4 : Tags
-            if all_tags:
-                unique_tags = len(set(all_tags))
-                avg_tags_per_listing = len(all_tags) / len(listings_df)
+            if tag_counter:
+                unique_tags = len(tag_counter)
+                avg_tags_per_listing = sum(tag_counter.values()) / len(listings_df)
                 
                 if avg_tags_per_listing < 10:
                     recommendations.append({
@@ -1139,17 +876,14 @@ else:
                 
                 # Meilleur moment pour publier
                 if 'Date' in sales_df.columns:
-                    sales_df['Hour'] = sales_df['Date'].dt.hour
-                    best_hour = sales_df.groupby('Hour')['Price'].sum().idxmax()
+                    best_hour = sales_cube.by_hour('Revenue').idxmax()
                     
                     # Calculer le meilleur jour
-                    sales_df['DayOfWeek'] = sales_df['Date'].dt.day_name()
-                    day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
                     day_names_fr = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
                     
-                    daily_sales_rec = sales_df.groupby('DayOfWeek')['Price'].sum().reindex(day_order)
+                    daily_sales_rec = sales_cube.by_weekday('Revenue')
                     best_day_idx = daily_sales_rec.idxmax()
-                    best_day = day_names_fr[day_order.index(best_day_idx)]
+                    best_day = day_names_fr[WEEKDAYS.index(best_day_idx)]
                     
                     recommendations.append({
                         'priority': '🟢 INFO',
@@ -1257,20 +991,15 @@ else:
             st.markdown("</div>", unsafe_allow_html=True)
 
         else:
-            # MODE PAYANT : Export disponible
-            if st.button("📥 Générer le rapport PDF", type="primary", use_container_width=True):
-                with st.spinner("Génération du rapport en cours..."):
-                    pdf_buffer = generate_pdf_report(kpis, df, product_analysis)
-                    
-                    st.download_button(
-                        label="⬇️ Télécharger le rapport PDF",
-                        data=pdf_buffer,
-                        file_name=f"rapport_etsy_{datetime.now().strftime('%Y%m%d')}.pdf",
-                        mime="application/pdf",
-                        use_container_width=True
-                    )
-                    
-                    st.success("✅ Rapport généré avec succès !")
+            # MODE PAYANT : Export disponible (rendu à la demande, hors du script de la page)
+            show_pdf_export(
+                content_hash(
+                    'seo_pdf', ingest_upload(listings_file).sha256,
+                    ingest_upload(sales_file).sha256 if sales_file is not None else None
+                ),
+                generate_seo_pdf_report, (listings_df, seo_analysis, sales_df),
+                file_name=f"rapport_seo_{datetime.now().strftime('%Y%m%d')}.pdf"
+            )
 
 # Footer
 st.markdown("---")
@@ -7,6 +7,9 @@ import os
 
 # Ajouter le chemin pour les imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth.access_manager import get_supabase_client
 
 # Configuration de la page
 st.set_page_config(
@@ -70,24 +73,6 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def get_supabase_client():
-    """Initialise le client Supabase"""
-    try:
-        if "supabase" not in st.secrets:
-            return None
-        
-        from supabase import create_client
-        
-        url = st.secrets["supabase"]["url"]
-        key = st.secrets["supabase"]["key"]
-        
-        return create_client(url, key)
-        
-    except Exception as e:
-        st.error(f"❌ Erreur connexion Supabase: {e}")
-        return None
-
-
 def validate_email(email):
     """Valide le format de l'email"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
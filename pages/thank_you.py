@@ -57,6 +57,13 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# ========== INVALIDATION CACHE ABONNEMENT ==========
+# Le paiement vient d'être enregistré : forcer la relecture des produits achetés
+if st.session_state.get('user_info', {}).get('id'):
+    from auth.access_manager import invalidate_user_products
+    invalidate_user_products(st.session_state['user_info']['id'])
+# ===================================================
+
 # ========== HEADER DE SUCCÈS ==========
 st.markdown('<div class="success-header">🎉</div>', unsafe_allow_html=True)
 st.markdown('<p class="main-title">Paiement réussi !</p>', unsafe_allow_html=True)
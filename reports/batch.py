@@ -0,0 +1,299 @@
+"""
+reports/batch.py
+
+Export par lots : rapports PDF et tableaux CSV de plusieurs boutiques dans
+une seule archive zip (agences qui gèrent des dizaines de boutiques).
+
+Le répertoire d'entrée contient un sous-répertoire par boutique, avec les
+exports Etsy de la boutique, reconnus par leur nom (classify_export dans
+analytics/schemas.py). Chaque boutique est traitée par un processus du
+pool : chargement, analyses (calculate_kpis, analyze_products,
+analyze_geography, analyze_customer_retention, build_seo_analysis), rendu
+des PDF et des CSV en mémoire. Le processus principal écrit les fichiers
+dans le zip au fur et à mesure que les boutiques se terminent ; le débit
+croît avec le nombre de cœurs tant qu'il y a plus de boutiques que de
+processus.
+
+Usage : python -m reports.batch <répertoire des boutiques> <archive.zip> [--workers N] [--days N]
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import customers, finance, seo
+from analytics.cube import period_start
+from analytics.diagnostics import add_diagnostic, as_diagnostic
+from analytics.schemas import classify_export
+from analytics.timeindex import index_by_date, since
+from reports.pdf import generate_customer_intelligence_pdf, generate_pdf_report, generate_seo_pdf_report
+
+# Colonnes du journal de l'archive
+LOG_COLUMNS = ['Boutique', 'Niveau', 'Code', 'Message', 'Données']
+
+
+def find_shops(root):
+    """
+    Boutiques du répertoire d'entrée.
+
+    Returns:
+        list: [(nom de la boutique, {type d'export: [chemins]})], par nom
+    """
+    shops = []
+
+    for entry in sorted(os.scandir(root), key=lambda entry: entry.name):
+        if not entry.is_dir() or entry.name.startswith(('.', '_')):
+            continue
+
+        files = {}
+        for dirpath, _, file_names in os.walk(entry.path):
+            for file_name in sorted(file_names):
+                kind = classify_export(file_name)
+                if kind is not None:
+                    files.setdefault(kind, []).append(os.path.join(dirpath, file_name))
+
+        if files:
+            shops.append((entry.name, files))
+
+    return shops
+
+
+def _open(path):
+    with open(path, 'rb') as f:
+        stream = io.BytesIO(f.read())
+    stream.name = os.path.basename(path)
+    return stream
+
+
+def _load(paths, parse_fn, messages):
+    """Parse les exports d'un type (un fichier par année, par exemple) et les concatène."""
+    frames = [df for df in (parse_fn(_open(path), messages) for path in paths) if df is not None]
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+    return index_by_date(pd.concat(frames, ignore_index=True))
+
+
+def _csv(df, index=False):
+    return df.to_csv(index=index).encode('utf-8')
+
+
+def _pdf(buffer):
+    return buffer.getvalue()
+
+
+def _log_row(shop, diagnostic):
+    data = json.dumps(diagnostic.data, ensure_ascii=False, default=str) if diagnostic.data else ''
+    return shop, diagnostic.level, diagnostic.code or '', ' '.join(diagnostic.text.split()), data
+
+
+def _kpi_table(kpis):
+    rows = [(name, value) for name, value in kpis.items() if name != 'frais_etsy_detail']
+    rows += [(f"frais_etsy / {name}", value) for name, value in kpis.get('frais_etsy_detail', {}).items()]
+    return pd.DataFrame(rows, columns=['Indicateur', 'Valeur'])
+
+
+# ==================== RAPPORTS D'UNE BOUTIQUE ====================
+
+def _finance_reports(files, cutoff, messages):
+    output = {}
+    if 'order_items' not in files:
+        return output
+
+    df = _load(files['order_items'], finance.parse_sales, messages)
+    if df is None:
+        return output
+
+    if 'costs' in files:
+        df, cost_messages = finance.apply_costs(df, "Upload CSV avec coûts détaillés", cost_file=_open(files['costs'][0]))
+        messages.extend(cost_messages)
+
+    if cutoff is not None:
+        df = since(df, cutoff)
+
+    fees_config = {'statement_file': _open(files['statement'][0])} if 'statement' in files else None
+    kpis = finance.calculate_kpis(df, fees_config)
+    product_analysis = finance.analyze_products(df)
+
+    output['finance/kpis.csv'] = _csv(_kpi_table(kpis))
+    if product_analysis is not None:
+        output['finance/produits.csv'] = _csv(product_analysis)
+    output['finance/rapport_finance.pdf'] = _pdf(generate_pdf_report(kpis, df, product_analysis))
+    return output
+
+
+def _customer_reports(files, cutoff, messages):
+    output = {}
+    if 'orders' not in files:
+        return output
+
+    orders_df = _load(files['orders'], customers.parse_orders, messages)
+    if orders_df is None:
+        return output
+
+    reviews_df = _load(files['reviews'], customers.parse_reviews, messages) if 'reviews' in files else None
+
+    if cutoff is not None:
+        orders_df = since(orders_df, cutoff)
+        if reviews_df is not None:
+            reviews_df = since(reviews_df, cutoff)
+
+    country_analysis, city_analysis = customers.analyze_geography(orders_df)
+    customer_analysis = customers.analyze_customer_retention(orders_df)
+
+    if country_analysis is not None:
+        output['customer_intelligence/pays.csv'] = _csv(country_analysis)
+    if city_analysis is not None:
+        output['customer_intelligence/villes.csv'] = _csv(city_analysis)
+    if customer_analysis is not None:
+        output['customer_intelligence/clients.csv'] = _csv(customer_analysis)
+    output['customer_intelligence/rapport_customer_intelligence.pdf'] = _pdf(
+        generate_customer_intelligence_pdf(orders_df, reviews_df, customer_analysis)
+    )
+    return output
+
+
+def _seo_reports(files, messages):
+    output = {}
+    if 'listings' not in files:
+        return output
+
+    listings_df = _load(files['listings'], seo.parse_listings, messages)
+    if listings_df is None:
+        return output
+
+    sales_df = _load(files['order_items'], seo.parse_sales, messages) if 'order_items' in files else None
+    seo_analysis = seo.build_seo_analysis(listings_df, sales_df)
+
+    output['seo/listings.csv'] = _csv(seo_analysis)
+    output['seo/rapport_seo.pdf'] = _pdf(generate_seo_pdf_report(listings_df, seo_analysis, sales_df))
+    return output
+
+
+def export_shop(shop, files, days=None):
+    """
+    Analyses et rapports d'une boutique (exécuté dans un processus du pool).
+
+    Args:
+        shop (str): Nom de la boutique (répertoire)
+        files (dict): {type d'export: [chemins]}
+        days (int): Limite aux `days` derniers jours (toutes les données si None)
+
+    Returns:
+        dict: {'shop', 'files': {chemin dans l'archive: octets}, 'messages', 'seconds'}
+    """
+    start = time.perf_counter()
+    cutoff = period_start(days) if days else None
+    messages = []
+    output = {}
+
+    for label, build in (
+        ("Finance", lambda: _finance_reports(files, cutoff, messages)),
+        ("Customer Intelligence", lambda: _customer_reports(files, cutoff, messages)),
+        ("SEO", lambda: _seo_reports(files, messages))
+    ):
+        try:
+            output.update(build())
+        except Exception as e:
+            add_diagnostic(messages, 'error', 'report_failed', f"❌ {label} : {e}", report=label, error=repr(e))
+
+    if not output:
+        add_diagnostic(messages, 'warning', 'no_report', "⚠️ Aucun rapport produit (exports manquants ou invalides)")
+
+    return {
+        'shop': shop,
+        'files': {f"{shop}/{name}": data for name, data in output.items()},
+        'messages': messages,
+        'seconds': time.perf_counter() - start
+    }
+
+
+# ==================== ARCHIVE ====================
+
+def run_batch(root, output_path, workers=None, days=None, progress=None):
+    """
+    Exporte toutes les boutiques de `root` dans l'archive zip `output_path`.
+
+    Args:
+        workers (int): Processus du pool (défaut : nombre de cœurs ; 1 = sans pool)
+        days (int): Limite aux `days` derniers jours
+        progress: fonction(boutiques terminées, total, résultat de export_shop) (optionnel)
+
+    Returns:
+        dict: {'shops', 'files', 'errors', 'seconds', 'results': [{'shop', 'seconds', 'files', 'errors'}]}
+    """
+    start = time.perf_counter()
+    shops = find_shops(root)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(shops) or 1))
+
+    summary = {'shops': len(shops), 'files': 0, 'errors': 0, 'seconds': 0.0, 'results': []}
+    log_rows = []
+
+    with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+
+        def write(result):
+            for name, data in result['files'].items():
+                archive.writestr(name, data)
+
+            diagnostics = [as_diagnostic(message) for message in result['messages']]
+            errors = sum(1 for diagnostic in diagnostics if diagnostic.level == 'error')
+            log_rows.extend(_log_row(result['shop'], diagnostic) for diagnostic in diagnostics)
+
+            summary['files'] += len(result['files'])
+            summary['errors'] += errors
+            summary['results'].append({
+                'shop': result['shop'],
+                'seconds': round(result['seconds'], 2),
+                'files': len(result['files']),
+                'errors': errors
+            })
+
+            if progress is not None:
+                progress(len(summary['results']), len(shops), result)
+
+        if workers == 1:
+            for shop, files in shops:
+                write(export_shop(shop, files, days))
+        else:
+            # 'spawn' : pas de fork d'un processus qui fait tourner des threads (serveur Streamlit)
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                futures = [executor.submit(export_shop, shop, files, days) for shop, files in shops]
+                for future in as_completed(futures):
+                    write(future.result())
+
+        archive.writestr('journal.csv', _csv(pd.DataFrame(log_rows, columns=LOG_COLUMNS)))
+
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export par lots des rapports Finance, Customer Intelligence et SEO")
+    parser.add_argument('root', help="Répertoire contenant un sous-répertoire d'exports Etsy par boutique")
+    parser.add_argument('output', help="Archive zip à produire")
+    parser.add_argument('--workers', type=int, default=None, help="Processus en parallèle (défaut : nombre de cœurs)")
+    parser.add_argument('--days', type=int, default=None, help="Limiter aux N derniers jours")
+    args = parser.parse_args(argv)
+
+    def report(done, total, result):
+        print(f"[{done}/{total}] {result['shop']} : {len(result['files'])} fichiers en {result['seconds']:.1f} s")
+
+    summary = run_batch(args.root, args.output, workers=args.workers, days=args.days, progress=report)
+    print(f"{summary['shops']} boutiques, {summary['files']} fichiers, {summary['errors']} erreurs "
+          f"en {summary['seconds']:.1f} s → {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+reports/download.py
+
+Bloc Streamlit « Générer / Télécharger le rapport PDF » des dashboards.
+
+Le bouton ne fait que soumettre le rendu au pool (reports/jobs.py) ; la page
+suit l'avancement avec une barre de progression, puis affiche le bouton de
+téléchargement. Le PDF n'est jamais construit tant que l'utilisateur ne l'a
+pas demandé, et un rapport déjà rendu pour les mêmes données reste
+téléchargeable d'un rerun à l'autre sans nouveau rendu.
+"""
+
+import streamlit as st
+
+from reports.jobs import FAILED, READY, get_renderer
+
+# Intervalle de rafraîchissement de la barre de progression (secondes)
+POLL_INTERVAL = 0.25
+
+
+def show_pdf_export(key, render_fn, args, file_name):
+    """
+    Affiche le bouton de génération, l'avancement du rendu puis le téléchargement.
+
+    Args:
+        key (str): Hash du contenu du rapport (content_hash)
+        render_fn: Générateur PDF : fonction(*args, progress=callback) -> BytesIO
+        args (tuple): Entrées du générateur (ne doivent plus être modifiées ensuite)
+        file_name (str): Nom du fichier téléchargé
+    """
+    renderer = get_renderer()
+    job = renderer.get(key)
+
+    if job is None or job.state == FAILED:
+        if st.button("📥 Générer le rapport PDF", type="primary", use_container_width=True):
+            job = renderer.submit(key, render_fn, *args)
+
+    if job is None:
+        return
+
+    if not job.finished:
+        progress_bar = st.progress(0.0, text="Génération du rapport en cours...")
+        while not job.wait(POLL_INTERVAL):
+            progress_bar.progress(job.fraction, text=f"Génération du rapport en cours... {job.fraction:.0%}")
+        progress_bar.empty()
+
+    if job.state == FAILED:
+        st.error(f"❌ Échec de la génération du rapport : {job.error}")
+        return
+
+    if job.state == READY:
+        st.download_button(
+            label="⬇️ Télécharger le rapport PDF",
+            data=job.data,
+            file_name=file_name,
+            mime="application/pdf",
+            use_container_width=True
+        )
+
+        st.success("✅ Rapport généré avec succès !")
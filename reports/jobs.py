@@ -0,0 +1,227 @@
+"""
+reports/jobs.py
+
+Rendu des rapports PDF à la demande, hors du script de la page.
+
+Les générateurs reportlab des dashboards sont soumis à un pool de threads
+partagé par le processus (au plus MAX_CONCURRENT_RENDERS rendus simultanés,
+les autres attendent leur tour). Chaque rendu est identifié par un hash du
+contenu de ses entrées (content_hash) : tant que les données et les
+réglages ne changent pas, le PDF déjà produit est resservi sans relancer
+reportlab. Les PDF terminés sont gardés dans un cache LRU plafonné en octets.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Rendus simultanés par processus (toutes sessions confondues)
+MAX_CONCURRENT_RENDERS = int(os.environ.get('PDF_MAX_CONCURRENT_RENDERS', '2'))
+
+# Plafond mémoire des PDF terminés (octets)
+PDF_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+QUEUED = 'queued'
+RUNNING = 'running'
+READY = 'ready'
+FAILED = 'failed'
+
+
+def content_hash(*parts):
+    """
+    Hash SHA-256 du contenu des entrées d'un rapport.
+
+    Les DataFrames et Series sont hashés par valeurs (pd.util.hash_pandas_object),
+    les dicts par items triés, le reste par repr().
+    """
+    digest = hashlib.sha256()
+
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            if isinstance(part, pd.DataFrame):
+                digest.update(repr(list(part.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+        elif isinstance(part, dict):
+            digest.update(repr(sorted(part.items(), key=lambda item: str(item[0]))).encode())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b'\x1f')
+
+    return digest.hexdigest()
+
+
+class RenderJob:
+    """
+    Un rendu PDF : état, avancement et résultat.
+
+    L'avancement vient du callback de progression reportlab
+    (doc.setProgressCallBack) : SIZE_EST donne le nombre d'éléments à
+    mettre en page, PROGRESS le nombre déjà placés.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.state = QUEUED
+        self.done = 0
+        self.total = 0
+        self.data = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.seconds = None
+        self._finished = threading.Event()
+
+    def on_progress(self, kind, value):
+        """Callback reportlab : fn(type, valeur)."""
+        if kind == 'SIZE_EST':
+            self.total = value
+        elif kind == 'PROGRESS':
+            self.done = value
+
+    @property
+    def fraction(self):
+        """Avancement entre 0 et 1."""
+        if self.state == READY:
+            return 1.0
+        if not self.total:
+            return 0.0
+        return min(self.done / self.total, 1.0)
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        """Attend la fin du rendu ; True s'il est terminé (prêt ou en échec)."""
+        return self._finished.wait(timeout)
+
+
+class PdfRenderer:
+    """
+    Pool de rendu PDF avec cache des résultats par hash de contenu.
+
+    Args:
+        max_workers (int): Rendus simultanés au maximum
+        max_bytes (int): Taille maximale des PDF gardés en mémoire
+    """
+
+    def __init__(self, max_workers=MAX_CONCURRENT_RENDERS, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.max_workers = max(1, max_workers)
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.rendered = 0
+        self.hits = 0
+        self.failed = 0
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='pdf-render'
+                )
+            return self._executor
+
+    def get(self, key):
+        """Rendu connu pour cette clé (en attente, en cours, prêt ou en échec), ou None."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                self._jobs.move_to_end(key)
+            return job
+
+    def submit(self, key, render_fn, *args):
+        """
+        Lance le rendu s'il n'est pas déjà prêt ou en cours pour cette clé.
+
+        Args:
+            key (str): Hash du contenu (content_hash)
+            render_fn: fonction(*args, progress=callback) -> BytesIO ou bytes
+
+        Returns:
+            RenderJob
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.state != FAILED:
+                self._jobs.move_to_end(key)
+                if job.state == READY:
+                    self.hits += 1
+                return job
+
+            job = RenderJob(key)
+            self._jobs[key] = job
+
+        self._get_executor().submit(self._run, job, render_fn, args)
+        return job
+
+    def _run(self, job, render_fn, args):
+        job.state = RUNNING
+        start = time.perf_counter()
+
+        try:
+            result = render_fn(*args, progress=job.on_progress)
+            data = result.getvalue() if hasattr(result, 'getvalue') else bytes(result)
+        except Exception as e:
+            print(f"⚠️ Échec du rendu PDF {job.key[:12]}: {e}")
+            job.error = str(e)
+            job.state = FAILED
+            with self._lock:
+                self.failed += 1
+            job._finished.set()
+            return
+
+        job.data = data
+        job.seconds = time.perf_counter() - start
+        job.state = READY
+
+        with self._lock:
+            self.rendered += 1
+            if self._jobs.get(job.key) is job:
+                self.current_bytes += len(data)
+                self._evict()
+
+        job._finished.set()
+
+    def _evict(self):
+        # PDF terminés les plus anciens d'abord ; les rendus en cours ne sont pas évincés
+        for key in list(self._jobs):
+            if self.current_bytes <= self.max_bytes:
+                break
+
+            job = self._jobs[key]
+            if job.state == READY and key != next(reversed(self._jobs)):
+                del self._jobs[key]
+                self.current_bytes -= len(job.data)
+            elif job.state == FAILED:
+                del self._jobs[key]
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+            return {
+                'jobs': len(states),
+                'running': states.count(RUNNING),
+                'queued': states.count(QUEUED),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'max_workers': self.max_workers,
+                'rendered': self.rendered,
+                'hits': self.hits,
+                'failed': self.failed
+            }
+
+
+_renderer = PdfRenderer()
+
+
+def get_renderer():
+    """Retourne le pool de rendu partagé par le processus (toutes sessions confondues)."""
+    return _renderer
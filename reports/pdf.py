@@ -0,0 +1,130 @@
+"""
+reports/pdf.py
+
+Rapports PDF des dashboards Finance Pro, Customer Intelligence et SEO.
+
+Les générateurs sont importables sans Streamlit (rendu hors du script de la
+page, exports par lots) ; styles et gabarit viennent de reports/templates.py.
+Chaque générateur accepte un callback de progression reportlab (`progress`).
+"""
+
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, Spacer
+
+from reports.templates import (
+    STYLES, format_int, format_money, format_number, make_table, render_story,
+    report_header, table_rows, truncate
+)
+
+
+def generate_pdf_report(kpis, df, product_analysis, progress=None):
+    """Génère un rapport PDF avec les principales métriques"""
+    story = report_header("Rapport Etsy Analytics Pro")
+
+    # KPIs principaux
+    story.append(Paragraph("Indicateurs Financiers", STYLES['Heading2']))
+    kpi_data = [
+        ['Indicateur', 'Valeur'],
+        ['Chiffre d\'affaires', f"{kpis['ca_total']:.2f} EUR"],
+        ['Nombre de ventes', str(kpis['nb_ventes'])],
+        ['Panier moyen', f"{kpis['panier_moyen']:.2f} EUR"],
+        ['Frais Etsy', f"{kpis['frais_etsy']:.2f} EUR"],
+        ['Coûts matières', f"{kpis['couts_matieres']:.2f} EUR"],
+        ['Marge brute', f"{kpis['marge_brute']:.2f} EUR"],
+        ['Taux de marge', f"{kpis['taux_marge']:.1f} %"]
+    ]
+
+    story.append(make_table(kpi_data, [3, 2], 'kpi'))
+    story.append(Spacer(1, 0.5*inch))
+
+    # Top produits
+    if product_analysis is not None and len(product_analysis) > 0:
+        story.append(Paragraph("Top 5 Produits par CA", STYLES['Heading2']))
+        top_products = product_analysis.head(5)
+        product_data = table_rows(
+            ['Produit', 'CA', 'Ventes', 'Marge'],
+            truncate(top_products['Product'], 30),
+            format_money(top_products['CA']),
+            format_int(top_products['Ventes']),
+            format_money(top_products['Marge'])
+        )
+
+        story.append(make_table(product_data, [2.5, 1.5, 1, 1.5], 'ranking'))
+
+    return render_story(story, progress)
+
+
+def generate_customer_intelligence_pdf(orders_df, reviews_df, customer_analysis, progress=None):
+    """Génère un rapport PDF Customer Intelligence"""
+    story = report_header("👥 Rapport Customer Intelligence")
+
+    # KPIs principaux
+    story.append(Paragraph("📊 Indicateurs Clés", STYLES['Heading2']))
+
+    total_customers = orders_df['Buyer'].nunique() if 'Buyer' in orders_df.columns else 0
+    total_orders = len(orders_df)
+    avg_rating = reviews_df['Rating'].mean() if reviews_df is not None and 'Rating' in reviews_df.columns else 0
+
+    kpi_data = [
+        ['Indicateur', 'Valeur'],
+        ['Clients uniques', str(total_customers)],
+        ['Commandes totales', str(total_orders)],
+        ['Note moyenne', f"{avg_rating:.2f}/5" if avg_rating > 0 else 'N/A'],
+        ['Pays couverts', str(orders_df['Country'].nunique()) if 'Country' in orders_df.columns else 'N/A']
+    ]
+
+    if customer_analysis is not None:
+        repeat_rate = (customer_analysis['Num_Orders'] > 1).sum() / len(customer_analysis) * 100
+        avg_ltv = customer_analysis['LTV'].mean()
+        kpi_data.append(['Taux clients récurrents', f"{repeat_rate:.1f}%"])
+        kpi_data.append(['LTV moyen', f"{avg_ltv:.2f} €"])
+
+    story.append(make_table(kpi_data, [3, 2]))
+    story.append(Spacer(1, 0.5*inch))
+
+    # Top 5 pays
+    if 'Country' in orders_df.columns:
+        story.append(Paragraph("🌍 Top 5 Pays", STYLES['Heading2']))
+
+        country_sales = orders_df.groupby('Country', observed=True)['Total'].sum().nlargest(5)
+
+        country_data = table_rows(
+            ['Pays', 'Chiffre d\'affaires'],
+            country_sales.index.astype(str).tolist(),
+            format_money(country_sales, '€')
+        )
+
+        story.append(make_table(country_data, [2.5, 2]))
+
+    return render_story(story, progress)
+
+
+def generate_seo_pdf_report(listings_df, seo_analysis, sales_df=None, progress=None):
+    """Génère un rapport PDF avec l'analyse SEO"""
+    story = report_header("🔍 Rapport SEO Etsy")
+
+    # Score SEO global
+    avg_score = seo_analysis['SEO_Score'].mean()
+    story.append(Paragraph("📊 Score SEO Global", STYLES['Heading2']))
+
+    score_data = [
+        ['Indicateur', 'Valeur'],
+        ['Score SEO moyen', f"{avg_score:.1f}/100"],
+        ['Listings excellents (≥80)', f"{(seo_analysis['SEO_Score'] >= 80).sum()}"],
+        ['Listings à optimiser (<60)', f"{(seo_analysis['SEO_Score'] < 60).sum()}"]
+    ]
+
+    story.append(make_table(score_data, [3, 2]))
+    story.append(Spacer(1, 0.5*inch))
+
+    # Top 5 listings à optimiser
+    story.append(Paragraph("🎯 Top 5 Listings à Optimiser", STYLES['Heading2']))
+
+    worst_listings = seo_analysis.nsmallest(5, 'SEO_Score')
+
+    for title_short, score in zip(truncate(worst_listings['Title'], 50, '...'),
+                                  format_number(worst_listings['SEO_Score'], suffix='/100')):
+        story.append(Paragraph(f"<b>{title_short}</b> - Score: {score}", STYLES['Normal']))
+        story.append(Spacer(1, 0.1*inch))
+
+    return render_story(story, progress)
@@ -0,0 +1,141 @@
+"""
+reports/templates.py
+
+Styles, tableaux et gabarit de page communs aux rapports PDF.
+
+La feuille de styles, le style de titre et les TableStyle sont construits une
+fois à l'import et partagés par tous les rendus (ils ne sont que lus pendant
+la mise en page). Le document (SimpleDocTemplate) reste créé à chaque rendu :
+ses cadres de page gardent l'état de la mise en page en cours, et plusieurs
+rendus peuvent tourner en parallèle (reports/jobs.py).
+
+Les lignes des tableaux sont produites colonne par colonne (format_money,
+format_int, truncate) puis assemblées par table_rows(), sans iterrows().
+"""
+
+import io
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+PAGE_SIZE = A4
+
+BRAND_COLOR = colors.HexColor('#F56400')
+
+STYLES = getSampleStyleSheet()
+STYLES.add(ParagraphStyle(
+    'ReportTitle',
+    parent=STYLES['Heading1'],
+    fontSize=24,
+    textColor=BRAND_COLOR,
+    spaceAfter=30,
+    alignment=1
+))
+
+
+def _table_style(font_size=None, body_background=None):
+    commands = [
+        ('BACKGROUND', (0, 0), (-1, 0), BRAND_COLOR),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold')
+    ]
+    if font_size is not None:
+        commands += [
+            ('FONTSIZE', (0, 0), (-1, 0), font_size),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12)
+        ]
+    if body_background is not None:
+        commands.append(('BACKGROUND', (0, 1), (-1, -1), body_background))
+    commands.append(('GRID', (0, 0), (-1, -1), 1, colors.black))
+    return TableStyle(commands)
+
+
+# Styles de tableaux : en-tête orange Etsy, grille noire
+TABLE_STYLES = {
+    'simple': _table_style(),
+    'kpi': _table_style(font_size=12, body_background=colors.beige),
+    'ranking': _table_style(font_size=10, body_background=colors.beige)
+}
+
+
+# ==================== FORMATAGE PAR COLONNE ====================
+
+def format_money(values, unit='EUR', decimals=2):
+    """Montants formatés en une opération : ['12.50 EUR', ...]."""
+    return np.char.mod(f'%.{decimals}f {unit}', np.asarray(values, dtype=float)).tolist()
+
+
+def format_number(values, decimals=0, suffix=''):
+    """Nombres formatés en une opération : ['85/100', ...] avec suffix='/100'."""
+    return np.char.mod(f'%.{decimals}f{suffix}', np.asarray(values, dtype=float)).tolist()
+
+
+def format_int(values):
+    """Entiers en texte : ['3', '12', ...]."""
+    return np.asarray(values).astype(np.int64).astype(str).tolist()
+
+
+def truncate(values, width, ellipsis=''):
+    """Textes coupés à `width` caractères, suivis de `ellipsis` s'ils ont été coupés."""
+    texts = pd.Series(values).astype(str)
+    short = texts.str[:width]
+    if ellipsis:
+        short = short.where(texts.str.len() <= width, short + ellipsis)
+    return short.tolist()
+
+
+def table_rows(header, *columns):
+    """Lignes d'un tableau : en-tête puis colonnes déjà formatées, assemblées ligne à ligne."""
+    return [list(header)] + [list(row) for row in zip(*columns)]
+
+
+# ==================== GABARIT ====================
+
+def make_table(rows, col_widths, style='simple'):
+    """
+    Args:
+        rows (list): Lignes (en-tête compris)
+        col_widths (list): Largeurs des colonnes, en pouces
+        style (str): Clé de TABLE_STYLES
+    """
+    table = Table(rows, colWidths=[width * inch for width in col_widths])
+    table.setStyle(TABLE_STYLES[style])
+    return table
+
+
+def report_header(title):
+    """Titre du rapport et date de génération."""
+    return [
+        Paragraph(title, STYLES['ReportTitle']),
+        Spacer(1, 0.3*inch),
+        Paragraph(f"Généré le : {datetime.now().strftime('%d/%m/%Y à %H:%M')}", STYLES['Normal']),
+        Spacer(1, 0.3*inch)
+    ]
+
+
+def render_story(story, progress=None):
+    """
+    Met en page le rapport.
+
+    Args:
+        story (list): Éléments reportlab
+        progress: Callback de progression reportlab fn(type, valeur) (optionnel)
+
+    Returns:
+        BytesIO: PDF, positionné au début
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=PAGE_SIZE)
+    if progress is not None:
+        doc.setProgressCallBack(progress)
+
+    doc.build(story)
+    buffer.seek(0)
+    return buffer
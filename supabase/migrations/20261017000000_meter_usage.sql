@@ -0,0 +1,91 @@
+-- Metering atomique des analyses gratuites.
+--
+-- Remplace le read-modify-write de increment_usage_with_timestamp() et le reset
+-- hebdomadaire de check_usage_limit() : vérification de la limite, reset après
+-- 7 jours, anti-rebond de 30 minutes et incrément se font dans une seule
+-- transaction (ligne verrouillée), en un seul aller-retour.
+--
+-- Les règles (limite, reset, anti-rebond) sont fixées ici et le statut Premium
+-- est lu dans customer_products : l'appelant ne choisit que l'utilisateur et
+-- s'il faut compter l'analyse. La fonction (security definer) n'est exécutable
+-- que par service_role : la clé anon publique ne peut pas toucher au quota
+-- d'un autre utilisateur.
+--
+-- Appel (client service_role) : supabase.rpc('meter_usage', {'user_id': ..., 'p_increment': true})
+
+create or replace function public.meter_usage(
+    user_id uuid,
+    p_increment boolean default true
+)
+returns jsonb
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    c_weekly_limit constant integer := 10;
+    c_reset_interval constant interval := interval '7 days';
+    c_debounce_interval constant interval := interval '30 minutes';
+    v_now timestamptz := now();
+    v_is_premium boolean;
+    v_usage_count integer;
+    v_reset_date timestamptz;
+    v_last_analysis timestamptz;
+    v_counted boolean := false;
+begin
+    select c.usage_count, c.usage_reset_date, c.last_analysis_timestamp
+      into v_usage_count, v_reset_date, v_last_analysis
+      from public.customers c
+     where c.id = meter_usage.user_id
+       for update;
+
+    if not found then
+        return null;
+    end if;
+
+    -- Abonnement Insights : analyses illimitées
+    v_is_premium := exists (
+        select 1
+          from public.customer_products cp
+         where cp.customer_id = meter_usage.user_id
+           and cp.product_id = 'insights'
+    );
+
+    v_usage_count := coalesce(v_usage_count, 0);
+
+    -- Reset hebdomadaire
+    if v_reset_date is null or v_now - v_reset_date >= c_reset_interval then
+        v_usage_count := 0;
+        v_reset_date := v_now;
+    end if;
+
+    -- Anti-rebond : une analyse n'est comptée qu'une fois par fenêtre de 30 min
+    if p_increment
+       and (v_last_analysis is null or v_now - v_last_analysis > c_debounce_interval)
+       and (v_is_premium or v_usage_count < c_weekly_limit) then
+        v_counted := true;
+        v_last_analysis := v_now;
+
+        if not v_is_premium then
+            v_usage_count := v_usage_count + 1;
+        end if;
+    end if;
+
+    update public.customers c
+       set usage_count = v_usage_count,
+           usage_reset_date = v_reset_date,
+           last_analysis_timestamp = v_last_analysis
+     where c.id = meter_usage.user_id;
+
+    return jsonb_build_object(
+        'usage_count', v_usage_count,
+        'usage_reset_date', v_reset_date,
+        'last_analysis_timestamp', v_last_analysis,
+        'is_premium', v_is_premium,
+        'counted', v_counted
+    );
+end;
+$$;
+
+revoke execute on function public.meter_usage(uuid, boolean) from public, anon, authenticated;
+grant execute on function public.meter_usage(uuid, boolean) to service_role;